@@ -4,9 +4,9 @@ import mediapipe as mp
 import math
 import sqlite3
 import os
-import time
 from hashlib import sha256
 from datetime import datetime
+from buffers import BufferPool
 
 # Initialize MediaPipe Pose
 mp_pose = mp.solutions.pose
@@ -391,6 +391,9 @@ def process_exercise_feed(*args, **kwargs):
             return
         
         stframe = st.empty()  # Placeholder for live video
+        buffers = BufferPool()
+        # mediapipe's default colors are BGR; the frame is drawn and shown in RGB
+        landmark_spec = mp_drawing.DrawingSpec(color=(255, 0, 0))
 
         with mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
             try:
@@ -400,24 +403,24 @@ def process_exercise_feed(*args, **kwargs):
                         st.warning("⚠️ Unable to read from webcam.")
                         break
 
-                    # Flip and convert
-                    frame = cv2.flip(frame, 1)
-                    image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                    # Flip and convert into reused buffers
+                    frame = buffers.flip(frame, 1)
+                    image = buffers.cvt_color(frame, cv2.COLOR_BGR2RGB)
                     image.flags.writeable = False
 
                     results = pose.process(image)
 
                     # Draw landmarks
                     image.flags.writeable = True
-                    image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
 
                     if results.pose_landmarks:
                         mp_drawing.draw_landmarks(
-                            image, results.pose_landmarks, mp_pose.POSE_CONNECTIONS
+                            image, results.pose_landmarks, mp_pose.POSE_CONNECTIONS,
+                            landmark_drawing_spec=landmark_spec
                         )
 
                     # Show frame in Streamlit
-                    stframe.image(image, channels="BGR")
+                    stframe.image(image, channels="RGB")
 
                     # Allow stopping with a stop button
                     if st.button("Stop", key="stop_button"):
@@ -445,6 +448,7 @@ def process_yoga_feed(yoga_pose):
     
     video_placeholder = st.empty()
     feedback_placeholder = st.empty()
+    buffers = BufferPool()
     
     while st.session_state.webcam_active:
         ret, frame = cap.read()
@@ -452,9 +456,9 @@ def process_yoga_feed(yoga_pose):
             st.error("Camera error")
             break
         
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = pose.process(image)
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+        # The RGB copy is only for inference; the checks below draw BGR colors on the frame itself
+        results = pose.process(buffers.cvt_color(frame, cv2.COLOR_BGR2RGB))
+        image = frame
         
         feedback = ""
         if results.pose_landmarks:
@@ -499,328 +503,8 @@ def process_yoga_feed(yoga_pose):
    #cv2.destroyAllWindows()
 
 # ===== EXERCISE PROCESSING FUNCTIONS =====
-
-def process_squats(landmarks, image):
-    """Process squats exercise"""
-    try:
-        left_hip = landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP.value]
-        left_knee = landmarks.landmark[mp_pose.PoseLandmark.LEFT_KNEE.value]
-        left_ankle = landmarks.landmark[mp_pose.PoseLandmark.LEFT_ANKLE.value]
-        
-        right_hip = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP.value]
-        right_knee = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_KNEE.value]
-        right_ankle = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ANKLE.value]
-        
-        left_knee_angle = calculate_angle(left_hip, left_knee, left_ankle)
-        right_knee_angle = calculate_angle(right_hip, right_knee, right_ankle)
-        
-        avg_knee_angle = (left_knee_angle + right_knee_angle) / 2
-        
-        if avg_knee_angle > 160:
-            st.session_state.exercise_stage = "up"
-            
-        if avg_knee_angle < 90 and st.session_state.exercise_stage == "up":
-            st.session_state.exercise_stage = "down"
-            st.session_state.counter += 1
-            cv2.putText(image, "REP COUNTED!", (image.shape[1]//2 - 100, 50), 
-                       cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 255, 0), 2)
-        
-        if st.session_state.exercise_stage == "up":
-            cv2.putText(image, "BEND KNEES TO SQUAT", (image.shape[1]//2 - 150, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 165, 255), 2)
-        else:
-            cv2.putText(image, "STAND UP", (image.shape[1]//2 - 70, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
-
-    except Exception as e:
-        st.error(f"Squats processing error: {e}")
-
-def process_hand_raises(landmarks, image):
-    """Process hand raises exercise"""
-    try:
-        left_shoulder = landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-        left_wrist = landmarks.landmark[mp_pose.PoseLandmark.LEFT_WRIST.value]
-        
-        right_shoulder = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-        right_wrist = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_WRIST.value]
-        
-        avg_wrist_height = (left_wrist.y + right_wrist.y) / 2
-        avg_shoulder_height = (left_shoulder.y + right_shoulder.y) / 2
-        
-        if avg_wrist_height > avg_shoulder_height + 0.05:
-            st.session_state.exercise_stage = "down"
-            
-        if avg_wrist_height < avg_shoulder_height - 0.05 and st.session_state.exercise_stage == "down":
-            st.session_state.exercise_stage = "up"
-            st.session_state.counter += 1
-            cv2.putText(image, "REP COUNTED!", (image.shape[1]//2 - 100, 50), 
-                       cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 255, 0), 2)
-        
-        if st.session_state.exercise_stage == "down":
-            cv2.putText(image, "RAISE YOUR HANDS", (image.shape[1]//2 - 120, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 165, 255), 2)
-        else:
-            cv2.putText(image, "LOWER YOUR HANDS", (image.shape[1]//2 - 130, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
-
-    except Exception as e:
-        st.error(f"Hand raises processing error: {e}")
-
-def process_pushups(landmarks, image):
-    """Process push-ups exercise with improved detection"""
-    try:
-        left_shoulder = landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-        left_elbow = landmarks.landmark[mp_pose.PoseLandmark.LEFT_ELBOW.value]
-        left_wrist = landmarks.landmark[mp_pose.PoseLandmark.LEFT_WRIST.value]
-        
-        right_shoulder = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-        right_elbow = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ELBOW.value]
-        right_wrist = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_WRIST.value]
-        
-        # Get hip landmarks (added these lines)
-        left_hip = landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP.value]
-        right_hip = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP.value]
-        
-        # Calculate elbow angles
-        left_elbow_angle = calculate_angle(left_shoulder, left_elbow, left_wrist)
-        right_elbow_angle = calculate_angle(right_shoulder, right_elbow, right_wrist)
-        
-        # Calculate shoulder angles (using hips as the third point)
-        left_shoulder_angle = calculate_angle(left_elbow, left_shoulder, left_hip)
-        right_shoulder_angle = calculate_angle(right_elbow, right_shoulder, right_hip)
-        
-        # Get average angles
-        avg_elbow_angle = (left_elbow_angle + right_elbow_angle) / 2
-        avg_shoulder_angle = (left_shoulder_angle + right_shoulder_angle) / 2
-        
-        # Push-up logic
-        if avg_elbow_angle > 160 and avg_shoulder_angle > 160:
-            st.session_state.exercise_stage = "up"
-            
-        if avg_elbow_angle < 70 and st.session_state.exercise_stage == "up":
-            st.session_state.exercise_stage = "down"
-            st.session_state.counter += 1
-            cv2.putText(image, "REP COUNTED!", (image.shape[1]//2 - 100, 50), 
-                       cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 255, 0), 2)
-        
-        # Visual feedback
-        if st.session_state.exercise_stage == "up":
-            cv2.putText(image, "LOWER YOUR BODY", (image.shape[1]//2 - 120, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 165, 255), 2)
-            cv2.putText(image, f"Elbow Angle: {int(avg_elbow_angle)}°", (10, 60), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        else:
-            cv2.putText(image, "PUSH UP", (image.shape[1]//2 - 70, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
-            cv2.putText(image, f"Elbow Angle: {int(avg_elbow_angle)}°", (10, 60), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        
-        # Draw angles on frame for debugging
-        cv2.putText(image, f"L Elbow: {int(left_elbow_angle)}°", 
-                   (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-        cv2.putText(image, f"R Elbow: {int(right_elbow_angle)}°", 
-                   (10, 120), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-
-    except Exception as e:
-        st.error(f"Push-ups processing error: {e}")
-
-def process_lunges(landmarks, image):
-    """Process lunges exercise"""
-    try:
-        left_hip = landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP.value]
-        left_knee = landmarks.landmark[mp_pose.PoseLandmark.LEFT_KNEE.value]
-        left_ankle = landmarks.landmark[mp_pose.PoseLandmark.LEFT_ANKLE.value]
-        
-        right_hip = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP.value]
-        right_knee = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_KNEE.value]
-        right_ankle = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ANKLE.value]
-        
-        left_knee_angle = calculate_angle(left_hip, left_knee, left_ankle)
-        right_knee_angle = calculate_angle(right_hip, right_knee, right_ankle)
-        
-        if left_knee_angle > 160 and right_knee_angle > 160:
-            st.session_state.exercise_stage = "up"
-            
-        if (left_knee_angle < 90 or right_knee_angle < 90) and st.session_state.exercise_stage == "up":
-            st.session_state.exercise_stage = "down"
-            st.session_state.counter += 1
-            cv2.putText(image, "REP COUNTED!", (image.shape[1]//2 - 100, 50), 
-                       cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 255, 0), 2)
-        
-        if st.session_state.exercise_stage == "up":
-            cv2.putText(image, "STEP FORWARD INTO LUNGE", (image.shape[1]//2 - 180, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 165, 255), 2)
-        else:
-            cv2.putText(image, "RETURN TO START", (image.shape[1]//2 - 120, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-
-    except Exception as e:
-        st.error(f"Lunges processing error: {e}")
-
-def process_bicep_curls(landmarks, image):
-    """Process bicep curls exercise"""
-    try:
-        left_shoulder = landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-        left_elbow = landmarks.landmark[mp_pose.PoseLandmark.LEFT_ELBOW.value]
-        left_wrist = landmarks.landmark[mp_pose.PoseLandmark.LEFT_WRIST.value]
-        
-        right_shoulder = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-        right_elbow = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ELBOW.value]
-        right_wrist = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_WRIST.value]
-        
-        left_elbow_angle = calculate_angle(left_shoulder, left_elbow, left_wrist)
-        right_elbow_angle = calculate_angle(right_shoulder, right_elbow, right_wrist)
-        
-        if left_elbow_angle > 160 and right_elbow_angle > 160:
-            st.session_state.exercise_stage = "down"
-            
-        if (left_elbow_angle < 50 or right_elbow_angle < 50) and st.session_state.exercise_stage == "down":
-            st.session_state.exercise_stage = "up"
-            st.session_state.counter += 1
-            cv2.putText(image, "REP COUNTED!", (image.shape[1]//2 - 100, 50), 
-                       cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 255, 0), 2)
-        
-        if st.session_state.exercise_stage == "down":
-            cv2.putText(image, "CURL YOUR ARMS UP", (image.shape[1]//2 - 140, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 165, 255), 2)
-        else:
-            cv2.putText(image, "LOWER YOUR ARMS", (image.shape[1]//2 - 120, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
-
-    except Exception as e:
-        st.error(f"Bicep curls processing error: {e}")
-
-def process_jumping_jacks(landmarks, image):
-    """Process jumping jacks exercise"""
-    try:
-        left_shoulder = landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-        left_hip = landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP.value]
-        left_wrist = landmarks.landmark[mp_pose.PoseLandmark.LEFT_WRIST.value]
-        
-        right_shoulder = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-        right_hip = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP.value]
-        right_wrist = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_WRIST.value]
-        
-        wrist_distance = calculate_distance(left_wrist, right_wrist)
-        hip_distance = calculate_distance(left_hip, right_hip)
-        
-        if wrist_distance < 0.2 and hip_distance < 0.2:
-            st.session_state.exercise_stage = "closed"
-            
-        if wrist_distance > 0.4 and hip_distance > 0.3 and st.session_state.exercise_stage == "closed":
-            st.session_state.exercise_stage = "open"
-            st.session_state.counter += 1
-            cv2.putText(image, "REP COUNTED!", (image.shape[1]//2 - 100, 50), 
-                       cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 255, 0), 2)
-        
-        if st.session_state.exercise_stage == "closed":
-            cv2.putText(image, "JUMP ARMS AND LEGS OUT", (image.shape[1]//2 - 180, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 165, 255), 2)
-        else:
-            cv2.putText(image, "JUMP ARMS AND LEGS IN", (image.shape[1]//2 - 170, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-
-    except Exception as e:
-        st.error(f"Jumping jacks processing error: {e}")
-
-def process_shoulder_press(landmarks, image):
-    """Simplified shoulder press detection - counts reps more easily"""
-    try:
-        # Get key landmarks
-        left_elbow = landmarks.landmark[mp_pose.PoseLandmark.LEFT_ELBOW.value]
-        left_wrist = landmarks.landmark[mp_pose.PoseLandmark.LEFT_WRIST.value]
-        right_elbow = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ELBOW.value]
-        right_wrist = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_WRIST.value]
-
-        # Simple vertical movement detection
-        avg_wrist_height = (left_wrist.y + right_wrist.y)/2
-        avg_elbow_height = (left_elbow.y + right_elbow.y)/2
-        
-        # Rep counting logic
-        if avg_wrist_height > avg_elbow_height + 0.1:  # Hands below elbows
-            st.session_state.exercise_stage = "down"
-            
-        if avg_wrist_height < avg_elbow_height - 0.1 and st.session_state.exercise_stage == "down":
-            st.session_state.exercise_stage = "up"
-            st.session_state.counter += 1
-            cv2.putText(image, "REP COUNTED!", (image.shape[1]//2 - 100, 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-        
-        # Simple visual feedback
-        cv2.putText(image, f"Reps: {st.session_state.counter}", (10, 30), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
-        cv2.putText(image, "PRESS UP" if st.session_state.exercise_stage == "down" else "LOWER DOWN", 
-                   (image.shape[1]//2 - 80, image.shape[0] - 50), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
-
-    except Exception as e:
-        st.error(f"Shoulder press error: {e}")
-            
-def process_plank(landmarks, image):
-    """Plank exercise with persistent total time display"""
-    try:
-        # Get key landmarks
-        shoulder = landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-        hip = landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP.value]
-        knee = landmarks.landmark[mp_pose.PoseLandmark.LEFT_KNEE.value]
-        elbow = landmarks.landmark[mp_pose.PoseLandmark.LEFT_ELBOW.value]
-        wrist = landmarks.landmark[mp_pose.PoseLandmark.LEFT_WRIST.value]
-
-        # Calculate angles
-        body_angle = calculate_angle(shoulder, hip, knee)
-        elbow_angle = calculate_angle(shoulder, elbow, wrist)
-
-        # Form verification (lenient)
-        is_plank = (wrist.y > elbow.y) and (60 < elbow_angle < 150) and (150 < body_angle < 210)
-
-        # Initialize session variables
-        if 'total_plank_time' not in st.session_state:
-            st.session_state.total_plank_time = 0
-        if 'last_plank_end' not in st.session_state:
-            st.session_state.last_plank_end = 0
-        if 'show_total_time' not in st.session_state:
-            st.session_state.show_total_time = False
-
-        # When in plank position
-        if is_plank:
-            if 'plank_start_time' not in st.session_state:
-                st.session_state.plank_start_time = time.time()
-                st.session_state.show_total_time = False
-            
-            hold_time = time.time() - st.session_state.plank_start_time
-            cv2.putText(image, f"CURRENT: {int(hold_time)}s", (image.shape[1]//2 - 100, 50), 
-                      cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            
-            # Show total time in smaller font below current time
-            cv2.putText(image, f"TOTAL: {int(st.session_state.total_plank_time)}s", 
-                       (image.shape[1]//2 - 80, 90), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 200), 2)
-            
-        # When breaking plank position
-        else:
-            if 'plank_start_time' in st.session_state:
-                # Add to total time
-                st.session_state.total_plank_time += time.time() - st.session_state.plank_start_time
-                st.session_state.last_plank_end = time.time()
-                st.session_state.show_total_time = True
-                del st.session_state.plank_start_time
-
-            # Show total time for 3 seconds after breaking plank
-            if st.session_state.show_total_time and (time.time() - st.session_state.last_plank_end < 3):
-                cv2.putText(image, f"TOTAL TIME: {int(st.session_state.total_plank_time)}s", 
-                           (image.shape[1]//2 - 120, 100), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 3)
-                cv2.putText(image, "Great effort!", (image.shape[1]//2 - 100, 150), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 200, 255), 2)
-            else:
-                st.session_state.show_total_time = False
-
-            # Form feedback
-            cv2.putText(image, "Get ready for next plank!", (image.shape[1]//2 - 150, 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
-
-    except Exception as e:
-        st.error(f"Error tracking plank: {e}")
+# Exercise rules are defined as data in exercises.EXERCISE_RULES and evaluated
+# by the rule engine in rules.py.
 
 # ===== YOGA POSE CHECKING FUNCTIONS =====
 
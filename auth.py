@@ -1,5 +1,6 @@
 import streamlit as st
 from database import authenticate_user, register_user
+from session_store import start_session
 
 def login_page():
     """Login page with secure authentication"""
@@ -20,6 +21,8 @@ def login_page():
                 if authenticate_user(username, password):
                     st.session_state.logged_in = True
                     st.session_state.username = username
+                    # Survives a browser refresh or reconnect
+                    start_session(username)
                     st.success("Logged in successfully!")
                     st.rerun()
                 else:
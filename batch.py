@@ -0,0 +1,296 @@
+"""Headless scoring of recorded exercise and yoga videos.
+
+Runs the same rule functions as the live Streamlit feeds over video files,
+as fast as decoding and inference allow, and writes rep counts, hold times
+and per-frame feedback to JSON and/or CSV.
+
+    python batch.py session1.mp4 session2.mp4 --exercise Squats --json out.json
+    python batch.py videos/*.mp4 --yoga "Tree Pose" --csv frames.csv
+    python batch.py uploads/ --exercise Plank --workers 0 --json out.json
+
+With --workers, videos are sharded across a process pool. Each worker owns
+one Pose graph for its whole lifetime and results stream back in completion
+order.
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+from pose_pool import create_pose
+from tracking import SMOOTHING, LandmarkFilter
+from utils import NUM_LANDMARKS, SessionState, landmarks_to_array
+
+FRAME_FIELDS = ["video", "frame", "time", "detected", "stage", "counter", "feedback"]
+
+# Per-process state for pool workers, set up once by _init_worker
+_worker = {}
+
+
+def resolve_activity(exercise=None, yoga_pose=None):
+    """Return (kind, name, rule function) for an exercise or a yoga pose"""
+    if exercise:
+        from exercises import EXERCISE_PROCESSORS
+        if exercise not in EXERCISE_PROCESSORS:
+            raise ValueError(f"Unknown exercise '{exercise}'. Choose from: {', '.join(EXERCISE_PROCESSORS)}")
+        return "exercise", exercise, EXERCISE_PROCESSORS[exercise]
+    from yoga import YOGA_CHECKS
+    if yoga_pose not in YOGA_CHECKS:
+        raise ValueError(f"Unknown yoga pose '{yoga_pose}'. Choose from: {', '.join(YOGA_CHECKS)}")
+    return "yoga", yoga_pose, YOGA_CHECKS[yoga_pose]
+
+
+def analyze_video(path, activity, pose, keep_frames=True, smoothing=SMOOTHING):
+    """Score one video file and return its summary and per-frame records"""
+    kind, name, rule = activity
+    # Smooth as the live feeds do, so counts match between the two
+    smoother = LandmarkFilter() if smoothing else None
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Unable to open video: {path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    state = SessionState(counter=0, exercise_stage="start")
+    landmark_buffer = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+    frames = []
+    frame_index = 0
+    detected = 0
+    hold_time = 0.0
+    longest_hold = 0.0
+    current_hold = 0.0
+    started = time.perf_counter()
+
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            # Video time, not wall-clock time, drives hold timers
+            timestamp = frame_index / fps
+            results = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+            feedback = ""
+            if not results.pose_landmarks and smoother is not None:
+                smoother.reset()
+            if results.pose_landmarks:
+                detected += 1
+                landmarks = landmarks_to_array(results.pose_landmarks, landmark_buffer)
+                if smoother is not None:
+                    landmarks = smoother(landmarks, timestamp)
+                if kind == "exercise":
+                    rule(landmarks, frame, state, timestamp)
+                else:
+                    feedback = rule(landmarks, frame)
+
+            if kind == "yoga":
+                if "GOOD" in feedback:
+                    hold_time += 1.0 / fps
+                    current_hold += 1.0 / fps
+                    longest_hold = max(longest_hold, current_hold)
+                else:
+                    current_hold = 0.0
+
+            if keep_frames:
+                frames.append({
+                    "frame": frame_index,
+                    "time": round(timestamp, 3),
+                    "detected": bool(results.pose_landmarks),
+                    "stage": state.exercise_stage if kind == "exercise" else "",
+                    "counter": state.counter if kind == "exercise" else 0,
+                    "feedback": feedback,
+                })
+            frame_index += 1
+    finally:
+        cap.release()
+
+    elapsed = time.perf_counter() - started
+    duration = frame_index / fps
+
+    # Close a plank that is still being held when the video ends
+    if "plank_start_time" in state:
+        state.total_plank_time += duration - state.plank_start_time
+        del state.plank_start_time
+
+    summary = {
+        "video": path,
+        "kind": kind,
+        "activity": name,
+        "frames": frame_index,
+        "frames_with_pose": detected,
+        "duration_s": round(duration, 3),
+        "processing_s": round(elapsed, 3),
+        "processing_fps": round(frame_index / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+    if kind == "exercise":
+        summary["reps"] = state.counter
+        summary["hold_s"] = round(state.get("total_plank_time", 0.0), 3)
+    else:
+        summary["hold_s"] = round(hold_time, 3)
+        summary["longest_hold_s"] = round(longest_hold, 3)
+    return {"summary": summary, "frames": frames}
+
+
+def write_json(path, results):
+    """Write summaries and per-frame records for every video to a JSON file"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"videos": results}, f, indent=2, ensure_ascii=False)
+
+
+def write_csv(path, results):
+    """Write one CSV row per analyzed frame"""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=FRAME_FIELDS)
+        writer.writeheader()
+        for result in results:
+            video = result["summary"]["video"]
+            for record in result["frames"]:
+                writer.writerow({"video": video, **record})
+
+
+def print_summary(summary, out=sys.stdout):
+    """Print a one-line summary for an analyzed video"""
+    score = f"reps={summary['reps']} " if "reps" in summary else ""
+    print(f"{summary['video']}: {score}hold={summary['hold_s']:.1f}s "
+          f"frames={summary['frames']} fps={summary['processing_fps']}", file=out)
+
+
+def expand_inputs(paths):
+    """Expand directories into the video files they contain"""
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            videos.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.lower().endswith((".mp4", ".avi", ".mov", ".mkv", ".webm"))
+            ))
+        else:
+            videos.append(path)
+    return videos
+
+
+def _init_worker(exercise, yoga_pose):
+    """Build this worker's Pose graph and rule lookup once for its lifetime"""
+    # MediaPipe and OpenCV spawn their own threads; one core per worker scales better
+    cv2.setNumThreads(1)
+    _worker["activity"] = resolve_activity(exercise, yoga_pose)
+    _worker["pose"] = create_pose()
+
+
+def _score_in_worker(path, keep_frames):
+    """Score one video with this worker's long-lived Pose graph"""
+    pose = _worker["pose"]
+    pose.reset()
+    result = analyze_video(path, _worker["activity"], pose, keep_frames)
+    result["worker"] = os.getpid()
+    return result
+
+
+def score_videos(paths, exercise=None, yoga_pose=None, workers=1, keep_frames=True):
+    """Yield (path, result or exception) for each video in completion order"""
+    if workers == 1:
+        activity = resolve_activity(exercise, yoga_pose)
+        pose = create_pose()
+        try:
+            for path in paths:
+                pose.reset()
+                try:
+                    result = analyze_video(path, activity, pose, keep_frames)
+                except Exception as e:
+                    yield path, e
+                    continue
+                result["worker"] = os.getpid()
+                yield path, result
+        finally:
+            pose.close()
+        return
+
+    # Spawn rather than fork: the parent may already hold running MediaPipe threads
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(exercise, yoga_pose)) as pool:
+        futures = {pool.submit(_score_in_worker, path, keep_frames): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as e:
+                yield futures[future], e
+
+
+def worker_stats(results):
+    """Aggregate videos, frames and throughput per worker process"""
+    stats = defaultdict(lambda: {"videos": 0, "frames": 0, "processing_s": 0.0})
+    for result in results:
+        entry = stats[result["worker"]]
+        entry["videos"] += 1
+        entry["frames"] += result["summary"]["frames"]
+        entry["processing_s"] += result["summary"]["processing_s"]
+    for entry in stats.values():
+        busy = entry["processing_s"]
+        entry["fps"] = round(entry["frames"] / busy, 1) if busy > 0 else 0.0
+    return dict(stats)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Score recorded exercise and yoga videos headlessly")
+    parser.add_argument("videos", nargs="+", help="video files or directories of videos")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--exercise", help="exercise name, e.g. 'Squats'")
+    target.add_argument("--yoga", help="yoga pose name, e.g. 'Tree Pose'")
+    parser.add_argument("--json", help="write summaries and per-frame feedback to this JSON file")
+    parser.add_argument("--csv", help="write per-frame feedback to this CSV file")
+    parser.add_argument("--summary-only", action="store_true", help="do not keep per-frame records")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes (0 = one per CPU core)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        resolve_activity(args.exercise, args.yoga)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    videos = expand_inputs(args.videos)
+    workers = args.workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(videos)))
+    keep_frames = not args.summary_only and bool(args.json or args.csv)
+    results = []
+    total_frames = 0
+    started = time.perf_counter()
+
+    for path, result in score_videos(videos, args.exercise, args.yoga, workers, keep_frames):
+        if isinstance(result, Exception):
+            print(f"{path}: {result}", file=sys.stderr)
+            continue
+        print_summary(result["summary"])
+        total_frames += result["summary"]["frames"]
+        results.append(result)
+
+    elapsed = time.perf_counter() - started
+    print(f"Analyzed {len(results)} video(s), {total_frames} frames in {elapsed:.1f}s "
+          f"({total_frames / elapsed if elapsed > 0 else 0:.1f} fps) with {workers} worker(s)")
+    if workers > 1:
+        for pid, entry in sorted(worker_stats(results).items()):
+            print(f"  worker {pid}: {entry['videos']} video(s), {entry['frames']} frames, "
+                  f"{entry['fps']} fps")
+
+    if args.json:
+        write_json(args.json, results)
+    if args.csv:
+        write_csv(args.csv, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Dashboard queries on workout_daily vs. GROUP BY over the raw workout events.
+
+Seeds a fresh database with --days of history for --users users: each
+user does a few sets per day, each with reps or holds as
+WorkoutRecorder would record them. The history is written through
+WriteBehindBuffer with update_daily, as the server writes it. Seeding time
+is reported with and without the aggregate upkeep. Then for random users
+the benchmark times:
+
+- a 30-day range of daily totals, from workout_daily and from raw events
+- one activity's full daily history, likewise
+
+It also times a full `rebuild` of workout_daily.
+
+    python benchmarks/bench_aggregates.py --users 200 --days 90
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import database
+import workout_history
+from workout_history import WorkoutRecorder, WriteBehindBuffer, create_tables, local_day, rebuild, update_daily
+
+ACTIVITIES = [("exercise", "Squats"), ("exercise", "Push-ups"), ("exercise", "Plank"), ("yoga", "Tree Pose")]
+
+RAW_DAILY = '''
+    SELECT day, SUM(sets), SUM(reps), SUM(hold_s) FROM (
+        SELECT date(started_at, 'unixepoch', 'localtime') AS day, 1 AS sets, 0 AS reps, 0.0 AS hold_s
+        FROM workout_sets WHERE user_id = ?1
+        UNION ALL
+        SELECT date(e.occurred_at, 'unixepoch', 'localtime'), 0,
+               CASE WHEN e.event = 'rep' THEN 1 ELSE 0 END, CASE WHEN e.event = 'hold' THEN e.value ELSE 0 END
+        FROM workout_events AS e JOIN workout_sets AS s ON s.set_id = e.set_id WHERE s.user_id = ?1
+    ) WHERE day BETWEEN ?2 AND ?3 GROUP BY day ORDER BY day
+'''
+RAW_ACTIVITY = '''
+    SELECT date(e.occurred_at, 'unixepoch', 'localtime') AS day, COUNT(DISTINCT s.set_id),
+           SUM(e.event = 'rep'), SUM(CASE WHEN e.event = 'hold' THEN e.value ELSE 0 END)
+    FROM workout_events AS e JOIN workout_sets AS s ON s.set_id = e.set_id
+    WHERE s.user_id = ? AND s.activity = ? GROUP BY day ORDER BY day
+'''
+
+
+def seed(pool, users, days, aggregate, rng):
+    buffer = WriteBehindBuffer(pool, flush_size=500, on_batch=update_daily if aggregate else None)
+    start = time.time() - days * 86400
+    began = time.perf_counter()
+    for u in range(users):
+        for d in range(days):
+            for _ in range(rng.integers(1, 4)):
+                kind, activity = ACTIVITIES[rng.integers(len(ACTIVITIES))]
+                now = start + d * 86400 + rng.uniform(0, 80000)
+                recorder = WorkoutRecorder(buffer, f"user{u}", kind, activity, now=now)
+                if activity in ("Plank", "Tree Pose"):
+                    recorder.observe_exercise({"counter": 0, "total_plank_time": 0}, now)
+                    recorder.observe_exercise({"counter": 0, "total_plank_time": 30.0}, now + 30)
+                else:
+                    for rep in range(rng.integers(5, 20)):
+                        recorder.observe_exercise({"counter": rep}, now + rep * 2)
+                recorder.finish(now + 60)
+    buffer.close()
+    return time.perf_counter() - began
+
+
+def timed(conn, sql, params, repeat):
+    costs = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        costs.append((time.perf_counter() - began) * 1000)
+    return np.median(costs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args(argv)
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        timings = {}
+        for aggregate in (False, True):
+            database.DB_PATH = os.path.join(tmp, f"aggregate{int(aggregate)}.db")
+            database.initialize_database()
+            for u in range(args.users):
+                database.register_user(f"user{u}", "password")
+            pool = database.get_connection_pool()
+            create_tables(pool)
+            timings[aggregate] = seed(pool, args.users, args.days, aggregate, np.random.default_rng(0))
+
+        with pool.connection() as conn:
+            events = conn.execute("SELECT COUNT(*) FROM workout_events").fetchone()[0]
+            rows = conn.execute("SELECT COUNT(*) FROM workout_daily").fetchone()[0]
+        print(f"{args.users} users x {args.days} days: {events} events, {rows} daily rows")
+        print(f"seed without aggregates {timings[False]:6.2f}s, with {timings[True]:6.2f}s")
+
+        since = local_day(time.time() - 30 * 86400)
+        until = local_day(time.time())
+        results = {"range": [0.0, 0.0], "activity": [0.0, 0.0]}
+        with pool.connection() as conn:
+            for _ in range(args.queries):
+                u = int(rng.integers(args.users))
+                user_id = conn.execute("SELECT id FROM users WHERE username = ?", (f"user{u}",)).fetchone()[0]
+                results["range"][0] += timed(conn, workout_history.SELECT_DAILY, (f"user{u}", since, until), 5)
+                results["range"][1] += timed(conn, RAW_DAILY, (user_id, since, until), 5)
+                results["activity"][0] += timed(conn, workout_history.SELECT_ACTIVITY_DAILY, (f"user{u}", "Squats"), 5)
+                results["activity"][1] += timed(conn, RAW_ACTIVITY, (user_id, "Squats"), 5)
+        for label, (daily, raw) in results.items():
+            print(f"{label:<9} workout_daily {daily / args.queries:7.3f} ms  raw GROUP BY {raw / args.queries:7.3f} ms")
+
+        began = time.perf_counter()
+        rebuilt = rebuild(pool)
+        print(f"rebuild   {rebuilt} rows in {time.perf_counter() - began:6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
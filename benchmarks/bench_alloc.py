@@ -0,0 +1,137 @@
+"""Allocation profile of one feed-loop iteration: per-call arrays vs. pooled buffers.
+
+The legacy loop allocates a flipped frame, an RGB copy for inference, a BGR
+copy to draw on and a channel-swapped copy when the frame is handed to
+st.image with channels="BGR". The pooled loop converts once into a reused
+RGB buffer, draws on it and hands it over as RGB.
+
+Allocations are traced with tracemalloc, which also sees NumPy and OpenCV
+array buffers. For every frame after warm-up, the report gives the transient
+peak above the starting level and the net change. Streamlit's own JPEG
+encoding is identical for both loops and is left out.
+
+    python benchmarks/bench_alloc.py [--frames 120] [--no-pose]
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+from bench_pipeline import CLIP_IMAGES, FRAME_SIZE
+from buffers import BufferPool
+from exercises import EXERCISE_PROCESSORS
+from pose_pool import create_pose
+from tracking import draw_skeleton
+from utils import NUM_LANDMARKS, SessionState, landmarks_to_array
+
+
+def clip_frames(image_path, frames):
+    """Frames of a still image with a slow pan, decoded up front so decoding is not traced"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    source = cv2.imread(os.path.join(root, image_path))
+    width, height = FRAME_SIZE
+    scale = min(width / source.shape[1], height / source.shape[0]) * 0.9
+    out = []
+    for i in range(frames):
+        shift = 20 * np.sin(2 * np.pi * i / frames)
+        matrix = np.float32([[scale, 0, (width - source.shape[1] * scale) / 2 + shift],
+                             [0, scale, (height - source.shape[0] * scale) / 2]])
+        out.append(cv2.warpAffine(source, matrix, FRAME_SIZE, borderValue=(90, 90, 90)))
+    return out
+
+
+class Inference:
+    """Pose graph, or a fixed landmark array when profiling without MediaPipe"""
+
+    def __init__(self, use_pose):
+        self.pose = create_pose() if use_pose else None
+        self.buffer = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+        if self.pose is None:
+            self.fixed = np.random.default_rng(0).uniform(0.2, 0.8, (NUM_LANDMARKS, 4)).astype(np.float32)
+
+    def __call__(self, rgb):
+        if self.pose is None:
+            return self.fixed
+        results = self.pose.process(rgb)
+        return landmarks_to_array(results.pose_landmarks, self.buffer) if results.pose_landmarks else None
+
+    def close(self):
+        if self.pose is not None:
+            self.pose.close()
+
+
+def legacy_iteration(frame, infer, rule, state, now, buffers):
+    frame = cv2.flip(frame, 1)
+    image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    landmarks = infer(image)
+    image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    if landmarks is not None:
+        rule(landmarks, image, state, now)
+        draw_skeleton(image, landmarks)
+    cv2.putText(image, f"Reps: {state.counter}", (10, 30), cv2.FONT_HERSHEY_TRIPLEX, 1, (255, 0, 0), 2)
+    # st.image(..., channels="BGR") reverses the channels with a fancy-indexed copy
+    return image[:, :, [2, 1, 0]]
+
+
+def pooled_iteration(frame, infer, rule, state, now, buffers):
+    frame = buffers.flip(frame, 1)
+    image = buffers.cvt_color(frame, cv2.COLOR_BGR2RGB)
+    landmarks = infer(image)
+    if landmarks is not None:
+        rule(landmarks, image, state, now)
+        draw_skeleton(image, landmarks)
+    cv2.putText(image, f"Reps: {state.counter}", (10, 30), cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 0, 255), 2)
+    return image
+
+
+def profile(iteration, frames, infer, rule, warmup):
+    """Return per-frame (transient peak, net change) in bytes after warm-up"""
+    state = SessionState(counter=0, exercise_stage="start")
+    buffers = BufferPool()
+    peaks, nets = [], []
+    tracemalloc.start()
+    try:
+        for index, frame in enumerate(frames):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            shown = iteration(frame, infer, rule, state, index / 30, buffers)
+            del shown
+            after, peak = tracemalloc.get_traced_memory()
+            if index >= warmup:
+                peaks.append(peak - before)
+                nets.append(after - before)
+    finally:
+        tracemalloc.stop()
+    return np.array(peaks), np.array(nets), buffers.stats()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--exercise", default="Squats", choices=list(EXERCISE_PROCESSORS))
+    parser.add_argument("--no-pose", action="store_true", help="use fixed landmarks instead of MediaPipe")
+    args = parser.parse_args(argv)
+
+    frames = clip_frames(CLIP_IMAGES[args.exercise], args.frames)
+    rule = EXERCISE_PROCESSORS[args.exercise]
+    frame_kb = frames[0].nbytes / 1024
+    print(f"{args.exercise}, {len(frames)} frames of {FRAME_SIZE[0]}x{FRAME_SIZE[1]} ({frame_kb:.0f} KB each)")
+    print(f"{'loop':<8} {'peak p50 KB':>12} {'peak max KB':>12} {'net p50 KB':>11} {'pool buffers':>13}")
+    for name, iteration in (("legacy", legacy_iteration), ("pooled", pooled_iteration)):
+        infer = Inference(not args.no_pose)
+        try:
+            peaks, nets, pool = profile(iteration, frames, infer, rule, args.warmup)
+        finally:
+            infer.close()
+        print(f"{name:<8} {np.median(peaks) / 1024:>12.1f} {peaks.max() / 1024:>12.1f} "
+              f"{np.median(nets) / 1024:>11.1f} {pool['buffers']:>6} ({pool['allocations']} allocs)")
+
+
+if __name__ == "__main__":
+    main()
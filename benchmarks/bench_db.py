@@ -0,0 +1,151 @@
+"""Login load test: a connection per call vs. the pooled WAL database layer.
+
+Each simulated user is a thread that logs in over and over, as a session
+does through authenticate_user(). Every login is a user lookup plus the
+last_login UPDATE. A share of the calls are users_exist() checks, which
+main() makes on every rerun. Both layers run against a fresh copy of the
+same seeded database. "per-call" reproduces the previous database.py: a
+new sqlite3 connection per call and the default rollback journal.
+"pooled" is the current database.py on db_pool.ConnectionPool. The report
+gives logins per second, latency p50/p95/p99 and any errors.
+
+    python benchmarks/bench_db.py --users 100 --seconds 10
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from hashlib import sha256
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import database
+
+
+class PerCallDatabase:
+    """The connect-per-call access pattern database.py used before pooling"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def authenticate_user(self, username, password):
+        conn = self.connect()
+        try:
+            user = conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
+            if user and sha256((password + user['salt']).encode()).hexdigest() == user['password_hash']:
+                conn.execute("UPDATE users SET last_login = ? WHERE id = ?", (datetime.now(), user['id']))
+                conn.commit()
+                return True
+            return False
+        finally:
+            conn.close()
+
+    def users_exist(self):
+        conn = self.connect()
+        try:
+            return conn.execute("SELECT 1 FROM users").fetchone() is not None
+        finally:
+            conn.close()
+
+
+class PooledDatabase:
+    """database.py pointed at a benchmark copy of the database"""
+
+    def __init__(self, path):
+        database.DB_PATH = path
+        database.initialize_database()
+
+    def authenticate_user(self, username, password):
+        return database.authenticate_user(username, password)
+
+    def users_exist(self):
+        return database.users_exist()
+
+
+def seed(path, users):
+    """Create the schema and users, in rollback-journal mode as the old layer left the file"""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL UNIQUE, "
+                     "password_hash TEXT NOT NULL, salt TEXT NOT NULL, "
+                     "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, last_login TIMESTAMP)")
+        rows = []
+        for i in range(users):
+            password_hash, salt = database.hash_password(f"password{i}")
+            rows.append((f"user{i}", password_hash, salt))
+        conn.executemany("INSERT INTO users (username, password_hash, salt) VALUES (?, ?, ?)", rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def run_user(db, index, seconds, exist_checks, start, results):
+    latencies, errors, logins = [], 0, 0
+    start.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        began = time.perf_counter()
+        try:
+            for _ in range(exist_checks):
+                db.users_exist()
+            if db.authenticate_user(f"user{index}", f"password{index}"):
+                logins += 1
+            else:
+                errors += 1
+        except sqlite3.Error:
+            errors += 1
+        latencies.append((time.perf_counter() - began) * 1000)
+    results[index] = (logins, errors, latencies)
+
+
+def run(label, db, users, seconds, exist_checks):
+    start = threading.Event()
+    results = [None] * users
+    threads = [threading.Thread(target=run_user, args=(db, i, seconds, exist_checks, start, results))
+               for i in range(users)]
+    for thread in threads:
+        thread.start()
+    start.set()
+    for thread in threads:
+        thread.join()
+    logins = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    latencies = np.concatenate([r[2] for r in results if r[2]])
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"{label:<9} {logins / seconds:8.1f} logins/s  p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  "
+          f"p99 {p99:7.2f} ms  errors {errors}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100, help="concurrent simulated users")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--exist-checks", type=int, default=2, help="users_exist() calls per login")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        seeded = os.path.join(tmp, "seed.db")
+        seed(seeded, args.users)
+        print(f"{args.users} concurrent users for {args.seconds:.0f}s, "
+              f"{args.exist_checks} users_exist() per login")
+        for label, layer in (("per-call", PerCallDatabase), ("pooled", PooledDatabase)):
+            path = os.path.join(tmp, f"{label}.db")
+            shutil.copy(seeded, path)
+            run(label, layer(path), args.users, args.seconds, args.exist_checks)
+        print(f"pool: {database.get_connection_pool().stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Concurrent sessions: per-session threads vs. the micro-batching inference service.
+
+Each simulated session sends frames from its activity's clip as fast as
+results come back, for a fixed duration. In "threads" mode every session
+runs its own Pose graph on its own thread, as the live feeds do with the
+pool. In "service" mode the sessions are RemotePose clients of an
+inference_service.py process started for the run. The report gives the
+total throughput, per-session fps (min/max, for fairness) and the
+latency p50/p95. In service mode it also gives the queue wait, inference
+and transport split and the mean batch size. Before timing, service mode
+runs one clip through LandmarkTracker on a RemotePose, as the live feeds
+use it, and fails if the tracker errors or never returns landmarks.
+
+    python benchmarks/bench_inference_service.py --sessions 20 --seconds 10
+"""
+import argparse
+import multiprocessing
+import os
+import secrets
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from bench_alloc import clip_frames
+from bench_pipeline import CLIP_IMAGES
+from inference_service import InferenceService, RemotePose
+from pose_pool import create_pose
+from tracking import LandmarkTracker
+
+
+def run_service(address, window_ms, max_batch, authkey, ready):
+    service = InferenceService(address, window_ms=window_ms, max_batch=max_batch, authkey=authkey)
+    ready.set()
+    service.serve_forever()
+
+
+def run_session(make_pose, frames, seconds, start, results, index):
+    pose = make_pose()
+    latencies = []
+    try:
+        start.wait()
+        deadline = time.perf_counter() + seconds
+        i = 0
+        while time.perf_counter() < deadline:
+            began = time.perf_counter()
+            pose.process(frames[i % len(frames)])
+            latencies.append((time.perf_counter() - began) * 1000)
+            i += 1
+        results[index] = {"frames": i, "latencies": latencies,
+                          "remote": pose.stats() if isinstance(pose, RemotePose) else None}
+    finally:
+        pose.close()
+
+
+def check_tracker(address, authkey, frames, crop_size=256):
+    """Feed a clip through LandmarkTracker on a RemotePose; returns the frames with landmarks"""
+    pose = RemotePose(address, authkey=authkey)
+    try:
+        # crop_size also exercises the ROI path and its fallback to the full frame
+        tracker = LandmarkTracker(pose, crop_size=crop_size)
+        detected = sum(tracker.process(frame, i / 30) is not None for i, frame in enumerate(frames))
+    finally:
+        pose.close()
+    return detected
+
+
+def run(mode, sessions, seconds, clips, address, authkey=None):
+    make_pose = (lambda: RemotePose(address, authkey=authkey)) if mode == "service" else create_pose
+    start = threading.Event()
+    results = [None] * sessions
+    threads = [threading.Thread(target=run_session,
+                                args=(make_pose, clips[i % len(clips)], seconds, start, results, i))
+               for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    # Let every session create its graph or connect before the clock starts
+    time.sleep(2.0)
+    start.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def report(mode, results, seconds):
+    counts = np.array([r["frames"] for r in results])
+    latencies = np.concatenate([r["latencies"] for r in results])
+    p50, p95 = np.percentile(latencies, [50, 95])
+    print(f"{mode:<8} total {counts.sum() / seconds:6.1f} fps | per session {counts.min() / seconds:5.1f}"
+          f"-{counts.max() / seconds:5.1f} fps | latency p50 {p50:7.1f} ms p95 {p95:7.1f} ms")
+    remote = [r["remote"] for r in results if r["remote"]]
+    if remote:
+        queue = np.mean([r["queue"]["p50"] for r in remote])
+        inference = np.mean([r["inference"]["p50"] for r in remote])
+        transport = np.mean([r["transport_p50"] for r in remote])
+        batch = np.mean([r["mean_batch"] for r in remote])
+        print(f"{'':<8} queue p50 {queue:.1f} ms, inference p50 {inference:.1f} ms, "
+              f"transport p50 {transport:.1f} ms, mean batch {batch:.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--mode", choices=("threads", "service", "both"), default="both")
+    parser.add_argument("--address", default="127.0.0.1:6017")
+    parser.add_argument("--window-ms", type=float, default=4.0)
+    parser.add_argument("--max-batch", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    # RGB frames, as the feeds pass them to inference
+    clips = [np.ascontiguousarray(np.stack(clip_frames(path, 60))[..., ::-1])
+             for path in list(CLIP_IMAGES.values())[:4]]
+    print(f"{args.sessions} sessions for {args.seconds:.0f}s on {os.cpu_count()} CPU(s)")
+    if args.mode in ("threads", "both"):
+        report("threads", run("threads", args.sessions, args.seconds, clips, None), args.seconds)
+    if args.mode in ("service", "both"):
+        # A one-off key; the service is only reachable by this benchmark
+        authkey = secrets.token_bytes(32)
+        ready = multiprocessing.Event()
+        service = multiprocessing.Process(target=run_service, daemon=True,
+                                          args=(args.address, args.window_ms, args.max_batch, authkey, ready))
+        service.start()
+        try:
+            ready.wait(30)
+            detected = check_tracker(args.address, authkey, clips[0])
+            print(f"tracker on RemotePose: landmarks in {detected}/{len(clips[0])} frames")
+            if not detected:
+                raise SystemExit("LandmarkTracker found no person through RemotePose")
+            report("service", run("service", args.sessions, args.seconds, clips, args.address, authkey),
+                   args.seconds)
+        finally:
+            service.terminate()
+            service.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Micro-benchmark: per-joint protobuf access vs. the NumPy landmark fast path.
+
+The legacy path resolves each joint through `mp_pose.PoseLandmark.X.value`,
+indexes the protobuf list and calls the scalar `calculate_angle` per triplet.
+The fast path converts the frame once with `landmarks_to_array` and evaluates
+every triplet with one `calculate_angles` call.
+
+    python benchmarks/bench_landmarks.py [--frames 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import mediapipe as mp
+from mediapipe.framework.formats import landmark_pb2
+
+from utils import NUM_LANDMARKS, calculate_angle, calculate_angles, joint_indices, landmarks_to_array
+
+mp_pose = mp.solutions.pose
+
+# Joint triplets evaluated per frame by representative rules
+CASES = {
+    "Squats": [("LEFT_HIP", "LEFT_KNEE", "LEFT_ANKLE"), ("RIGHT_HIP", "RIGHT_KNEE", "RIGHT_ANKLE")],
+    "Push-ups": [("LEFT_SHOULDER", "LEFT_ELBOW", "LEFT_WRIST"), ("RIGHT_SHOULDER", "RIGHT_ELBOW", "RIGHT_WRIST"),
+                 ("LEFT_ELBOW", "LEFT_SHOULDER", "LEFT_HIP"), ("RIGHT_ELBOW", "RIGHT_SHOULDER", "RIGHT_HIP")],
+    "Plank": [("LEFT_SHOULDER", "LEFT_HIP", "LEFT_KNEE"), ("LEFT_SHOULDER", "LEFT_ELBOW", "LEFT_WRIST")],
+    "All joints": [("LEFT_HIP", "LEFT_KNEE", "LEFT_ANKLE"), ("RIGHT_HIP", "RIGHT_KNEE", "RIGHT_ANKLE"),
+                   ("LEFT_SHOULDER", "LEFT_ELBOW", "LEFT_WRIST"), ("RIGHT_SHOULDER", "RIGHT_ELBOW", "RIGHT_WRIST"),
+                   ("LEFT_ELBOW", "LEFT_SHOULDER", "LEFT_HIP"), ("RIGHT_ELBOW", "RIGHT_SHOULDER", "RIGHT_HIP"),
+                   ("LEFT_SHOULDER", "LEFT_HIP", "LEFT_KNEE"), ("RIGHT_SHOULDER", "RIGHT_HIP", "RIGHT_KNEE")],
+}
+
+
+def random_landmarks(seed=0):
+    """Build a pose landmark list shaped like MediaPipe output"""
+    rng = random.Random(seed)
+    landmarks = landmark_pb2.NormalizedLandmarkList()
+    for _ in range(NUM_LANDMARKS):
+        lm = landmarks.landmark.add()
+        lm.x, lm.y, lm.z = rng.random(), rng.random(), rng.random() - 0.5
+        lm.visibility, lm.presence = rng.random(), rng.random()
+    return landmarks
+
+
+def legacy_path(landmarks, triplets):
+    """Per-joint enum resolution, protobuf indexing and scalar angles"""
+    return [
+        calculate_angle(landmarks.landmark[getattr(mp_pose.PoseLandmark, a).value],
+                        landmarks.landmark[getattr(mp_pose.PoseLandmark, b).value],
+                        landmarks.landmark[getattr(mp_pose.PoseLandmark, c).value])
+        for a, b, c in triplets
+    ]
+
+
+def fast_path(landmarks, compiled, buffer):
+    """One conversion to a (33, 4) array and one batched angle call"""
+    return calculate_angles(landmarks_to_array(landmarks, buffer), compiled)
+
+
+def best_of(func, number, repeat=5):
+    """Best per-call time in microseconds"""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=20000, help="frames per timing run")
+    args = parser.parse_args(argv)
+
+    landmarks = random_landmarks()
+    buffer = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+    print(f"{'case':<12} {'angles':>6} {'legacy us':>10} {'numpy us':>10} {'speedup':>8}")
+    for name, triplets in CASES.items():
+        compiled = joint_indices(*[tuple(getattr(mp_pose.PoseLandmark, j).value for j in t) for t in triplets])
+        assert np.allclose(legacy_path(landmarks, triplets), fast_path(landmarks, compiled, buffer), atol=1e-3)
+        legacy = best_of(lambda: legacy_path(landmarks, triplets), args.frames)
+        fast = best_of(lambda: fast_path(landmarks, compiled, buffer), args.frames)
+        print(f"{name:<12} {len(triplets):>6} {legacy:>10.2f} {fast:>10.2f} {legacy / fast:>7.2f}x")
+
+    convert = best_of(lambda: landmarks_to_array(landmarks, buffer), args.frames)
+    print(f"\nlandmarks_to_array alone: {convert:.2f} us per frame")
+
+
+if __name__ == "__main__":
+    main()
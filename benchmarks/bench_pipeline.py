@@ -0,0 +1,276 @@
+"""Per-stage benchmark of the live feed pipeline for every exercise and yoga pose.
+
+Each activity's clip is run through the same stages as the live feeds:
+decode, flip and BGR->RGB into pooled buffers, pose inference, landmark
+conversion, rule evaluation, skeleton drawing, HUD text and display encoding.
+In the feeds, encoding runs on the display thread at a capped rate; here
+it is timed on every frame. p50/p95/p99 per stage and fps are reported, and
+--json writes the results for comparison between commits.
+
+Without --clip, short clips are synthesized from the bundled exercise and
+yoga images with a slow pan and zoom so the tracker has motion to follow.
+
+    python benchmarks/bench_pipeline.py --json before.json
+    python benchmarks/bench_pipeline.py --json after.json --compare before.json
+    python benchmarks/bench_pipeline.py --only Squats --clip Squats=session.mp4
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cv2
+import numpy as np
+import mediapipe as mp
+
+from buffers import BufferPool
+from display import encode_frame
+from exercises import EXERCISE_PROCESSORS
+from overlay import put_text
+from pose_pool import create_pose
+from tracking import draw_skeleton
+from utils import NUM_LANDMARKS, SessionState, landmarks_to_array
+from yoga import YOGA_CHECKS
+
+STAGES = ["decode", "flip", "to_rgb", "pose", "landmarks", "rules", "draw", "text", "encode"]
+FRAME_SIZE = (640, 480)
+
+# Bundled still image used to synthesize each activity's clip
+CLIP_IMAGES = {
+    "Squats": "exercise/squat-exercise-men-workout-fitness-aerobic-and-exercises-vector.jpg",
+    "Hand Raises": "exercise/hand raise.jpg",
+    "Push-ups": "exercise/plankk.jpg",
+    "Lunges": "exercise/lunges.jpg",
+    "Bicep Curls": "exercise/bicep-curls.webp",
+    "Jumping Jacks": "exercise/jumping jacks.webp",
+    "Shoulder Press": "exercise/shoulder press.jpg",
+    "Plank": "exercise/plankk.jpg",
+    "Tree Pose": "yoga poses/treepose.jpeg",
+    "Warrior II": "yoga poses/warrior.jpeg",
+    "Downward Dog": "yoga poses/downward dog.jpeg",
+    "Cobra Pose": "yoga poses/cobra.jpeg",
+    "Bridge Pose": "yoga poses/bridge.jpeg",
+    "Child's Pose": "yoga poses/child pose (1).jpeg",
+    "Mountain Pose": "yoga poses/mountain.jpeg",
+    "Cat-Cow": "yoga poses/cat cow.jpeg",
+    "Easy Pose": "yoga poses/easypose.jpeg",
+    "Seated Forward Bend": "yoga poses/seated forward bend.jpeg",
+    "Legs-Up-the-Wall": "yoga poses/legs up the wall.jpeg",
+}
+
+
+def synthesize_clip(image_path, out_path, frames, fps=30):
+    """Write a clip of a still image fitted to the frame with a slow pan and zoom"""
+    source = cv2.imread(os.path.join(ROOT, image_path))
+    if source is None:
+        raise IOError(f"Unable to read bundled image: {image_path}")
+    width, height = FRAME_SIZE
+    scale = min(width / source.shape[1], height / source.shape[0]) * 0.9
+    writer = cv2.VideoWriter(out_path, cv2.VideoWriter_fourcc(*"MJPG"), fps, FRAME_SIZE)
+    try:
+        for i in range(frames):
+            phase = 2 * np.pi * i / frames
+            zoom = scale * (1 + 0.05 * np.sin(phase))
+            matrix = np.float32([
+                [zoom, 0, (width - source.shape[1] * zoom) / 2 + 20 * np.sin(phase)],
+                [0, zoom, (height - source.shape[0] * zoom) / 2 + 10 * np.cos(phase)],
+            ])
+            writer.write(cv2.warpAffine(source, matrix, FRAME_SIZE, borderValue=(90, 90, 90)))
+    finally:
+        writer.release()
+    return out_path
+
+
+def run_clip(path, kind, rule, pose, warmup):
+    """Time every pipeline stage for each frame of one clip, in milliseconds"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Unable to open video: {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    state = SessionState(counter=0, exercise_stage="start")
+    buffer = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+    buffers = BufferPool()
+    timings = {stage: [] for stage in STAGES}
+    clock = time.perf_counter
+    index = 0
+    detected = 0
+    try:
+        while True:
+            sample = {}
+            t0 = clock()
+            ret, frame = cap.read()
+            t1 = clock()
+            if not ret:
+                break
+            sample["decode"] = t1 - t0
+
+            frame = buffers.flip(frame, 1)
+            t2 = clock()
+            sample["flip"] = t2 - t1
+
+            image = buffers.cvt_color(frame, cv2.COLOR_BGR2RGB)
+            t3 = clock()
+            sample["to_rgb"] = t3 - t2
+
+            results = pose.process(image)
+            t4 = clock()
+            sample["pose"] = t4 - t3
+
+            landmarks = landmarks_to_array(results.pose_landmarks, buffer) if results.pose_landmarks else None
+            t5 = clock()
+            sample["landmarks"] = t5 - t4
+
+            if landmarks is not None:
+                detected += 1
+                if kind == "exercise":
+                    rule(landmarks, image, state, index / fps)
+                else:
+                    rule(landmarks, image)
+            t6 = clock()
+            sample["rules"] = t6 - t5
+
+            if landmarks is not None:
+                draw_skeleton(image, landmarks)
+            t7 = clock()
+            sample["draw"] = t7 - t6
+
+            if kind == "exercise":
+                put_text(image, f"Reps: {state.counter}", (10, 30),
+                         cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 0, 255), 2)
+            t8 = clock()
+            sample["text"] = t8 - t7
+
+            encode_frame(image, buffers=buffers)
+            sample["encode"] = clock() - t8
+
+            if index >= warmup:
+                for stage, seconds in sample.items():
+                    timings[stage].append(seconds * 1000)
+            index += 1
+    finally:
+        cap.release()
+    return timings, index, detected
+
+
+def summarize(samples):
+    """Return p50/p95/p99/mean in milliseconds and the fps the mean allows"""
+    values = np.asarray(samples)
+    if not len(values):
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "fps": 0.0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    mean = float(values.mean())
+    return {
+        "p50": round(float(p50), 4),
+        "p95": round(float(p95), 4),
+        "p99": round(float(p99), 4),
+        "mean": round(mean, 4),
+        "fps": round(1000 / mean, 1) if mean > 0 else 0.0,
+    }
+
+
+def git_revision():
+    """Short commit hash of the tree being benchmarked, if available"""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment(args):
+    return {
+        "commit": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "mediapipe": mp.__version__,
+        "numpy": np.__version__,
+        "frames": args.frames,
+        "warmup": args.warmup,
+        "model_complexity": args.model_complexity,
+    }
+
+
+def print_table(name, frames, detected, stages):
+    print(f"\n{name}  ({frames} frames, pose found in {detected})")
+    print(f"  {'stage':<10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'fps':>9}")
+    for stage, stats in stages.items():
+        print(f"  {stage:<10} {stats['p50']:>9.3f} {stats['p95']:>9.3f} {stats['p99']:>9.3f} {stats['fps']:>9.1f}")
+
+
+def print_comparison(current, baseline):
+    """Print p50 changes against an earlier JSON result"""
+    print(f"\nChange in p50 vs. {baseline['meta'].get('commit') or 'baseline'}")
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if not before:
+            continue
+        changes = []
+        for stage, stats in result["stages"].items():
+            old = before["stages"].get(stage, {}).get("p50")
+            if old:
+                changes.append(f"{stage} {100 * (stats['p50'] - old) / old:+.0f}%")
+        print(f"  {name}: " + ", ".join(changes))
+
+
+def parse_clip(value):
+    name, sep, path = value.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError("expected ACTIVITY=PATH")
+    return name, path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=120, help="frames per synthesized clip")
+    parser.add_argument("--warmup", type=int, default=10, help="leading frames excluded from timings")
+    parser.add_argument("--only", action="append", help="benchmark only this activity (repeatable)")
+    parser.add_argument("--clip", action="append", type=parse_clip, default=[],
+                        help="use a recorded clip for an activity, as ACTIVITY=PATH (repeatable)")
+    parser.add_argument("--model-complexity", type=int, default=1, choices=(0, 1, 2))
+    parser.add_argument("--json", help="write results to this JSON file")
+    parser.add_argument("--compare", help="earlier JSON result to compare p50 timings against")
+    args = parser.parse_args(argv)
+
+    activities = [("exercise", name, rule) for name, rule in EXERCISE_PROCESSORS.items()]
+    activities += [("yoga", name, rule) for name, rule in YOGA_CHECKS.items()]
+    if args.only:
+        activities = [a for a in activities if a[1] in args.only]
+    clips = dict(args.clip)
+
+    output = {"meta": environment(args), "results": {}}
+    pose = create_pose(args.model_complexity)
+    try:
+        with tempfile.TemporaryDirectory() as clip_dir:
+            for kind, name, rule in activities:
+                path = clips.get(name) or synthesize_clip(
+                    CLIP_IMAGES[name], os.path.join(clip_dir, f"{len(output['results'])}.avi"), args.frames)
+                pose.reset()
+                timings, frames, detected = run_clip(path, kind, rule, pose, args.warmup)
+                total = np.sum([timings[stage] for stage in STAGES], axis=0) if frames > args.warmup else []
+                stages = {stage: summarize(timings[stage]) for stage in STAGES}
+                stages["total"] = summarize(total)
+                output["results"][name] = {"kind": kind, "clip": clips.get(name, CLIP_IMAGES[name]),
+                                           "frames": frames, "detected": detected, "stages": stages}
+                print_table(name, frames, detected, stages)
+    finally:
+        pose.close()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2, ensure_ascii=False)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(output, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
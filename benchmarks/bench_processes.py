@@ -0,0 +1,124 @@
+"""Throughput of the single-thread feed loop vs. the three-process pipeline.
+
+Both runs take the same synthesized clip through decode, BGR->RGB,
+tracking, the activity's rule, skeleton and HUD drawing and JPEG encoding.
+The single-thread loop does every stage in turn, as the feeds do without
+FEED_PROCESSES. The process run uses ProcessPipeline with a blocking
+capture stage, so no frame is dropped, and with no display rate cap, so
+every frame is encoded. The report gives fps and the capture-to-encoded
+latency p50/p95 for each.
+
+    python benchmarks/bench_processes.py --activity Squats --frames 300
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+from batch import resolve_activity
+from bench_pipeline import CLIP_IMAGES, synthesize_clip
+from buffers import BufferPool
+from display import encode_frame
+from overlay import put_text
+from pose_pool import create_pose
+from process_pipeline import ProcessPipeline
+from tracking import SMOOTHING, InferenceScheduler, LandmarkFilter, LandmarkTracker, draw_skeleton
+from utils import SessionState
+
+
+def run_single_thread(path, kind, name, model_complexity):
+    """Return (frames, seconds, latencies in ms) for the in-process loop"""
+    kind, name, rule = resolve_activity(name if kind == "exercise" else None, name if kind == "yoga" else None)
+    tracker = LandmarkTracker(create_pose(model_complexity),
+                              InferenceScheduler(max_interval=3 if kind == "exercise" else 6),
+                              smoother=LandmarkFilter() if SMOOTHING else None)
+    state = SessionState(counter=0, exercise_stage="start")
+    buffers = BufferPool()
+    cap = cv2.VideoCapture(path)
+    latencies = []
+    started = time.perf_counter()
+    try:
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            captured = time.monotonic()
+            image = buffers.cvt_color(frame, cv2.COLOR_BGR2RGB)
+            landmarks = tracker.process(image, captured)
+            if landmarks is not None:
+                if kind == "exercise":
+                    rule(landmarks, image, state, captured)
+                else:
+                    rule(landmarks, image)
+                draw_skeleton(image, landmarks)
+            if kind == "exercise":
+                put_text(image, f"Reps: {state.counter}", (10, 30), cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 0, 255), 2)
+            encode_frame(image, buffers=buffers)
+            latencies.append((time.monotonic() - captured) * 1000)
+    finally:
+        cap.release()
+        tracker.pose.close()
+    return len(latencies), time.perf_counter() - started, latencies
+
+
+def run_processes(path, kind, name, model_complexity, slots):
+    """Return (frames, seconds, latencies in ms, stats) for ProcessPipeline"""
+    pipeline = ProcessPipeline(kind, name, source=path, initial_state={"counter": 0, "exercise_stage": "start"},
+                               model_complexity=model_complexity, slots=slots, drop_when_full=False, fps=0)
+    pipeline.start()
+    latencies = []
+    started = None
+    try:
+        while True:
+            # The first frame waits for the children to import MediaPipe and build the graph
+            try:
+                rendered = pipeline.read(timeout=60.0)
+            except EOFError:
+                break
+            if rendered is None:
+                raise RuntimeError("Pipeline stalled for 60s")
+            if started is None:
+                # Start the clock at the first result so process start-up is not counted
+                started = time.perf_counter()
+                continue
+            latencies.append((time.monotonic() - rendered.timestamp) * 1000)
+        stats = pipeline.stats()
+    finally:
+        pipeline.stop()
+    return len(latencies), time.perf_counter() - (started or time.perf_counter()), latencies, stats
+
+
+def report(label, frames, seconds, latencies):
+    p50, p95 = np.percentile(latencies, [50, 95]) if latencies else (0.0, 0.0)
+    print(f"{label:<14} {frames:5d} frames  {frames / seconds if seconds else 0:7.1f} fps  "
+          f"latency p50 {p50:7.1f} ms  p95 {p95:7.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--activity", default="Squats", choices=sorted(CLIP_IMAGES))
+    parser.add_argument("--frames", type=int, default=300, help="frames in the synthesized clip")
+    parser.add_argument("--slots", type=int, default=4, help="shared-memory slots per ring")
+    parser.add_argument("--model-complexity", type=int, default=1, choices=(0, 1, 2))
+    args = parser.parse_args(argv)
+
+    from exercises import EXERCISE_PROCESSORS
+    kind = "exercise" if args.activity in EXERCISE_PROCESSORS else "yoga"
+    print(f"{args.activity}, {args.frames} frames on {os.cpu_count()} CPU(s)")
+    with tempfile.TemporaryDirectory() as clip_dir:
+        path = synthesize_clip(CLIP_IMAGES[args.activity], os.path.join(clip_dir, "clip.avi"), args.frames)
+        report("single thread", *run_single_thread(path, kind, args.activity, args.model_complexity))
+        frames, seconds, latencies, stats = run_processes(path, kind, args.activity, args.model_complexity,
+                                                          args.slots)
+        report("processes", frames, seconds, latencies)
+        print(f"{'':<14} {stats}")
+
+
+if __name__ == "__main__":
+    main()
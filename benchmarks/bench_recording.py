@@ -0,0 +1,101 @@
+"""Size and cost of session recordings in float16 and float32.
+
+Each layout records a synthetic session into a fresh file with
+LandmarkWriter: landmarks drift smoothly, a person is missing now and
+then, and the stage alternates like reps. The report gives:
+
+- file size, and MB per hour at the session's frame rate
+- append cost per frame, p50 and p99
+- worst quantization error in pixels at 640x480
+- time to open the file and read 1000 random records through the memmap
+- time for a one-minute between() query vs. a full scan of the timestamps
+
+    python benchmarks/bench_recording.py --minutes 60 --fps 30
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from landmark_store import LandmarkWriter, open_recording
+from utils import NUM_LANDMARKS, X, Y
+
+FRAME_PIXELS = (640, 480)
+
+
+def synthesize(frames, seed=0):
+    """Smoothly drifting landmarks in [0, 1], with visibility in the last column"""
+    rng = np.random.default_rng(seed)
+    base = rng.uniform(0.2, 0.8, (NUM_LANDMARKS, 4)).astype(np.float32)
+    phase = rng.uniform(0, 2 * np.pi, (NUM_LANDMARKS, 4)).astype(np.float32)
+    t = np.arange(frames, dtype=np.float32)[:, None, None] / 30
+    return np.clip(base + 0.1 * np.sin(t * 1.3 + phase), 0, 1).astype(np.float32)
+
+
+def record(path, landmarks, fps, float32):
+    writer = LandmarkWriter(path, "exercise", "Squats", float32=float32)
+    costs = np.empty(len(landmarks))
+    for i, frame in enumerate(landmarks):
+        # About one frame in fifty has nobody in view
+        detected = frame if i % 50 else None
+        stage = "down" if (i // int(fps)) % 2 else "up"
+        started = time.perf_counter()
+        writer.append(detected, i / fps, stage)
+        costs[i] = time.perf_counter() - started
+    writer.close()
+    return costs
+
+
+def run(label, path, landmarks, fps, float32, rng):
+    costs = record(path, landmarks, fps, float32) * 1e6
+    size = os.path.getsize(path)
+    hours = len(landmarks) / fps / 3600
+
+    started = time.perf_counter()
+    recording = open_recording(path)
+    picks = rng.integers(0, len(recording), 1000)
+    sample = np.array([recording.landmarks[i] for i in picks], dtype=np.float32)
+    access_ms = (time.perf_counter() - started) * 1000
+
+    detected = picks % 50 != 0
+    error = np.abs(sample[detected] - landmarks[picks[detected]])
+    pixels = max(error[..., X].max() * FRAME_PIXELS[0], error[..., Y].max() * FRAME_PIXELS[1])
+
+    middle = len(recording) / fps / 2
+    started = time.perf_counter()
+    window = recording.between(middle, middle + 60, wall=False)
+    indexed_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    timestamps = np.asarray(recording.timestamps)
+    scanned = np.count_nonzero((timestamps >= middle) & (timestamps < middle + 60))
+    scan_ms = (time.perf_counter() - started) * 1000
+    assert scanned == len(window)
+    recording.close()
+
+    p50, p99 = np.percentile(costs, [50, 99])
+    print(f"{label:<8} {size / 1e6:8.1f} MB  {size / 1e6 / hours:7.1f} MB/h  append p50 {p50:5.2f} us "
+          f"p99 {p99:6.2f} us  error {pixels:5.3f} px  1000 reads {access_ms:6.2f} ms  "
+          f"1 min query {indexed_ms:6.3f} ms (scan {scan_ms:6.2f} ms)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, default=60.0)
+    parser.add_argument("--fps", type=float, default=30.0)
+    args = parser.parse_args(argv)
+
+    frames = int(args.minutes * 60 * args.fps)
+    landmarks = synthesize(frames)
+    print(f"{frames} frames ({args.minutes:.0f} min at {args.fps:.0f} fps)")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, float32 in (("float16", False), ("float32", True)):
+            run(label, os.path.join(tmp, f"{label}.lmk"), landmarks, args.fps, float32, np.random.default_rng(1))
+
+
+if __name__ == "__main__":
+    main()
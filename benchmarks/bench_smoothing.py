@@ -0,0 +1,146 @@
+"""Count stability of the lite model with landmark smoothing vs. the heavier models.
+
+Each activity's clip is scored by every configuration: the lite, full and
+heavy models on raw landmarks, and the lite model with LandmarkFilter. For
+each one the report gives inference time per frame, landmark jitter, stage
+transitions and the rep count or good-form frames. Jitter is the median
+frame-to-frame movement of visible joints in the landmarks the rules see.
+Transitions beyond the ones a rep needs are flicker. Counts are compared
+with the reference configuration, the heaviest model that loaded.
+
+Synthesized clips pan a still image, so any count there is flicker. Use
+recorded sessions with --clip for count accuracy.
+
+    python benchmarks/bench_smoothing.py --only Squats --clip Squats=squats.mp4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+from bench_pipeline import CLIP_IMAGES, parse_clip, synthesize_clip
+from exercises import EXERCISE_PROCESSORS
+from pose_pool import create_pose
+from tracking import VISIBILITY_THRESHOLD, LandmarkFilter
+from utils import NUM_LANDMARKS, VISIBILITY, X, Y, SessionState, landmarks_to_array
+from yoga import YOGA_CHECKS
+
+# (label, model complexity, smoothed)
+CONFIGS = [("lite", 0, False), ("lite+filter", 0, True), ("full", 1, False), ("heavy", 2, False)]
+
+
+def score_clip(path, kind, rule, pose, smoothed):
+    """Score one clip and return its timing, jitter and count metrics"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Unable to open video: {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    state = SessionState(counter=0, exercise_stage="start")
+    smoother = LandmarkFilter() if smoothed else None
+    buffer = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+    previous = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+    have_previous = False
+    inference_ms, jitter = [], []
+    transitions = good = index = 0
+    stage = state.exercise_stage
+    was_good = False
+    try:
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            timestamp = index / fps
+            index += 1
+            started = time.perf_counter()
+            results = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            inference_ms.append((time.perf_counter() - started) * 1000)
+            if not results.pose_landmarks:
+                have_previous = False
+                if smoother is not None:
+                    smoother.reset()
+                continue
+            landmarks = landmarks_to_array(results.pose_landmarks, buffer)
+            if smoother is not None:
+                landmarks = smoother(landmarks, timestamp)
+            if have_previous:
+                visible = ((landmarks[:, VISIBILITY] > VISIBILITY_THRESHOLD)
+                           & (previous[:, VISIBILITY] > VISIBILITY_THRESHOLD))
+                if visible.any():
+                    moved = np.hypot(*(landmarks[visible][:, [X, Y]] - previous[visible][:, [X, Y]]).T)
+                    jitter.append(float(np.median(moved)))
+            previous[:] = landmarks
+            have_previous = True
+            if kind == "exercise":
+                rule(landmarks, frame, state, timestamp)
+                if state.exercise_stage != stage:
+                    transitions += 1
+                    stage = state.exercise_stage
+            else:
+                feedback = rule(landmarks, frame)
+                is_good = "GOOD" in feedback
+                transitions += is_good != was_good
+                was_good = is_good
+                good += is_good
+    finally:
+        cap.release()
+    return {
+        "frames": index,
+        "inference_ms": round(float(np.mean(inference_ms)), 2) if inference_ms else 0.0,
+        "jitter": round(float(np.median(jitter)) * 1000, 3) if jitter else 0.0,
+        "transitions": transitions,
+        "count": state.counter if kind == "exercise" else good,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=120, help="frames per synthesized clip")
+    parser.add_argument("--only", action="append", help="benchmark only this activity (repeatable)")
+    parser.add_argument("--clip", action="append", type=parse_clip, default=[],
+                        help="use a recorded clip for an activity, as ACTIVITY=PATH (repeatable)")
+    args = parser.parse_args(argv)
+
+    activities = [("exercise", name, rule) for name, rule in EXERCISE_PROCESSORS.items()]
+    activities += [("yoga", name, rule) for name, rule in YOGA_CHECKS.items()]
+    if args.only:
+        activities = [a for a in activities if a[1] in args.only]
+    clips = dict(args.clip)
+
+    poses = {}
+    for complexity in sorted({complexity for _, complexity, _ in CONFIGS}):
+        try:
+            poses[complexity] = create_pose(complexity)
+        except Exception as e:
+            # Lite and heavy models are downloaded on first use and may be unavailable offline
+            print(f"model_complexity={complexity} unavailable: {e}", file=sys.stderr)
+    configs = [config for config in CONFIGS if config[1] in poses]
+    reference = max((config for config in configs if not config[2]), key=lambda config: config[1])[0]
+
+    try:
+        with tempfile.TemporaryDirectory() as clip_dir:
+            for i, (kind, name, rule) in enumerate(activities):
+                path = clips.get(name) or synthesize_clip(CLIP_IMAGES[name], os.path.join(clip_dir, f"{i}.avi"),
+                                                          args.frames)
+                rows = {}
+                for label, complexity, smoothed in configs:
+                    poses[complexity].reset()
+                    rows[label] = score_clip(path, kind, rule, poses[complexity], smoothed)
+                count_name = "reps" if kind == "exercise" else "good frames"
+                print(f"\n{name}  ({rows[reference]['frames']} frames, reference: {reference})")
+                print(f"  {'config':<12} {'infer ms':>9} {'jitter':>9} {'transitions':>12} {count_name:>12} {'vs ref':>7}")
+                for label, row in rows.items():
+                    print(f"  {label:<12} {row['inference_ms']:>9.2f} {row['jitter']:>9.3f} {row['transitions']:>12d} "
+                          f"{row['count']:>12d} {row['count'] - rows[reference]['count']:>+7d}")
+    finally:
+        for pose in poses.values():
+            pose.close()
+
+
+if __name__ == "__main__":
+    main()
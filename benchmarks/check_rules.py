@@ -0,0 +1,207 @@
+"""Check the compiled exercise rules against the hand-written processors they replaced.
+
+Before the rule engine, every exercise was a function of its own. Their
+state logic is kept below as the reference: stage transitions, rep
+counting and plank timing, without the overlays. Each exercise in
+EXERCISE_PROCESSORS and its reference are fed the same randomized
+landmark sequences: random poses with smooth motion between them, so
+every feature sweeps through its thresholds many times. Stage, counter
+and plank state must match after every frame. The first mismatch is
+reported with its frame, and the script exits with status 1.
+
+Run it after editing EXERCISE_RULES or rules.py:
+
+    python benchmarks/check_rules.py --sequences 50 --frames 2000
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from exercises import EXERCISE_PROCESSORS
+from overlay import TextLayer
+from utils import (NUM_LANDMARKS, SessionState, Y, calculate_angles, calculate_distances, joint_indices,
+                   LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_ELBOW, RIGHT_ELBOW, LEFT_WRIST, RIGHT_WRIST,
+                   LEFT_HIP, RIGHT_HIP, LEFT_KNEE, RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE)
+
+FRAME_SHAPE = (480, 640, 3)
+# State each exercise must agree on after every frame
+COMPARED = ("exercise_stage", "counter", "total_plank_time", "plank_start_time", "last_plank_end", "show_total_time")
+
+KNEE_ANGLES = joint_indices((LEFT_HIP, LEFT_KNEE, LEFT_ANKLE), (RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE))
+ELBOW_ANGLES = joint_indices((LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST), (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST))
+PUSHUP_ANGLES = joint_indices((LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST), (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST),
+                              (LEFT_ELBOW, LEFT_SHOULDER, LEFT_HIP), (RIGHT_ELBOW, RIGHT_SHOULDER, RIGHT_HIP))
+PLANK_ANGLES = joint_indices((LEFT_SHOULDER, LEFT_HIP, LEFT_KNEE), (LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST))
+JUMPING_JACK_SPANS = joint_indices((LEFT_WRIST, RIGHT_WRIST), (LEFT_HIP, RIGHT_HIP))
+
+
+# ----- Reference processors: the state logic of the pre-engine exercises.py -----
+
+def squats(landmarks, state, now):
+    left_knee_angle, right_knee_angle = calculate_angles(landmarks, KNEE_ANGLES)
+    avg_knee_angle = (left_knee_angle + right_knee_angle) / 2
+    if avg_knee_angle > 160:
+        state.exercise_stage = "up"
+    if avg_knee_angle < 90 and state.exercise_stage == "up":
+        state.exercise_stage = "down"
+        state.counter += 1
+
+def hand_raises(landmarks, state, now):
+    avg_wrist_height = (landmarks[LEFT_WRIST, Y] + landmarks[RIGHT_WRIST, Y]) / 2
+    avg_shoulder_height = (landmarks[LEFT_SHOULDER, Y] + landmarks[RIGHT_SHOULDER, Y]) / 2
+    if avg_wrist_height > avg_shoulder_height + 0.05:
+        state.exercise_stage = "down"
+    if avg_wrist_height < avg_shoulder_height - 0.05 and state.exercise_stage == "down":
+        state.exercise_stage = "up"
+        state.counter += 1
+
+def pushups(landmarks, state, now):
+    (left_elbow_angle, right_elbow_angle,
+     left_shoulder_angle, right_shoulder_angle) = calculate_angles(landmarks, PUSHUP_ANGLES)
+    avg_elbow_angle = (left_elbow_angle + right_elbow_angle) / 2
+    avg_shoulder_angle = (left_shoulder_angle + right_shoulder_angle) / 2
+    if avg_elbow_angle > 160 and avg_shoulder_angle > 160:
+        state.exercise_stage = "up"
+    if avg_elbow_angle < 70 and state.exercise_stage == "up":
+        state.exercise_stage = "down"
+        state.counter += 1
+
+def lunges(landmarks, state, now):
+    left_knee_angle, right_knee_angle = calculate_angles(landmarks, KNEE_ANGLES)
+    if left_knee_angle > 160 and right_knee_angle > 160:
+        state.exercise_stage = "up"
+    if (left_knee_angle < 90 or right_knee_angle < 90) and state.exercise_stage == "up":
+        state.exercise_stage = "down"
+        state.counter += 1
+
+def bicep_curls(landmarks, state, now):
+    left_elbow_angle, right_elbow_angle = calculate_angles(landmarks, ELBOW_ANGLES)
+    if left_elbow_angle > 160 and right_elbow_angle > 160:
+        state.exercise_stage = "down"
+    if (left_elbow_angle < 50 or right_elbow_angle < 50) and state.exercise_stage == "down":
+        state.exercise_stage = "up"
+        state.counter += 1
+
+def jumping_jacks(landmarks, state, now):
+    wrist_distance, hip_distance = calculate_distances(landmarks, JUMPING_JACK_SPANS)
+    if wrist_distance < 0.2 and hip_distance < 0.2:
+        state.exercise_stage = "closed"
+    if wrist_distance > 0.4 and hip_distance > 0.3 and state.exercise_stage == "closed":
+        state.exercise_stage = "open"
+        state.counter += 1
+
+def shoulder_press(landmarks, state, now):
+    avg_wrist_height = (landmarks[LEFT_WRIST, Y] + landmarks[RIGHT_WRIST, Y]) / 2
+    avg_elbow_height = (landmarks[LEFT_ELBOW, Y] + landmarks[RIGHT_ELBOW, Y]) / 2
+    if avg_wrist_height > avg_elbow_height + 0.1:
+        state.exercise_stage = "down"
+    if avg_wrist_height < avg_elbow_height - 0.1 and state.exercise_stage == "down":
+        state.exercise_stage = "up"
+        state.counter += 1
+
+def plank(landmarks, state, now):
+    body_angle, elbow_angle = calculate_angles(landmarks, PLANK_ANGLES)
+    is_plank = ((landmarks[LEFT_WRIST, Y] > landmarks[LEFT_ELBOW, Y]) and (60 < elbow_angle < 150)
+                and (150 < body_angle < 210))
+    if 'total_plank_time' not in state:
+        state.total_plank_time = 0
+    if 'last_plank_end' not in state:
+        state.last_plank_end = 0
+    if 'show_total_time' not in state:
+        state.show_total_time = False
+    if is_plank:
+        if 'plank_start_time' not in state:
+            state.plank_start_time = now
+            state.show_total_time = False
+    else:
+        if 'plank_start_time' in state:
+            state.total_plank_time += now - state.plank_start_time
+            state.last_plank_end = now
+            state.show_total_time = True
+            del state.plank_start_time
+        if not (state.show_total_time and (now - state.last_plank_end < 3)):
+            state.show_total_time = False
+
+REFERENCE = {
+    "Squats": squats,
+    "Hand Raises": hand_raises,
+    "Push-ups": pushups,
+    "Lunges": lunges,
+    "Bicep Curls": bicep_curls,
+    "Jumping Jacks": jumping_jacks,
+    "Shoulder Press": shoulder_press,
+    "Plank": plank,
+}
+
+
+def landmark_sequence(frames, rng, hold=(5, 30)):
+    """Random poses in [0, 1] with linear motion between them, as float32 (frames, 33, 4)"""
+    keys, spans = [], []
+    total = 0
+    while total < frames:
+        keys.append(rng.uniform(0, 1, (NUM_LANDMARKS, 4)))
+        spans.append(int(rng.integers(*hold)))
+        total += spans[-1]
+    keys.append(rng.uniform(0, 1, (NUM_LANDMARKS, 4)))
+    parts = []
+    for i, span in enumerate(spans):
+        t = np.arange(span, dtype=np.float64)[:, None, None] / span
+        parts.append(keys[i] * (1 - t) + keys[i + 1] * t)
+    return np.concatenate(parts)[:frames].astype(np.float32)
+
+
+def fresh_state():
+    return SessionState(counter=0, exercise_stage="start")
+
+
+def check(name, sequences, fps):
+    """Run one exercise over every sequence; returns (reps, holding frames) or raises AssertionError"""
+    rule, reference = EXERCISE_PROCESSORS[name], REFERENCE[name]
+    reps = holding = 0
+    for s, sequence in enumerate(sequences):
+        compiled_state, reference_state = fresh_state(), fresh_state()
+        for i, landmarks in enumerate(sequence):
+            now = i / fps
+            rule(landmarks, TextLayer(FRAME_SHAPE), compiled_state, now)
+            reference(landmarks, reference_state, now)
+            for key in COMPARED:
+                got, want = compiled_state.get(key), reference_state.get(key)
+                if got != want:
+                    raise AssertionError(f"{name}: sequence {s} frame {i}: {key} is {got!r}, expected {want!r}")
+            holding += 'plank_start_time' in reference_state
+        reps += reference_state.counter
+    return reps, holding
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sequences", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    sequences = [landmark_sequence(args.frames, rng) for _ in range(args.sequences)]
+    missing = set(EXERCISE_PROCESSORS) ^ set(REFERENCE)
+    if missing:
+        print(f"No reference or no rule for: {', '.join(sorted(missing))}", file=sys.stderr)
+        return 1
+    print(f"{args.sequences} sequences x {args.frames} frames per exercise")
+    for name in EXERCISE_PROCESSORS:
+        try:
+            reps, holding = check(name, sequences, args.fps)
+        except AssertionError as e:
+            print(f"MISMATCH {e}", file=sys.stderr)
+            return 1
+        covered = f"{holding} frames holding" if EXERCISE_PROCESSORS[name].kind == "hold" else f"{reps} reps"
+        print(f"{name:<15} match  ({covered})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""Reusable frame-sized arrays for the feed loops.
+
+OpenCV allocates a new full-frame array for every `cv2.flip` or
+`cv2.cvtColor` call unless it is given a destination. `BufferPool` keeps
+one array per role (e.g. "rgb", "mirror") and hands it to OpenCV's `dst=`
+argument, so a steady-state loop reuses the same memory every frame.
+
+A pooled buffer is overwritten on the next frame: anything that must outlive
+the iteration has to be copied.
+"""
+import cv2
+import numpy as np
+
+
+class BufferPool:
+    """Fixed-size destination arrays reused across frames, one per role"""
+
+    def __init__(self):
+        self._buffers = {}
+        self.allocations = 0
+
+    def get(self, role, shape, dtype=np.uint8):
+        """Return the buffer for a role, (re)allocating only if the shape changed"""
+        buffer = self._buffers.get(role)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = self._buffers[role] = np.empty(shape, dtype=dtype)
+            self.allocations += 1
+        return buffer
+
+    def cvt_color(self, image, code, role="rgb"):
+        """cv2.cvtColor into the role's buffer; only same-channel-count conversions"""
+        return cv2.cvtColor(image, code, dst=self.get(role, image.shape, image.dtype))
+
+    def flip(self, image, flip_code, role="mirror"):
+        """cv2.flip into the role's buffer"""
+        return cv2.flip(image, flip_code, dst=self.get(role, image.shape, image.dtype))
+
+    def stats(self):
+        """Return how many buffers are held, their total size and allocations so far"""
+        return {
+            "buffers": len(self._buffers),
+            "bytes": sum(buffer.nbytes for buffer in self._buffers.values()),
+            "allocations": self.allocations,
+        }
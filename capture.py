@@ -0,0 +1,148 @@
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# A frame handed to the inference stage. `image` is a view into a ring slot
+# and stays valid until the next call to `read_latest()`.
+Frame = namedtuple("Frame", ["image", "seq", "timestamp"])
+
+
+def open_camera(index=0, width=640, height=480, fps=30):
+    """Open a webcam with the resolution and frame rate used by the live feeds"""
+    cap = cv2.VideoCapture(index)
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    cap.set(cv2.CAP_PROP_FPS, fps)
+    return cap
+
+
+class FrameRingBuffer:
+    """Preallocated ring of frame slots that always hands out the newest frame"""
+
+    def __init__(self, shape, dtype=np.uint8, slots=3):
+        # One slot being written, one holding the newest frame, one being read
+        if slots < 3:
+            raise ValueError("FrameRingBuffer needs at least 3 slots")
+        self._frames = np.empty((slots,) + tuple(shape), dtype=dtype)
+        self._timestamps = [0.0] * slots
+        self._cond = threading.Condition()
+        self._latest = -1
+        self._latest_seq = 0
+        self._reading = -1
+        self._read_seq = 0
+        self._closed = False
+        self.captured = 0
+        self.dropped = 0
+        self.processed = 0
+
+    @property
+    def shape(self):
+        return self._frames.shape[1:]
+
+    def acquire_write_slot(self):
+        """Return the index of a slot that is neither the newest nor being read"""
+        with self._cond:
+            for slot in range(len(self._frames)):
+                if slot != self._latest and slot != self._reading:
+                    return slot
+
+    def slot(self, index):
+        """Return the writable array backing a slot"""
+        return self._frames[index]
+
+    def commit(self, index, timestamp=None):
+        """Publish a written slot as the newest frame, dropping any unread one"""
+        with self._cond:
+            if self._latest >= 0 and self._latest_seq > self._read_seq:
+                self.dropped += 1
+            self._timestamps[index] = time.monotonic() if timestamp is None else timestamp
+            self._latest = index
+            self._latest_seq += 1
+            self.captured += 1
+            self._cond.notify_all()
+
+    def read_latest(self, timeout=None):
+        """Block until a frame newer than the last one read is available"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._closed or self._latest_seq > self._read_seq, timeout):
+                return None
+            if self._latest_seq <= self._read_seq:
+                return None
+            self._reading = self._latest
+            self._read_seq = self._latest_seq
+            self.processed += 1
+            return Frame(self._frames[self._reading], self._read_seq, self._timestamps[self._reading])
+
+    def close(self):
+        """Wake up any reader waiting for a frame"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        """Return capture, drop and processing counters"""
+        with self._cond:
+            return {
+                "captured": self.captured,
+                "dropped": self.dropped,
+                "processed": self.processed,
+            }
+
+
+class CaptureStage:
+    """Reads frames on a background thread into a latest-frame ring buffer"""
+
+    def __init__(self, cap, slots=3):
+        self.cap = cap
+        self.slots = slots
+        self.buffer = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Read the first frame to size the ring buffer, then start capturing"""
+        ret, frame = self.cap.read()
+        if not ret:
+            return False
+        self.buffer = FrameRingBuffer(frame.shape, frame.dtype, self.slots)
+        slot = self.buffer.acquire_write_slot()
+        self.buffer.slot(slot)[...] = frame
+        self.buffer.commit(slot)
+        self._thread = threading.Thread(target=self._run, name="capture-stage", daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                slot = self.buffer.acquire_write_slot()
+                dst = self.buffer.slot(slot)
+                ret, frame = self.cap.read(dst)
+                if not ret:
+                    break
+                if frame is not dst:
+                    # The backend allocated its own array; keep the ring layout
+                    if frame.shape != dst.shape:
+                        break
+                    dst[...] = frame
+                self.buffer.commit(slot)
+        finally:
+            self.buffer.close()
+
+    def read_latest(self, timeout=1.0):
+        """Return the newest captured frame, or None if capture has stopped"""
+        return self.buffer.read_latest(timeout)
+
+    def stats(self):
+        """Return capture counters, including frames dropped as stale"""
+        return self.buffer.stats() if self.buffer else {"captured": 0, "dropped": 0, "processed": 0}
+
+    def stop(self):
+        """Stop the capture thread and release the camera"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        self.cap.release()
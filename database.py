@@ -1,19 +1,39 @@
 import sqlite3
 import os
+import threading
 import streamlit as st
 from hashlib import sha256
 from datetime import datetime
+from db_pool import ConnectionPool, PoolExhausted
 
 # Database Configuration
 DB_PATH = os.path.join(os.path.dirname(__file__), "users.db")
 
-def initialize_database():
-    """Initialize the database with secure tables"""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+# Statements are fixed text so each pooled connection compiles them once
+SELECT_USER = "SELECT * FROM users WHERE username = ?"
+SELECT_USERNAME = "SELECT 1 FROM users WHERE username = ?"
+SELECT_ANY_USER = "SELECT 1 FROM users LIMIT 1"
+UPDATE_LAST_LOGIN = "UPDATE users SET last_login = ? WHERE id = ?"
+INSERT_USER = "INSERT INTO users (username, password_hash, salt) VALUES (?, ?, ?)"
+
+_pools = {}
+_pools_lock = threading.Lock()
+# Users are never deleted, so once one exists the check can be skipped
+_users_seen = set()
+
+def get_connection_pool():
+    """Return the connection pool for DB_PATH, opening it on first use"""
+    with _pools_lock:
+        pool = _pools.get(DB_PATH)
+        if pool is None:
+            pool = ConnectionPool(DB_PATH)
+            _create_tables(pool)
+            _pools[DB_PATH] = pool
+        return pool
+
+def _create_tables(pool):
+    def create(conn):
+        conn.execute('''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             username TEXT NOT NULL UNIQUE,
@@ -24,7 +44,7 @@ def initialize_database():
         )
         ''')
         
-        cursor.execute('''
+        conn.execute('''
         CREATE TABLE IF NOT EXISTS sessions (
             session_id TEXT PRIMARY KEY,
             user_id INTEGER,
@@ -33,19 +53,19 @@ def initialize_database():
             FOREIGN KEY(user_id) REFERENCES users(id)
         )
         ''')
-        
-        conn.commit()
+    pool.transaction(create)
+
+def initialize_database():
+    """Initialize the database with secure tables"""
+    try:
+        # Tables are created once, when the pool is opened
+        get_connection_pool()
     except sqlite3.Error as e:
         st.error(f"Database initialization error: {e}")
-    finally:
-        if conn:
-            conn.close()
 
 def get_db_connection():
-    """Get a secure database connection"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Lease a pooled database connection for a with-block"""
+    return get_connection_pool().connection()
 
 def hash_password(password, salt=None):
     """Hash password with salt using SHA-256"""
@@ -54,63 +74,52 @@ def hash_password(password, salt=None):
 
 def authenticate_user(username, password):
     """Secure user authentication with hashed passwords"""
-    try:
-        conn = get_db_connection()
-        user = conn.execute(
-            "SELECT * FROM users WHERE username = ?", 
-            (username,)
-        ).fetchone()
-        
+    def authenticate(conn):
+        user = conn.execute(SELECT_USER, (username,)).fetchone()
         if user:
             input_hash = sha256((password + user['salt']).encode()).hexdigest()
             if input_hash == user['password_hash']:
-                conn.execute(
-                    "UPDATE users SET last_login = ? WHERE id = ?",
-                    (datetime.now(), user['id'])
-                )
-                conn.commit()
+                conn.execute(UPDATE_LAST_LOGIN, (datetime.now(), user['id']))
                 return True
         return False
-    except sqlite3.Error as e:
+
+    try:
+        return get_connection_pool().transaction(authenticate)
+    except (sqlite3.Error, PoolExhausted) as e:
         st.error(f"Authentication error: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 def register_user(username, password):
     """Secure user registration with password hashing"""
-    try:
-        conn = get_db_connection()
-        
-        if conn.execute(
-            "SELECT 1 FROM users WHERE username = ?", 
-            (username,)
-        ).fetchone():
+    password_hash, salt = hash_password(password)
+
+    def register(conn):
+        if conn.execute(SELECT_USERNAME, (username,)).fetchone():
             return False
-            
-        password_hash, salt = hash_password(password)
-        
-        conn.execute(
-            "INSERT INTO users (username, password_hash, salt) VALUES (?, ?, ?)",
-            (username, password_hash, salt)
-        )
-        conn.commit()
+        conn.execute(INSERT_USER, (username, password_hash, salt))
         return True
-    except sqlite3.Error as e:
+
+    try:
+        registered = get_connection_pool().transaction(register)
+    except sqlite3.IntegrityError:
+        # Lost a race with a concurrent registration of the same name
+        return False
+    except (sqlite3.Error, PoolExhausted) as e:
         st.error(f"Registration error: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
+    if registered:
+        _users_seen.add(DB_PATH)
+    return registered
 
 def users_exist():
     """Check if any users exist in database"""
+    if DB_PATH in _users_seen:
+        return True
     try:
-        conn = get_db_connection()
-        return conn.execute("SELECT 1 FROM users").fetchone() is not None
-    except sqlite3.Error:
+        with get_db_connection() as conn:
+            exists = conn.execute(SELECT_ANY_USER).fetchone() is not None
+    except (sqlite3.Error, PoolExhausted):
         return False
-    finally:
-        if conn:
-            conn.close()
\ No newline at end of file
+    if exists:
+        _users_seen.add(DB_PATH)
+    return exists
@@ -0,0 +1,168 @@
+"""Pooled SQLite connections for database.py.
+
+Opening a connection costs a file open, a schema read and fresh statement
+compilation, and database.py used to do it on every call. `ConnectionPool`
+keeps a bounded set of connections open for the life of the server. Each
+is handed to one thread at a time. Every connection is configured once:
+
+- WAL journal mode, so readers never wait for a writer such as the
+  last_login UPDATE, and a writer waits only for other writers
+- synchronous=NORMAL, which is durable across application crashes in WAL mode
+- a busy timeout, so a write contending for the lock waits instead of failing
+- a larger prepared-statement cache. The SQL in database.py is fixed text,
+  so each statement is compiled once per connection and reused.
+
+A write that still fails with "database is locked" (e.g. a read
+transaction that cannot upgrade to a write under WAL) is retried with
+backoff by `retry_busy`.
+"""
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 8))
+# Seconds a checkout waits for a free connection, and SQLite waits for a lock
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 10))
+DB_BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", 5000))
+BUSY_RETRIES = 5
+STATEMENT_CACHE_SIZE = 256
+
+PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    # Negative sizes are KiB: 8 MiB of page cache per connection
+    "PRAGMA cache_size=-8192",
+    "PRAGMA mmap_size=67108864",
+)
+
+
+class PoolExhausted(Exception):
+    """Raised when no connection became free before the checkout timeout"""
+
+
+def is_busy(error):
+    """True for the lock errors that are worth retrying"""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+
+def retry_busy(fn, retries=BUSY_RETRIES, base_delay=0.01):
+    """Call fn(), retrying with jittered exponential backoff while the database is busy"""
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except sqlite3.OperationalError as e:
+            if attempt == retries or not is_busy(e):
+                raise
+            time.sleep(base_delay * (2 ** attempt) * (0.5 + random.random()))
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of configured SQLite connections to one database"""
+
+    def __init__(self, path, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT, busy_timeout_ms=DB_BUSY_TIMEOUT_MS):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.busy_timeout_ms = busy_timeout_ms
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+        self.checkouts = 0
+        self.waits = 0
+        # journal_mode=WAL is stored in the database file, so it only needs setting once
+        conn = self._connect()
+        self._created = 1
+        mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+        self.journal_mode = mode.lower()
+        self._idle.put(conn)
+
+    def _connect(self):
+        # Connections move between threads, but the pool gives each to one thread at a time
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def checkout(self):
+        """Take an idle connection, opening one if the pool is below its size"""
+        if self._closed:
+            raise PoolExhausted("Connection pool is closed")
+        self.checkouts += 1
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            grow = self._created < self.size
+            if grow:
+                # Reserve the slot before connecting outside the lock
+                self._created += 1
+        if grow:
+            try:
+                return self._connect()
+            except sqlite3.Error:
+                with self._lock:
+                    self._created -= 1
+                raise
+        self.waits += 1
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolExhausted(f"All {self.size} database connections are busy") from None
+
+    def checkin(self, conn):
+        """Return a connection, rolling back anything its user left open"""
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Lease a connection for the duration of a with-block"""
+        conn = self.checkout()
+        try:
+            yield conn
+        finally:
+            self.checkin(conn)
+
+    def transaction(self, fn):
+        """Run fn(conn) in a transaction on a pooled connection, retrying while busy"""
+        def attempt():
+            with self.connection() as conn:
+                with conn:
+                    return fn(conn)
+        return retry_busy(attempt)
+
+    def stats(self):
+        with self._lock:
+            created = self._created
+        return {
+            "size": self.size,
+            "open": created,
+            "idle": self._idle.qsize(),
+            "checkouts": self.checkouts,
+            "waits": self.waits,
+            "journal_mode": self.journal_mode,
+        }
+
+    def close(self):
+        """Close idle connections; leased ones are closed when they are returned"""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
@@ -0,0 +1,165 @@
+"""Display path decoupled from inference.
+
+`FrameDisplay` takes annotated RGB frames from the feed loop and encodes and
+publishes them on a background thread, so inference never waits for JPEG
+encoding or the websocket. Handoff is latest-only: a frame submitted while
+the encoder is busy replaces the pending one instead of queueing behind it.
+The display rate is capped at DISPLAY_FPS, separately from the analysis
+rate. The cap is fixed. st.image gives no acknowledgement from the
+browser, so the server cannot tell when a client or its network falls
+behind. Lower DISPLAY_FPS or DISPLAY_QUALITY for slow links.
+"""
+import base64
+import logging
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from buffers import BufferPool
+
+DISPLAY_FPS = float(os.environ.get("DISPLAY_FPS", 15))
+DISPLAY_QUALITY = int(os.environ.get("DISPLAY_QUALITY", 75))
+DISPLAY_MAX_WIDTH = int(os.environ.get("DISPLAY_MAX_WIDTH", 640))
+# "jpeg" goes through st.image unchanged; "webp" is sent as an inline <img> because
+# st.image would re-encode it to JPEG
+DISPLAY_FORMAT = os.environ.get("DISPLAY_FORMAT", "jpeg").lower()
+
+logger = logging.getLogger(__name__)
+
+
+def encode_frame(image, quality=DISPLAY_QUALITY, max_width=DISPLAY_MAX_WIDTH, fmt=DISPLAY_FORMAT, buffers=None):
+    """Downscale an RGB frame to max_width and encode it as JPEG or WebP bytes"""
+    buffers = buffers or BufferPool()
+    height, width = image.shape[:2]
+    if max_width and width > max_width:
+        size = (max_width, round(height * max_width / width))
+        small = buffers.get("display_small", (size[1], size[0]) + image.shape[2:])
+        image = cv2.resize(image, size, dst=small, interpolation=cv2.INTER_AREA)
+    # imencode expects BGR
+    bgr = buffers.cvt_color(image, cv2.COLOR_RGB2BGR, "display_bgr")
+    if fmt == "webp":
+        ok, data = cv2.imencode(".webp", bgr, [cv2.IMWRITE_WEBP_QUALITY, quality])
+    else:
+        ok, data = cv2.imencode(".jpg", bgr, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError(f"Unable to encode frame as {fmt}")
+    return data.tobytes()
+
+
+class FrameDisplay:
+    """Encodes and publishes the latest frame to a placeholder on a background thread"""
+
+    def __init__(self, placeholder, fps=DISPLAY_FPS, quality=DISPLAY_QUALITY,
+                 max_width=DISPLAY_MAX_WIDTH, fmt=DISPLAY_FORMAT):
+        self.placeholder = placeholder
+        self.min_interval = 1.0 / fps if fps > 0 else 0.0
+        self.quality = quality
+        self.max_width = max_width
+        self.fmt = fmt
+        self._cond = threading.Condition()
+        self._pending = None
+        self._spare = None
+        self._buffers = BufferPool()
+        self._next_due = 0.0
+        self._publish_cost = 0.0
+        self._running = False
+        self._thread = None
+        self.submitted = 0
+        self.published = 0
+        self.skipped = 0
+        self.replaced = 0
+        self.failed = 0
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="frame-display", daemon=True)
+        # The encoder thread writes to the session's placeholder, so it needs the script context
+        add_script_run_ctx(self._thread, get_script_run_ctx())
+        self._thread.start()
+        return self
+
+    def submit(self, image):
+        """Offer a frame for display; returns False if it was skipped by the rate cap"""
+        now = time.monotonic()
+        with self._cond:
+            self.submitted += 1
+            if now < self._next_due:
+                self.skipped += 1
+                return False
+            self._next_due = now + self.min_interval
+            if self._pending is not None:
+                self.replaced += 1
+                slot = self._pending
+            else:
+                slot = self._spare if self._spare is not None and self._spare.shape == image.shape else None
+                self._spare = None
+            if slot is None or slot.shape != image.shape:
+                slot = np.empty_like(image)
+            # Copy: the caller reuses its frame buffer on the next iteration
+            np.copyto(slot, image)
+            self._pending = slot
+            self._cond.notify()
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and self._pending is None:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                frame, self._pending = self._pending, None
+            started = time.monotonic()
+            try:
+                data = encode_frame(frame, self.quality, self.max_width, self.fmt, self._buffers)
+            except Exception:
+                # One frame that fails to encode must not freeze the video
+                self.failed += 1
+                logger.exception("Failed to encode a display frame")
+                data = None
+            if data is not None:
+                try:
+                    self._publish(data)
+                    self.published += 1
+                except Exception:
+                    # Usually the session went away mid-publish; nothing further can be shown
+                    logger.warning("Stopping display: publishing failed", exc_info=True)
+                    with self._cond:
+                        self._running = False
+                    return
+            cost = time.monotonic() - started
+            with self._cond:
+                self._publish_cost = 0.8 * self._publish_cost + 0.2 * cost
+                if self._spare is None:
+                    self._spare = frame
+
+    def _publish(self, data):
+        if self.fmt == "webp":
+            encoded = base64.b64encode(data).decode("ascii")
+            self.placeholder.markdown(f'<img src="data:image/webp;base64,{encoded}" style="width:100%">',
+                                      unsafe_allow_html=True)
+        else:
+            self.placeholder.image(data)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "submitted": self.submitted,
+                "published": self.published,
+                "skipped": self.skipped,
+                "replaced": self.replaced,
+                "failed": self.failed,
+                "publish_ms": round(self._publish_cost * 1000, 2),
+            }
+
+    def close(self):
+        """Stop the encoder thread; a frame still pending is discarded"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
@@ -1,14 +1,27 @@
 import cv2
-import math
-import time
 import streamlit as st
+from streamlit.runtime.scriptrunner import RerunException
 import mediapipe as mp
-from utils import calculate_angle, calculate_distance
+from buffers import BufferPool
+from capture import CaptureStage
+from display import FrameDisplay
+from landmark_store import start_recording
+from landmark_stream import open_feed_camera
+from overlay import TextLayer, put_text
+from publisher import UiPublisher
+from process_pipeline import FEED_PROCESSES, run_process_feed
+from session_runtime import FEED_RUNTIME, run_feed
+from session_store import end_session
+from pose_pool import LATENCY_BUDGET_MS, acquire_session_pose, downgrade_session_pose, release_session_pose
+from tracking import (InferenceScheduler, LandmarkFilter, LandmarkTracker, LatencyMonitor, ROI_SIZE, SMOOTHING,
+                      draw_skeleton)
+from rules import above, angle, below, between, compile_rules, distance, height_above, mean_angle
+from workout_history import defer_workout, start_workout
+from utils import (LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_ELBOW, RIGHT_ELBOW,
+                   LEFT_WRIST, RIGHT_WRIST, LEFT_HIP, RIGHT_HIP, LEFT_KNEE, RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE)
 
 # Initialize MediaPipe Pose
 mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(static_image_mode=False, min_detection_confidence=0.5, min_tracking_confidence=0.5)
-mp_drawing = mp.solutions.drawing_utils
 
 def exercise_page():
     """Exercise category page"""
@@ -172,9 +185,8 @@ def initialize_exercise_tracking(exercise):
     if 'exercise_stage' not in st.session_state:
         st.session_state.exercise_stage = "start"
 
-    st.markdown(f"<div class='counter-display'>"
-               f"Rep Count: {st.session_state.counter}"
-               f"</div>", unsafe_allow_html=True)
+    counter_placeholder = st.empty()
+    show_counter(counter_placeholder, st.session_state.counter)
 
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -187,364 +199,272 @@ def initialize_exercise_tracking(exercise):
             st.success("Counter reset!")
     with col3:
         if st.button("🚪 Logout", key="logout_btn"):
-            st.session_state.logged_in = False
-            st.session_state.username = None
+            end_session()
             st.success("Logged out successfully!")
             st.rerun()
 
     if st.session_state.webcam_active:
-        process_exercise_feed(exercise)
+        process_exercise_feed(exercise, counter_placeholder)
 
-def process_exercise_feed(exercise):
+def show_counter(placeholder, count):
+    """Render the rep counter"""
+    placeholder.markdown(f"<div class='counter-display'>"
+                         f"Rep Count: {count}"
+                         f"</div>", unsafe_allow_html=True)
+
+def process_exercise_feed(exercise, counter_placeholder=None):
     """Process real-time webcam feed for exercises"""
     st.markdown("---")
     st.markdown('<div class="exercise-title"><h3>🎥 Live Exercise Detection</h3></div>', unsafe_allow_html=True)
     
-    cap = cv2.VideoCapture(0)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-    cap.set(cv2.CAP_PROP_FPS, 30)
+    if FEED_RUNTIME == "asyncio":
+        # Runs on the shared event loop; this script run returns right away
+        elements = {}
+        if counter_placeholder is not None:
+            elements["counter"] = (counter_placeholder, show_counter, st.session_state.counter)
+        run_feed("exercise", exercise, EXERCISE_PROCESSORS[exercise], elements)
+        return
+    if FEED_PROCESSES:
+        process_exercise_feed_processes(exercise, counter_placeholder)
+        return
+    
+    # Lease a Pose graph for this session; tracking state must not be shared
+    status_placeholder = st.empty()
+    pose = acquire_session_pose(status_placeholder)
+    if pose is None:
+        return
+    
+    camera, stream = open_feed_camera()
+    capture = CaptureStage(camera)
+    if not capture.start():
+        st.error("Camera error")
+        capture.stop()
+        release_session_pose()
+        return
     
     video_placeholder = st.empty()
+    # Holds are served from extrapolated landmarks; POSE_ROI_SIZE enables person-centred crops
+    tracker = LandmarkTracker(pose, InferenceScheduler(max_interval=3), crop_size=ROI_SIZE,
+                              monitor=LatencyMonitor(LATENCY_BUDGET_MS), downgrade=downgrade_session_pose,
+                              smoother=LandmarkFilter() if SMOOTHING else None)
+    buffers = BufferPool()
+    # Encoding and publishing run on their own thread at the display rate cap
+    display = None if stream else FrameDisplay(video_placeholder).start()
+    # The counter above the feed is rewritten only when the count changes
+    publisher = UiPublisher()
+    if counter_placeholder is not None:
+        publisher.register("counter", counter_placeholder, show_counter, st.session_state.counter)
+    # Reps and plank holds are queued for the history writer, never written from this loop
+    recorder = start_workout("exercise", exercise)
+    # With RECORDINGS_DIR set, every frame's landmarks are appended to a session recording
+    recording = start_recording("exercise", exercise)
     
-    while st.session_state.webcam_active:
-        ret, frame = cap.read()
-        if not ret:
-            st.error("Camera error")
-            break
-        
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = pose.process(image)
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-        
-        if results.pose_landmarks:
-            if exercise == "Squats":
-                process_squats(results.pose_landmarks, image)
-            elif exercise == "Hand Raises":
-                process_hand_raises(results.pose_landmarks, image)
-            elif exercise == "Push-ups":
-                process_pushups(results.pose_landmarks, image)
-            elif exercise == "Lunges":
-                process_lunges(results.pose_landmarks, image)
-            elif exercise == "Bicep Curls":
-                process_bicep_curls(results.pose_landmarks, image)
-            elif exercise == "Jumping Jacks":
-                process_jumping_jacks(results.pose_landmarks, image)
-            elif exercise == "Shoulder Press":
-                process_shoulder_press(results.pose_landmarks, image)
-            elif exercise == "Plank":
-                process_plank(results.pose_landmarks, image)
-            
-            mp_drawing.draw_landmarks(image, results.pose_landmarks, mp_pose.POSE_CONNECTIONS)
-        
-        cv2.putText(image, f"Reps: {st.session_state.counter}", (10, 30), 
-                   cv2.FONT_HERSHEY_TRIPLEX, 1, (255, 0, 0), 2)
-        
-        video_placeholder.image(image, channels="BGR")
-        
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
-
-def process_squats(landmarks, image):
-    """Process squats exercise"""
-    try:
-        left_hip = landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP.value]
-        left_knee = landmarks.landmark[mp_pose.PoseLandmark.LEFT_KNEE.value]
-        left_ankle = landmarks.landmark[mp_pose.PoseLandmark.LEFT_ANKLE.value]
-        
-        right_hip = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP.value]
-        right_knee = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_KNEE.value]
-        right_ankle = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ANKLE.value]
-        
-        left_knee_angle = calculate_angle(left_hip, left_knee, left_ankle)
-        right_knee_angle = calculate_angle(right_hip, right_knee, right_ankle)
-        
-        avg_knee_angle = (left_knee_angle + right_knee_angle) / 2
-        
-        if avg_knee_angle > 160:
-            st.session_state.exercise_stage = "up"
-            
-        if avg_knee_angle < 90 and st.session_state.exercise_stage == "up":
-            st.session_state.exercise_stage = "down"
-            st.session_state.counter += 1
-            cv2.putText(image, "REP COUNTED!", (image.shape[1]//2 - 100, 50), 
-                       cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 255, 0), 2)
-        
-        if st.session_state.exercise_stage == "up":
-            cv2.putText(image, "BEND KNEES TO SQUAT", (image.shape[1]//2 - 150, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 165, 255), 2)
-        else:
-            cv2.putText(image, "STAND UP", (image.shape[1]//2 - 70, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
-
-    except Exception as e:
-        st.error(f"Squats processing error: {e}")
-
-def process_hand_raises(landmarks, image):
-    """Process hand raises exercise"""
-    try:
-        left_shoulder = landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-        left_wrist = landmarks.landmark[mp_pose.PoseLandmark.LEFT_WRIST.value]
-        
-        right_shoulder = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-        right_wrist = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_WRIST.value]
-        
-        avg_wrist_height = (left_wrist.y + right_wrist.y) / 2
-        avg_shoulder_height = (left_shoulder.y + right_shoulder.y) / 2
-        
-        if avg_wrist_height > avg_shoulder_height + 0.05:
-            st.session_state.exercise_stage = "down"
-            
-        if avg_wrist_height < avg_shoulder_height - 0.05 and st.session_state.exercise_stage == "down":
-            st.session_state.exercise_stage = "up"
-            st.session_state.counter += 1
-            cv2.putText(image, "REP COUNTED!", (image.shape[1]//2 - 100, 50), 
-                       cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 255, 0), 2)
-        
-        if st.session_state.exercise_stage == "down":
-            cv2.putText(image, "RAISE YOUR HANDS", (image.shape[1]//2 - 120, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 165, 255), 2)
-        else:
-            cv2.putText(image, "LOWER YOUR HANDS", (image.shape[1]//2 - 130, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
-
-    except Exception as e:
-        st.error(f"Hand raises processing error: {e}")
-
-def process_pushups(landmarks, image):
-    """Process push-ups exercise with improved detection"""
-    try:
-        left_shoulder = landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-        left_elbow = landmarks.landmark[mp_pose.PoseLandmark.LEFT_ELBOW.value]
-        left_wrist = landmarks.landmark[mp_pose.PoseLandmark.LEFT_WRIST.value]
-        
-        right_shoulder = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-        right_elbow = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ELBOW.value]
-        right_wrist = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_WRIST.value]
-        
-        left_hip = landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP.value]
-        right_hip = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP.value]
-        
-        left_elbow_angle = calculate_angle(left_shoulder, left_elbow, left_wrist)
-        right_elbow_angle = calculate_angle(right_shoulder, right_elbow, right_wrist)
-        
-        left_shoulder_angle = calculate_angle(left_elbow, left_shoulder, left_hip)
-        right_shoulder_angle = calculate_angle(right_elbow, right_shoulder, right_hip)
-        
-        avg_elbow_angle = (left_elbow_angle + right_elbow_angle) / 2
-        avg_shoulder_angle = (left_shoulder_angle + right_shoulder_angle) / 2
-        
-        if avg_elbow_angle > 160 and avg_shoulder_angle > 160:
-            st.session_state.exercise_stage = "up"
-            
-        if avg_elbow_angle < 70 and st.session_state.exercise_stage == "up":
-            st.session_state.exercise_stage = "down"
-            st.session_state.counter += 1
-            cv2.putText(image, "REP COUNTED!", (image.shape[1]//2 - 100, 50), 
-                       cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 255, 0), 2)
-        
-        if st.session_state.exercise_stage == "up":
-            cv2.putText(image, "LOWER YOUR BODY", (image.shape[1]//2 - 120, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 165, 255), 2)
-            cv2.putText(image, f"Elbow Angle: {int(avg_elbow_angle)}°", (10, 60), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        else:
-            cv2.putText(image, "PUSH UP", (image.shape[1]//2 - 70, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
-            cv2.putText(image, f"Elbow Angle: {int(avg_elbow_angle)}°", (10, 60), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        
-        cv2.putText(image, f"L Elbow: {int(left_elbow_angle)}°", 
-                   (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-        cv2.putText(image, f"R Elbow: {int(right_elbow_angle)}°", 
-                   (10, 120), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-
-    except Exception as e:
-        st.error(f"Push-ups processing error: {e}")
-
-def process_lunges(landmarks, image):
-    """Process lunges exercise"""
-    try:
-        left_hip = landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP.value]
-        left_knee = landmarks.landmark[mp_pose.PoseLandmark.LEFT_KNEE.value]
-        left_ankle = landmarks.landmark[mp_pose.PoseLandmark.LEFT_ANKLE.value]
-        
-        right_hip = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP.value]
-        right_knee = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_KNEE.value]
-        right_ankle = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ANKLE.value]
-        
-        left_knee_angle = calculate_angle(left_hip, left_knee, left_ankle)
-        right_knee_angle = calculate_angle(right_hip, right_knee, right_ankle)
-        
-        if left_knee_angle > 160 and right_knee_angle > 160:
-            st.session_state.exercise_stage = "up"
-            
-        if (left_knee_angle < 90 or right_knee_angle < 90) and st.session_state.exercise_stage == "up":
-            st.session_state.exercise_stage = "down"
-            st.session_state.counter += 1
-            cv2.putText(image, "REP COUNTED!", (image.shape[1]//2 - 100, 50), 
-                       cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 255, 0), 2)
-        
-        if st.session_state.exercise_stage == "up":
-            cv2.putText(image, "STEP FORWARD INTO LUNGE", (image.shape[1]//2 - 180, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 165, 255), 2)
-        else:
-            cv2.putText(image, "RETURN TO START", (image.shape[1]//2 - 120, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-
-    except Exception as e:
-        st.error(f"Lunges processing error: {e}")
-
-def process_bicep_curls(landmarks, image):
-    """Process bicep curls exercise"""
-    try:
-        left_shoulder = landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-        left_elbow = landmarks.landmark[mp_pose.PoseLandmark.LEFT_ELBOW.value]
-        left_wrist = landmarks.landmark[mp_pose.PoseLandmark.LEFT_WRIST.value]
-        
-        right_shoulder = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-        right_elbow = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ELBOW.value]
-        right_wrist = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_WRIST.value]
-        
-        left_elbow_angle = calculate_angle(left_shoulder, left_elbow, left_wrist)
-        right_elbow_angle = calculate_angle(right_shoulder, right_elbow, right_wrist)
-        
-        if left_elbow_angle > 160 and right_elbow_angle > 160:
-            st.session_state.exercise_stage = "down"
-            
-        if (left_elbow_angle < 50 or right_elbow_angle < 50) and st.session_state.exercise_stage == "down":
-            st.session_state.exercise_stage = "up"
-            st.session_state.counter += 1
-            cv2.putText(image, "REP COUNTED!", (image.shape[1]//2 - 100, 50), 
-                       cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 255, 0), 2)
-        
-        if st.session_state.exercise_stage == "down":
-            cv2.putText(image, "CURL YOUR ARMS UP", (image.shape[1]//2 - 140, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 165, 255), 2)
-        else:
-            cv2.putText(image, "LOWER YOUR ARMS", (image.shape[1]//2 - 120, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
-
-    except Exception as e:
-        st.error(f"Bicep curls processing error: {e}")
-
-def process_jumping_jacks(landmarks, image):
-    """Process jumping jacks exercise"""
     try:
-        left_shoulder = landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-        left_hip = landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP.value]
-        left_wrist = landmarks.landmark[mp_pose.PoseLandmark.LEFT_WRIST.value]
-        
-        right_shoulder = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-        right_hip = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP.value]
-        right_wrist = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_WRIST.value]
-        
-        wrist_distance = calculate_distance(left_wrist, right_wrist)
-        hip_distance = calculate_distance(left_hip, right_hip)
-        
-        if wrist_distance < 0.2 and hip_distance < 0.2:
-            st.session_state.exercise_stage = "closed"
-            
-        if wrist_distance > 0.4 and hip_distance > 0.3 and st.session_state.exercise_stage == "closed":
-            st.session_state.exercise_stage = "open"
-            st.session_state.counter += 1
-            cv2.putText(image, "REP COUNTED!", (image.shape[1]//2 - 100, 50), 
-                       cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 255, 0), 2)
+        while st.session_state.webcam_active:
+            frame = capture.read_latest()
+            if frame is None:
+                st.error("Camera error")
+                break
+        
+            # Inference, overlays and display all work on the one RGB buffer
+            image = buffers.cvt_color(frame.image, cv2.COLOR_BGR2RGB)
+            landmarks = tracker.process(image, frame.timestamp)
+            # When streaming landmarks the browser draws the skeleton and HUD itself
+            hud = TextLayer(image.shape) if stream else image
+        
+            if landmarks is not None:
+                EXERCISE_PROCESSORS[exercise](landmarks, hud)
+                if recorder is not None:
+                    recorder.observe_exercise(st.session_state)
+                if not stream:
+                    draw_skeleton(image, landmarks)
+        
+            put_text(hud, f"Reps: {st.session_state.counter}", (10, 30), 
+                       cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 0, 255), 2)
+            if recording is not None:
+                recording.append(landmarks, frame.timestamp, st.session_state.exercise_stage)
+        
+            if counter_placeholder is not None:
+                publisher.update("counter", st.session_state.counter)
+        
+            if stream:
+                stream.send(landmarks, hud, counter=st.session_state.counter,
+                            stage=st.session_state.exercise_stage)
+            else:
+                display.submit(image)
         
-        if st.session_state.exercise_stage == "closed":
-            cv2.putText(image, "JUMP ARMS AND LEGS OUT", (image.shape[1]//2 - 180, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 165, 255), 2)
-        else:
-            cv2.putText(image, "JUMP ARMS AND LEGS IN", (image.shape[1]//2 - 170, image.shape[0] - 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
 
-    except Exception as e:
-        st.error(f"Jumping jacks processing error: {e}")
+    except RerunException:
+        # The next run continues the set, or finishes it if it no longer shows this feed
+        defer_workout()
+        recorder = None
+        raise
+    finally:
+        if recorder is not None:
+            recorder.finish()
+        if recording is not None:
+            recording.close()
+        publisher.close()
+        if display:
+            display.close()
+        capture.stop()
+        release_session_pose()
+    cv2.destroyAllWindows()
 
-def process_shoulder_press(landmarks, image):
-    """Simplified shoulder press detection - counts reps more easily"""
-    try:
-        left_elbow = landmarks.landmark[mp_pose.PoseLandmark.LEFT_ELBOW.value]
-        left_wrist = landmarks.landmark[mp_pose.PoseLandmark.LEFT_WRIST.value]
-        right_elbow = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ELBOW.value]
-        right_wrist = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_WRIST.value]
+def process_exercise_feed_processes(exercise, counter_placeholder=None):
+    """Run the exercise feed with capture, inference and encoding in child processes"""
+    publisher = UiPublisher()
+    if counter_placeholder is not None:
+        publisher.register("counter", counter_placeholder, show_counter, st.session_state.counter)
+    recorder = start_workout("exercise", exercise)
 
-        avg_wrist_height = (left_wrist.y + right_wrist.y)/2
-        avg_elbow_height = (left_elbow.y + right_elbow.y)/2
-        
-        if avg_wrist_height > avg_elbow_height + 0.1:
-            st.session_state.exercise_stage = "down"
-            
-        if avg_wrist_height < avg_elbow_height - 0.1 and st.session_state.exercise_stage == "down":
-            st.session_state.exercise_stage = "up"
-            st.session_state.counter += 1
-            cv2.putText(image, "REP COUNTED!", (image.shape[1]//2 - 100, 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-        
-        cv2.putText(image, f"Reps: {st.session_state.counter}", (10, 30), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
-        cv2.putText(image, "PRESS UP" if st.session_state.exercise_stage == "down" else "LOWER DOWN", 
-                   (image.shape[1]//2 - 80, image.shape[0] - 50), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
+    def on_result(meta):
+        # The rule runs in the inference process; mirror its state into the session
+        st.session_state.counter = meta["counter"]
+        st.session_state.exercise_stage = meta["stage"]
+        st.session_state.total_plank_time = meta["hold"]
+        if recorder is not None:
+            recorder.observe_exercise(st.session_state)
+        if counter_placeholder is not None:
+            publisher.update("counter", meta["counter"])
 
-    except Exception as e:
-        st.error(f"Shoulder press error: {e}")
-            
-def process_plank(landmarks, image):
-    """Plank exercise with persistent total time display"""
     try:
-        shoulder = landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-        hip = landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP.value]
-        knee = landmarks.landmark[mp_pose.PoseLandmark.LEFT_KNEE.value]
-        elbow = landmarks.landmark[mp_pose.PoseLandmark.LEFT_ELBOW.value]
-        wrist = landmarks.landmark[mp_pose.PoseLandmark.LEFT_WRIST.value]
-
-        body_angle = calculate_angle(shoulder, hip, knee)
-        elbow_angle = calculate_angle(shoulder, elbow, wrist)
+        run_process_feed("exercise", exercise, st.empty(), on_result,
+                         {"counter": st.session_state.counter, "exercise_stage": st.session_state.exercise_stage,
+                          "total_plank_time": st.session_state.get("total_plank_time", 0)})
+    except RerunException:
+        # The next run continues the set, or finishes it if it no longer shows this feed
+        defer_workout()
+        recorder = None
+        raise
+    finally:
+        if recorder is not None:
+            recorder.finish()
+        publisher.close()
 
-        is_plank = (wrist.y > elbow.y) and (60 < elbow_angle < 150) and (150 < body_angle < 210)
-
-        if 'total_plank_time' not in st.session_state:
-            st.session_state.total_plank_time = 0
-        if 'last_plank_end' not in st.session_state:
-            st.session_state.last_plank_end = 0
-        if 'show_total_time' not in st.session_state:
-            st.session_state.show_total_time = False
-
-        if is_plank:
-            if 'plank_start_time' not in st.session_state:
-                st.session_state.plank_start_time = time.time()
-                st.session_state.show_total_time = False
-            
-            hold_time = time.time() - st.session_state.plank_start_time
-            cv2.putText(image, f"CURRENT: {int(hold_time)}s", (image.shape[1]//2 - 100, 50), 
-                      cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            
-            cv2.putText(image, f"TOTAL: {int(st.session_state.total_plank_time)}s", 
-                       (image.shape[1]//2 - 80, 90), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 200), 2)
-            
-        else:
-            if 'plank_start_time' in st.session_state:
-                st.session_state.total_plank_time += time.time() - st.session_state.plank_start_time
-                st.session_state.last_plank_end = time.time()
-                st.session_state.show_total_time = True
-                del st.session_state.plank_start_time
-
-            if st.session_state.show_total_time and (time.time() - st.session_state.last_plank_end < 3):
-                cv2.putText(image, f"TOTAL TIME: {int(st.session_state.total_plank_time)}s", 
-                           (image.shape[1]//2 - 120, 100), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 3)
-                cv2.putText(image, "Great effort!", (image.shape[1]//2 - 100, 150), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 200, 255), 2)
-            else:
-                st.session_state.show_total_time = False
-
-            cv2.putText(image, "Get ready for next plank!", (image.shape[1]//2 - 150, 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+# Exercise definitions: named features, threshold conditions and stage
+# transitions. The gap between a stage's entry and exit thresholds (e.g. knees
+# above 160° to stand, below 90° to count) provides hysteresis against jitter.
+EXERCISE_RULES = {
+    "Squats": {
+        "features": {
+            "knee": mean_angle((LEFT_HIP, LEFT_KNEE, LEFT_ANKLE), (RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE)),
+        },
+        "transitions": [
+            {"to": "up", "if": {"knee": above(160)}},
+            {"from": "up", "to": "down", "count": True, "if": {"knee": below(90)}},
+        ],
+        "prompts": {
+            "up": ("BEND KNEES TO SQUAT", 150, 0.8, (255, 165, 0)),
+            "default": ("STAND UP", 70, 0.8, (255, 255, 0)),
+        },
+    },
+    "Hand Raises": {
+        "features": {
+            "lift": height_above((LEFT_WRIST, RIGHT_WRIST), (LEFT_SHOULDER, RIGHT_SHOULDER)),
+        },
+        "transitions": [
+            {"to": "down", "if": {"lift": below(-0.05)}},
+            {"from": "down", "to": "up", "count": True, "if": {"lift": above(0.05)}},
+        ],
+        "prompts": {
+            "down": ("RAISE YOUR HANDS", 120, 0.8, (255, 165, 0)),
+            "default": ("LOWER YOUR HANDS", 130, 0.8, (255, 255, 0)),
+        },
+    },
+    "Push-ups": {
+        "features": {
+            "elbow": mean_angle((LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST), (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST)),
+            "shoulder": mean_angle((LEFT_ELBOW, LEFT_SHOULDER, LEFT_HIP), (RIGHT_ELBOW, RIGHT_SHOULDER, RIGHT_HIP)),
+            "left_elbow": angle(LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST),
+            "right_elbow": angle(RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST),
+        },
+        "transitions": [
+            {"to": "up", "if": {"elbow": above(160), "shoulder": above(160)}},
+            {"from": "up", "to": "down", "count": True, "if": {"elbow": below(70)}},
+        ],
+        "prompts": {
+            "up": ("LOWER YOUR BODY", 120, 0.8, (255, 165, 0)),
+            "default": ("PUSH UP", 70, 0.8, (255, 255, 0)),
+        },
+        "readouts": [
+            ("Elbow Angle", "elbow", (10, 60), 0.7, (255, 255, 255)),
+            ("L Elbow", "left_elbow", (10, 90), 0.6, (0, 255, 255)),
+            ("R Elbow", "right_elbow", (10, 120), 0.6, (0, 255, 255)),
+        ],
+    },
+    "Lunges": {
+        "features": {
+            "left_knee": angle(LEFT_HIP, LEFT_KNEE, LEFT_ANKLE),
+            "right_knee": angle(RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE),
+        },
+        "transitions": [
+            {"to": "up", "if": {"left_knee": above(160), "right_knee": above(160)}},
+            {"from": "up", "to": "down", "count": True, "when": "any",
+             "if": {"left_knee": below(90), "right_knee": below(90)}},
+        ],
+        "prompts": {
+            "up": ("STEP FORWARD INTO LUNGE", 180, 0.7, (255, 165, 0)),
+            "default": ("RETURN TO START", 120, 0.7, (255, 255, 0)),
+        },
+    },
+    "Bicep Curls": {
+        "features": {
+            "left_elbow": angle(LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST),
+            "right_elbow": angle(RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST),
+        },
+        "transitions": [
+            {"to": "down", "if": {"left_elbow": above(160), "right_elbow": above(160)}},
+            {"from": "down", "to": "up", "count": True, "when": "any",
+             "if": {"left_elbow": below(50), "right_elbow": below(50)}},
+        ],
+        "prompts": {
+            "down": ("CURL YOUR ARMS UP", 140, 0.8, (255, 165, 0)),
+            "default": ("LOWER YOUR ARMS", 120, 0.8, (255, 255, 0)),
+        },
+    },
+    "Jumping Jacks": {
+        "features": {
+            "wrist_spread": distance(LEFT_WRIST, RIGHT_WRIST),
+            "hip_spread": distance(LEFT_HIP, RIGHT_HIP),
+        },
+        "transitions": [
+            {"to": "closed", "if": {"wrist_spread": below(0.2), "hip_spread": below(0.2)}},
+            {"from": "closed", "to": "open", "count": True,
+             "if": {"wrist_spread": above(0.4), "hip_spread": above(0.3)}},
+        ],
+        "prompts": {
+            "closed": ("JUMP ARMS AND LEGS OUT", 180, 0.7, (255, 165, 0)),
+            "default": ("JUMP ARMS AND LEGS IN", 170, 0.7, (255, 255, 0)),
+        },
+    },
+    "Shoulder Press": {
+        "features": {
+            "press": height_above((LEFT_WRIST, RIGHT_WRIST), (LEFT_ELBOW, RIGHT_ELBOW)),
+        },
+        "transitions": [
+            {"to": "down", "if": {"press": below(-0.1)}},
+            {"from": "down", "to": "up", "count": True, "if": {"press": above(0.1)}},
+        ],
+        "prompts": {
+            "down": ("PRESS UP", 80, 0.8, (255, 255, 0)),
+            "default": ("LOWER DOWN", 80, 0.8, (255, 255, 0)),
+        },
+    },
+    "Plank": {
+        "kind": "hold",
+        "features": {
+            "body": angle(LEFT_SHOULDER, LEFT_HIP, LEFT_KNEE),
+            "elbow": angle(LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST),
+            "wrist_drop": height_above((LEFT_ELBOW,), (LEFT_WRIST,)),
+        },
+        "hold_when": {"wrist_drop": above(0), "elbow": between(60, 150), "body": between(150, 210)},
+    },
+}
 
-    except Exception as e:
-        st.error(f"Error tracking plank: {e}")
\ No newline at end of file
+# Dispatch table used by the live feed and the headless batch analyzer. Every
+# rule takes (landmarks, image, state=None, now=None); `state` defaults to
+# st.session_state and `now` to the wall clock.
+EXERCISE_PROCESSORS = compile_rules(EXERCISE_RULES)
@@ -0,0 +1,139 @@
+"""Shared-memory frame transport between pipeline processes.
+
+`SharedFrameRing` keeps a fixed number of frame slots in one
+`multiprocessing.shared_memory` block. Frames never go through a pickle:
+the producer writes straight into a slot and the consumer reads a NumPy
+view of the same memory. Only the slot index, sequence number, timestamp
+and a small metadata dict travel over a queue.
+
+Slots circulate between two queues. The producer takes a free slot,
+fills it and publishes it; the consumer receives it, uses it and releases
+it. When every slot is in flight, `acquire()` blocks or times out. This is
+the backpressure signal: the producer can wait or drop the frame, and it
+counts as dropped either way.
+
+A ring is passed to child processes as a `Process` argument. The child
+attaches to the same block by name. Only the creating process unlinks it.
+"""
+import multiprocessing
+import queue
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# A received frame. `image` is a view into the ring and stays valid until
+# the slot is released.
+SharedFrame = namedtuple("SharedFrame", ["image", "slot", "seq", "timestamp", "meta"])
+
+_END = None
+
+
+class SharedFrameRing:
+    """Fixed ring of frame slots in shared memory, handed between processes by index"""
+
+    def __init__(self, shape, dtype=np.uint8, slots=4, context=None):
+        if slots < 2:
+            raise ValueError("SharedFrameRing needs at least 2 slots")
+        context = context or multiprocessing.get_context("spawn")
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        self._shm = shared_memory.SharedMemory(create=True, size=slots * self._slot_bytes())
+        self._owner = True
+        self._free = context.Queue()
+        self._ready = context.Queue()
+        self._published = context.Value("Q", 0)
+        self._dropped = context.Value("Q", 0)
+        for slot in range(slots):
+            self._free.put(slot)
+        self._attach()
+
+    def _slot_bytes(self):
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+    def _attach(self):
+        self._frames = np.ndarray((self.slots,) + self.shape, self.dtype, buffer=self._shm.buf)
+
+    def __getstate__(self):
+        return {
+            "name": self._shm.name, "shape": self.shape, "dtype": self.dtype.str, "slots": self.slots,
+            "free": self._free, "ready": self._ready, "published": self._published, "dropped": self._dropped,
+        }
+
+    def __setstate__(self, state):
+        self.shape = state["shape"]
+        self.dtype = np.dtype(state["dtype"])
+        self.slots = state["slots"]
+        self._shm = shared_memory.SharedMemory(name=state["name"])
+        self._owner = False
+        self._free = state["free"]
+        self._ready = state["ready"]
+        self._published = state["published"]
+        self._dropped = state["dropped"]
+        self._attach()
+
+    def acquire(self, timeout=None):
+        """Return a free slot index, or None if all slots stayed in flight for `timeout` seconds"""
+        try:
+            return self._free.get(timeout=timeout) if timeout != 0 else self._free.get_nowait()
+        except queue.Empty:
+            return None
+
+    def slot(self, index):
+        """Return the writable array backing a slot"""
+        return self._frames[index]
+
+    def publish(self, index, seq, timestamp, meta=None):
+        """Hand a filled slot to the consumer"""
+        with self._published.get_lock():
+            self._published.value += 1
+        self._ready.put((index, seq, timestamp, meta))
+
+    def drop(self):
+        """Count a frame discarded because no slot was free"""
+        with self._dropped.get_lock():
+            self._dropped.value += 1
+
+    def receive(self, timeout=None):
+        """Return the next published SharedFrame, or None on timeout
+
+        Raises EOFError once the producer has ended the stream.
+        """
+        try:
+            item = self._ready.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if item is _END:
+            # Leave the marker for any other consumer still waiting
+            self._ready.put(_END)
+            raise EOFError("frame stream ended")
+        index, seq, timestamp, meta = item
+        return SharedFrame(self._frames[index], index, seq, timestamp, meta)
+
+    def release(self, index):
+        """Return a slot to the producer once the consumer is done with it"""
+        self._free.put(index)
+
+    def end(self):
+        """Tell the consumer no more frames will be published"""
+        self._ready.put(_END)
+
+    def stats(self):
+        return {
+            "slots": self.slots,
+            "published": self._published.value,
+            "dropped": self._dropped.value,
+        }
+
+    def close(self):
+        """Detach from the shared block; the creating process also unlinks it"""
+        self._frames = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # A SharedFrame view is still alive; the mapping goes away with the process
+            pass
+        if self._owner:
+            self._shm.unlink()
+            self._owner = False
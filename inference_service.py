@@ -0,0 +1,325 @@
+"""Local pose inference service shared by every Streamlit session.
+
+Instead of each session running `pose.process()` on its own thread, the
+feeds can send frames to one service process over a local socket. Set
+POSE_SERVICE_ADDRESS (host:port or a Unix socket path) to enable this. The
+service keeps one Pose graph per session, so tracking state stays
+separate. It runs all inference on its own thread(s).
+
+Requests that arrive within BATCH_WINDOW_MS of each other form a
+micro-batch of at most MAX_BATCH frames. MediaPipe has no batched call, so
+a batch is run back to back on the inference thread. This replaces 20
+session threads contending for the GIL with one loop that wakes once per
+batch. Each session has at most one request queued: a newer frame
+replaces an older one, and a batch takes at most one frame per session in
+arrival order. A busy session therefore cannot starve the others.
+
+Every reply carries the request's queue wait, inference time and batch
+size. `RemotePose` adds the round trip, so transport cost can be
+separated from inference. A frame that fails inference is answered with
+no landmarks, and the loop carries on with the next one.
+
+Connections are authenticated with POSE_SERVICE_AUTHKEY. Requests are
+unpickled, so the key must be a secret shared by the service and the
+Streamlit server. Neither side starts without it. The service listens on
+127.0.0.1 unless another host is given.
+
+    POSE_SERVICE_AUTHKEY=... python inference_service.py [--address 127.0.0.1:6007] [--model-complexity 1]
+"""
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from pose_pool import POSE_SERVICE_ADDRESS, create_pose
+from utils import NUM_LANDMARKS, landmarks_to_array
+
+POSE_SERVICE_AUTHKEY = os.environ.get("POSE_SERVICE_AUTHKEY", "").encode()
+BATCH_WINDOW_MS = float(os.environ.get("POSE_BATCH_WINDOW_MS", 4))
+MAX_BATCH = int(os.environ.get("POSE_MAX_BATCH", 8))
+
+logger = logging.getLogger(__name__)
+
+
+def require_authkey(authkey):
+    if not authkey:
+        raise AuthenticationError("POSE_SERVICE_AUTHKEY is not set")
+    return authkey
+
+
+def parse_address(address):
+    """"host:port" for TCP, anything else is a Unix socket path"""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        return host or "127.0.0.1", int(port)
+    return address
+
+
+class Request:
+    __slots__ = ("session", "seq", "image", "arrived", "reply")
+
+    def __init__(self, session, seq, image, reply):
+        self.session = session
+        self.seq = seq
+        self.image = image
+        self.arrived = time.perf_counter()
+        self.reply = reply
+
+
+class MicroBatcher:
+    """Groups pending requests into fair micro-batches, one frame per session"""
+
+    def __init__(self, window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending = OrderedDict()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.superseded = 0
+
+    def submit(self, request):
+        with self._cond:
+            stale = self._pending.pop(request.session, None)
+            if stale is not None:
+                self.superseded += 1
+                stale.reply(None, 0.0, 0.0, 0)
+            # Re-inserting moves the session to the back of the arrival order
+            self._pending[request.session] = request
+            self._cond.notify()
+
+    def next_batch(self):
+        """Block until a batch is ready; returns [] once closed"""
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return []
+            deadline = next(iter(self._pending.values())).arrived + self.window
+            while len(self._pending) < self.max_batch and not self._closed:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = []
+            while self._pending and len(batch) < self.max_batch:
+                batch.append(self._pending.popitem(last=False)[1])
+            return batch
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class InferenceService:
+    """Accepts session connections and runs their frames in micro-batches"""
+
+    def __init__(self, address, model_complexity=1, window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH,
+                 threads=None, factory=create_pose, authkey=POSE_SERVICE_AUTHKEY):
+        self.listener = Listener(parse_address(address), authkey=require_authkey(authkey))
+        self.address = self.listener.address
+        self.model_complexity = model_complexity
+        self.factory = factory
+        self.batcher = MicroBatcher(window_ms, max_batch)
+        self._graphs = {}
+        self._active = set()
+        self._lock = threading.Lock()
+        self._sessions = 0
+        self.batches = 0
+        self.requests = 0
+        self.errors = 0
+        self._batch_sizes = deque(maxlen=1000)
+        # Graphs release the GIL while they run, so sessions on separate threads proceed in parallel
+        self._workers = [threading.Thread(target=self._run, name=f"pose-inference-{i}", daemon=True)
+                         for i in range(threads or os.cpu_count() or 1)]
+
+    def serve_forever(self):
+        for worker in self._workers:
+            worker.start()
+        while True:
+            try:
+                conn = self.listener.accept()
+            except AuthenticationError:
+                # A client without the key; keep serving the others
+                logger.warning("Rejected a connection with the wrong key")
+                continue
+            except OSError:
+                return
+            self._sessions += 1
+            with self._lock:
+                self._active.add(self._sessions)
+            threading.Thread(target=self._serve, args=(conn, self._sessions), daemon=True).start()
+
+    def _serve(self, conn, session):
+        send_lock = threading.Lock()
+
+        def reply(seq):
+            def send(landmarks, queue_ms, inference_ms, batch_size):
+                with send_lock:
+                    conn.send((seq, landmarks, queue_ms, inference_ms, batch_size))
+            return send
+
+        try:
+            while True:
+                seq, shape = conn.recv()
+                image = np.frombuffer(conn.recv_bytes(), dtype=np.uint8).reshape(shape)
+                self.batcher.submit(Request(session, seq, image, reply(seq)))
+        except (EOFError, OSError):
+            pass
+        except ValueError:
+            # A frame that does not match its shape; drop the client rather than guess
+            logger.warning("Malformed frame from session %s", session)
+        finally:
+            conn.close()
+            with self._lock:
+                self._active.discard(session)
+                graph = self._graphs.pop(session, None)
+            if graph is not None:
+                with graph[1]:
+                    graph[0].close()
+
+    def _graph(self, session):
+        """Return the session's (Pose graph, lock), or None once it has disconnected"""
+        with self._lock:
+            graph = self._graphs.get(session)
+            if graph is None and session in self._active:
+                graph = self._graphs[session] = (self.factory(self.model_complexity), threading.Lock())
+            return graph
+
+    def _run(self):
+        buffer = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+        while True:
+            batch = self.batcher.next_batch()
+            if not batch:
+                return
+            self.batches += 1
+            self.requests += len(batch)
+            self._batch_sizes.append(len(batch))
+            for request in batch:
+                graph = self._graph(request.session)
+                if graph is None:
+                    continue
+                pose, graph_lock = graph
+                # With several inference threads, a graph must still only run one frame at a time
+                with graph_lock:
+                    started = time.perf_counter()
+                    try:
+                        results = pose.process(request.image)
+                        landmarks = (landmarks_to_array(results.pose_landmarks, buffer).tobytes()
+                                     if results.pose_landmarks is not None else b"")
+                    except Exception:
+                        # One bad frame must not stop inference for every session
+                        self.errors += 1
+                        logger.exception("Inference failed for session %s", request.session)
+                        landmarks = b""
+                    finished = time.perf_counter()
+                try:
+                    request.reply(landmarks, (started - request.arrived) * 1000,
+                                  (finished - started) * 1000, len(batch))
+                except OSError:
+                    pass
+
+    def stats(self):
+        sizes = list(self._batch_sizes)
+        return {
+            "sessions": len(self._graphs),
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch": round(float(np.mean(sizes)), 2) if sizes else 0.0,
+            "superseded": self.batcher.superseded,
+            "errors": self.errors,
+        }
+
+    def close(self):
+        self.batcher.close()
+        self.listener.close()
+
+
+class RemoteResults:
+    """Stand-in for Pose results; pose_landmarks is a (33, 4) array or None"""
+
+    __slots__ = ("pose_landmarks",)
+
+    def __init__(self, pose_landmarks):
+        self.pose_landmarks = pose_landmarks
+
+
+class RemotePose:
+    """Pose graph interface backed by the inference service"""
+
+    def __init__(self, address=POSE_SERVICE_ADDRESS, window=300, authkey=POSE_SERVICE_AUTHKEY):
+        self.conn = Client(parse_address(address), authkey=require_authkey(authkey))
+        self._seq = 0
+        self._landmarks = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+        self._timings = deque(maxlen=window)
+
+    def process(self, image):
+        started = time.perf_counter()
+        self._seq += 1
+        self.conn.send((self._seq, image.shape))
+        # send_bytes sizes a buffer by its first dimension, so the frame goes as flat bytes
+        self.conn.send_bytes(np.ascontiguousarray(image).reshape(-1))
+        # Replies to superseded requests carry no landmarks; wait for our own
+        while True:
+            seq, landmarks, queue_ms, inference_ms, batch_size = self.conn.recv()
+            if seq == self._seq:
+                break
+        round_trip = (time.perf_counter() - started) * 1000
+        self._timings.append((round_trip, queue_ms, inference_ms, batch_size))
+        if not landmarks:
+            return RemoteResults(None)
+        self._landmarks[...] = np.frombuffer(landmarks, dtype=np.float32).reshape(NUM_LANDMARKS, 4)
+        return RemoteResults(self._landmarks)
+
+    def stats(self):
+        """p50/p95 of round trip, service queue wait and inference, in ms"""
+        if not self._timings:
+            return {}
+        timings = np.array(self._timings)
+        stats = {}
+        for column, name in enumerate(("round_trip", "queue", "inference")):
+            p50, p95 = np.percentile(timings[:, column], [50, 95])
+            stats[name] = {"p50": round(float(p50), 2), "p95": round(float(p95), 2)}
+        stats["transport_p50"] = round(float(np.median(timings[:, 0] - timings[:, 1] - timings[:, 2])), 2)
+        stats["mean_batch"] = round(float(timings[:, 3].mean()), 2)
+        return stats
+
+    def close(self):
+        self.conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local pose inference service")
+    parser.add_argument("--address", default=POSE_SERVICE_ADDRESS or "127.0.0.1:6007")
+    parser.add_argument("--model-complexity", type=int, default=1, choices=(0, 1, 2))
+    parser.add_argument("--window-ms", type=float, default=BATCH_WINDOW_MS)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--threads", type=int, default=None, help="inference threads (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    if not POSE_SERVICE_AUTHKEY:
+        print("Set POSE_SERVICE_AUTHKEY to a shared secret, e.g. python -c 'import secrets; "
+              "print(secrets.token_hex(32))'", file=sys.stderr)
+        return 2
+    logging.basicConfig(level=logging.INFO)
+    service = InferenceService(args.address, args.model_complexity, args.window_ms, args.max_batch, args.threads)
+    print(f"Pose inference service listening on {service.address}")
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        print(service.stats())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
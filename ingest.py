@@ -0,0 +1,647 @@
+"""Browser-side camera capture with server-side frame ingestion.
+
+In hosted deployments the Streamlit server has no camera. With
+CAMERA_SOURCE=browser, the page embeds a small component that captures
+the user's webcam and POSTs JPEG frames to an ingestion endpoint on this
+server. Each request carries a per-session token in the path and
+X-Frame-Seq / X-Frame-Timestamp headers.
+
+Frames are queued per session. A frame older than one already received
+(by sequence number or client timestamp) is rejected as late. When the
+consumer reads, only the newest queued frame is used; older ones are
+dropped. `IngestedCapture` wraps a session queue in the `cv2.VideoCapture`
+interface, so `CaptureStage` and both feeds consume browser frames
+unchanged. Its `read_async` waits on the event loop instead of a thread,
+for the asyncio session runtime: the queue wakes it when a frame arrives.
+
+In the other direction, a feed can publish a compact result message per
+frame to the session, which the page reads as server-sent events from
+GET /landmarks/<token> (see landmark_stream.py).
+
+Local test without a browser, using a scripted fake client:
+
+    python ingest.py selftest --image "yoga poses/mountain.jpeg" --exercise Squats
+    python ingest.py fake-client http://localhost:8765 TOKEN --video session.mp4
+"""
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+import streamlit as st
+import streamlit.components.v1 as components
+
+# "server" opens a local webcam with OpenCV; "browser" ingests frames sent by the page
+CAMERA_SOURCE = os.environ.get("CAMERA_SOURCE", "server").lower()
+INGEST_HOST = os.environ.get("INGEST_HOST", "0.0.0.0")
+INGEST_PORT = int(os.environ.get("INGEST_PORT", 8765))
+# Public base URL of the ingestion endpoint when it sits behind a proxy; by default
+# the browser uses the page's host name with INGEST_PORT
+INGEST_PUBLIC_URL = os.environ.get("INGEST_PUBLIC_URL", "")
+MAX_FRAME_BYTES = 2 * 1024 * 1024
+# Frames that waited longer than this on the server are stale by the time they are read
+MAX_FRAME_AGE = 0.5
+QUEUE_DEPTH = 4
+
+
+class SessionQueue:
+    """Per-session queue of compressed frames that only ever yields the newest one"""
+
+    def __init__(self, depth=QUEUE_DEPTH, max_age=MAX_FRAME_AGE):
+        self.max_age = max_age
+        self._frames = deque(maxlen=depth)
+        self._cond = threading.Condition()
+        self._last_seq = -1
+        self._last_timestamp = float("-inf")
+        self._closed = False
+        self._message = None
+        self._message_id = 0
+        # Called with no arguments, under the queue's lock, whenever a frame arrives or the queue closes
+        self._listeners = []
+        self.received = 0
+        self.late = 0
+        self.skipped = 0
+        self.stale = 0
+        self.delivered = 0
+
+    def put(self, seq, timestamp, data):
+        """Queue a frame; returns False if it arrived after a newer one"""
+        with self._cond:
+            self.received += 1
+            if seq <= self._last_seq or timestamp < self._last_timestamp:
+                self.late += 1
+                return False
+            self._last_seq = seq
+            self._last_timestamp = timestamp
+            if len(self._frames) == self._frames.maxlen:
+                self.skipped += 1
+            self._frames.append((seq, timestamp, time.monotonic(), data))
+            self._cond.notify_all()
+            self._notify_listeners()
+            return True
+
+    def get(self, timeout=None):
+        """Return the newest (seq, timestamp, data), or None on timeout or close"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None
+                if self._frames:
+                    seq, timestamp, arrived, data = self._frames.pop()
+                    self.skipped += len(self._frames)
+                    self._frames.clear()
+                    if time.monotonic() - arrived <= self.max_age:
+                        self.delivered += 1
+                        return seq, timestamp, data
+                    self.stale += 1
+                    continue
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    def add_listener(self, callback):
+        with self._cond:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._cond:
+            self._listeners.remove(callback)
+
+    def _notify_listeners(self):
+        for callback in self._listeners:
+            callback()
+
+    def publish(self, message):
+        """Replace the session's latest outgoing message"""
+        with self._cond:
+            self._message_id += 1
+            self._message = message
+            self._cond.notify_all()
+
+    def next_message(self, after, timeout=None):
+        """Wait for a message newer than `after`; returns (id, message) or None"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._closed and self._message_id <= after:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            if self._message_id <= after:
+                return None
+            return self._message_id, self._message
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._frames.clear()
+            self._cond.notify_all()
+            self._notify_listeners()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "received": self.received,
+                "late": self.late,
+                "skipped": self.skipped,
+                "stale": self.stale,
+                "delivered": self.delivered,
+            }
+
+
+class IngestRegistry:
+    """Maps session tokens to their frame queues"""
+
+    def __init__(self):
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def register(self, token):
+        with self._lock:
+            queue = self._queues.get(token)
+            if queue is None or queue.closed:
+                queue = self._queues[token] = SessionQueue()
+            return queue
+
+    def unregister(self, token):
+        with self._lock:
+            queue = self._queues.pop(token, None)
+        if queue is not None:
+            queue.close()
+
+    def get(self, token):
+        with self._lock:
+            return self._queues.get(token)
+
+
+class IngestHandler(BaseHTTPRequestHandler):
+    """POST /frames/<token> with a JPEG body and sequence/timestamp headers;
+    GET /landmarks/<token> streams the session's result messages"""
+
+    registry = None
+
+    def _send(self, status, body=b""):
+        self.send_response(status)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type, X-Frame-Seq, X-Frame-Timestamp")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_OPTIONS(self):
+        self._send(204)
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 2 or parts[0] != "landmarks":
+            return self._send(404, b"unknown endpoint")
+        queue = self.registry.get(parts[1])
+        if queue is None or queue.closed:
+            return self._send(404, b"unknown session")
+        self.send_response(200)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        last = 0
+        try:
+            while not queue.closed:
+                # Latest-only: a slow reader skips messages rather than queueing them
+                item = queue.next_message(last, timeout=15)
+                if item is None:
+                    self.wfile.write(b": keep-alive\n\n")
+                else:
+                    last, message = item
+                    self.wfile.write(b"data: " + message + b"\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_POST(self):
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 2 or parts[0] != "frames":
+            return self._send(404, b"unknown endpoint")
+        queue = self.registry.get(parts[1])
+        if queue is None:
+            return self._send(404, b"unknown session")
+        try:
+            length = int(self.headers["Content-Length"])
+            seq = int(self.headers["X-Frame-Seq"])
+            timestamp = float(self.headers["X-Frame-Timestamp"])
+        except (TypeError, ValueError):
+            return self._send(400, b"missing or invalid frame headers")
+        if length <= 0 or length > MAX_FRAME_BYTES:
+            return self._send(413, b"frame too large")
+        data = self.rfile.read(length)
+        if queue.put(seq, timestamp, data):
+            self._send(202)
+        else:
+            self._send(409, b"late")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class IngestServer:
+    """Threaded HTTP server receiving frames for every browser session"""
+
+    def __init__(self, host=INGEST_HOST, port=INGEST_PORT):
+        self.registry = IngestRegistry()
+        handler = type("BoundIngestHandler", (IngestHandler,), {"registry": self.registry})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="frame-ingest", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class IngestedCapture:
+    """cv2.VideoCapture-like reader over a session's ingested frames"""
+
+    def __init__(self, queue, first_frame_timeout=30.0, frame_timeout=10.0, on_release=None):
+        self.queue = queue
+        self.on_release = on_release
+        self.first_frame_timeout = first_frame_timeout
+        self.frame_timeout = frame_timeout
+        self._started = False
+        self.last_seq = None
+        self.last_timestamp = None
+
+    def isOpened(self):
+        return not self.queue.closed
+
+    def read(self, image=None):
+        """Block for the newest decodable frame; (False, None) once the client goes quiet"""
+        timeout = self.frame_timeout if self._started else self.first_frame_timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            item = self.queue.get(max(0.0, deadline - time.monotonic()))
+            if item is None:
+                return False, None
+            frame = self._decode(item, image)
+            if frame is not None:
+                return True, frame
+
+    async def read_async(self, image=None, call=None):
+        """read() for an event loop: waits for a frame without a thread
+
+        `call` is an async runner for blocking work, e.g. one that submits to
+        an executor; decoding goes through it. Without it, frames are decoded
+        on the loop.
+        """
+        loop = asyncio.get_running_loop()
+        arrived = asyncio.Event()
+
+        def wake():
+            loop.call_soon_threadsafe(arrived.set)
+
+        timeout = self.frame_timeout if self._started else self.first_frame_timeout
+        deadline = loop.time() + timeout
+        self.queue.add_listener(wake)
+        try:
+            while True:
+                # Cleared before looking, so a frame put in between still wakes the wait below
+                arrived.clear()
+                item = self.queue.get(0)
+                if item is None:
+                    remaining = deadline - loop.time()
+                    if self.queue.closed or remaining <= 0:
+                        return False, None
+                    try:
+                        await asyncio.wait_for(arrived.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        return False, None
+                    continue
+                frame = await call(self._decode, item, image) if call else self._decode(item, image)
+                if frame is not None:
+                    return True, frame
+        finally:
+            self.queue.remove_listener(wake)
+
+    def _decode(self, item, image=None):
+        """Decode a queued (seq, timestamp, data) frame into `image` if given; None if it is not a picture"""
+        seq, timestamp, data = item
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            return None
+        self._started = True
+        self.last_seq, self.last_timestamp = seq, timestamp
+        if image is not None:
+            if frame.shape != image.shape:
+                cv2.resize(frame, (image.shape[1], image.shape[0]), dst=image)
+            else:
+                np.copyto(image, frame)
+            return image
+        return frame
+
+    def release(self):
+        self.queue.close()
+        if self.on_release is not None:
+            on_release, self.on_release = self.on_release, None
+            on_release()
+
+
+@st.cache_resource
+def get_ingest_server():
+    """Start the ingestion endpoint once per Streamlit server"""
+    return IngestServer()
+
+
+def ingest_token():
+    """Return this session's unguessable ingestion token"""
+    if 'ingest_token' not in st.session_state:
+        st.session_state.ingest_token = secrets.token_urlsafe(16)
+    return st.session_state.ingest_token
+
+
+CAMERA_COMPONENT = """
+<div id="stage" style="position:relative;max-width:%(width)dpx">
+  <video id="video" autoplay playsinline muted
+         style="display:none;width:100%%;aspect-ratio:%(width)d/%(height)d;object-fit:fill"></video>
+  <canvas id="overlay" width="%(width)d" height="%(height)d"
+          style="display:none;position:absolute;left:0;top:0;width:100%%;height:100%%"></canvas>
+</div>
+<canvas id="canvas" width="%(width)d" height="%(height)d" style="display:none"></canvas>
+<div id="status" style="font-family:sans-serif;font-size:13px;color:#666">Starting camera…</div>
+<script>
+const config = %(config)s;
+const base = config.url || (window.parent.location.protocol + "//" + window.parent.location.hostname + ":" + config.port);
+const endpoint = base + "/frames/" + config.token;
+const video = document.getElementById("video");
+const canvas = document.getElementById("canvas");
+const context = canvas.getContext("2d");
+const status = document.getElementById("status");
+let seq = 0, inFlight = false, sent = 0;
+
+function send() {
+  // One request in flight at a time: a slow uplink skips frames rather than queueing them
+  if (!inFlight && video.readyState >= 2) {
+    context.drawImage(video, 0, 0, canvas.width, canvas.height);
+    inFlight = true;
+    canvas.toBlob(blob => {
+      fetch(endpoint, {
+        method: "POST",
+        headers: {"Content-Type": "image/jpeg", "X-Frame-Seq": String(++seq),
+                  "X-Frame-Timestamp": String((performance.timeOrigin + performance.now()) / 1000)},
+        body: blob,
+      }).then(() => { sent++; if (!config.overlay) status.textContent = "Streaming camera (" + sent + " frames)"; })
+        .catch(() => { status.textContent = "Unable to reach the frame server"; })
+        .finally(() => { inFlight = false; });
+    }, "image/jpeg", config.quality);
+  }
+  setTimeout(send, 1000 / config.fps);
+}
+
+function rgb(c) { return "rgb(" + c.join(",") + ")"; }
+
+function drawResult(message) {
+  // Skeleton and HUD from the server's landmark message, drawn over the local video
+  const style = config.overlay, ctx = overlay.getContext("2d");
+  const w = overlay.width, h = overlay.height, lm = message.landmarks;
+  ctx.clearRect(0, 0, w, h);
+  if (lm) {
+    const px = i => [lm[3 * i] / style.scale * w, lm[3 * i + 1] / style.scale * h];
+    const visible = i => lm[3 * i + 2] > style.threshold;
+    ctx.strokeStyle = rgb(style.line);
+    ctx.lineWidth = 2;
+    ctx.beginPath();
+    for (const [a, b] of style.connections) {
+      if (visible(a) && visible(b)) { ctx.moveTo(...px(a)); ctx.lineTo(...px(b)); }
+    }
+    ctx.stroke();
+    ctx.fillStyle = rgb(style.joint);
+    for (let i = 0; i < lm.length / 3; i++) {
+      if (visible(i)) { ctx.beginPath(); ctx.arc(...px(i), 3, 0, 2 * Math.PI); ctx.fill(); }
+    }
+  }
+  for (const [text, x, y, font, scale, color, thickness] of message.hud) {
+    // Hershey scale 1.0 is roughly a 30px font; TRIPLEX (4) is the serif face
+    ctx.font = (thickness > 1 ? "bold " : "") + Math.round(30 * scale) + "px " + (font === 4 ? "serif" : "sans-serif");
+    ctx.fillStyle = rgb(color);
+    ctx.fillText(text, x, y);
+  }
+  status.textContent = message.feedback || "";
+}
+
+const overlay = document.getElementById("overlay");
+if (config.overlay) {
+  video.style.display = "block";
+  overlay.style.display = "block";
+  new EventSource(base + "/landmarks/" + config.token).onmessage = event => drawResult(JSON.parse(event.data));
+}
+
+navigator.mediaDevices.getUserMedia({video: {width: canvas.width, height: canvas.height}, audio: false})
+  .then(stream => { video.srcObject = stream; send(); })
+  .catch(err => { status.textContent = "Camera unavailable: " + err.message; });
+</script>
+"""
+
+
+def render_camera_component(token, width=640, height=480, fps=30, quality=0.7, overlay=None):
+    """Embed the browser capture component; `overlay` draws streamed results over the local video"""
+    server = get_ingest_server()
+    config = {"token": token, "port": server.port, "url": INGEST_PUBLIC_URL, "fps": fps, "quality": quality,
+              "overlay": overlay}
+    components.html(CAMERA_COMPONENT % {"width": width, "height": height, "config": json.dumps(config)},
+                    height=height + 40 if overlay else 30)
+
+
+def open_browser_camera(overlay=None):
+    """Show the capture component and return a capture fed by this session's browser"""
+    token = ingest_token()
+    registry = get_ingest_server().registry
+    queue = registry.register(token)
+    render_camera_component(token, overlay=overlay)
+    # Releasing the capture drops the session's queue so its buffered frames go with it
+    return IngestedCapture(queue, on_release=lambda: registry.unregister(token))
+
+
+# ----- Scripted fake client for local testing -----
+
+def client_frames(video=None, image=None, frames=120):
+    """Yield BGR frames from a video file, or a slowly panning still image"""
+    if video:
+        cap = cv2.VideoCapture(video)
+        try:
+            while True:
+                ret, frame = cap.read()
+                if not ret:
+                    return
+                yield frame
+        finally:
+            cap.release()
+    source = cv2.imread(image) if image else np.full((480, 640, 3), 90, dtype=np.uint8)
+    if source is None:
+        raise IOError(f"Unable to read image: {image}")
+    scale = min(640 / source.shape[1], 480 / source.shape[0]) * 0.9
+    for i in range(frames):
+        shift = 20 * np.sin(2 * np.pi * i / frames)
+        matrix = np.float32([[scale, 0, (640 - source.shape[1] * scale) / 2 + shift],
+                             [0, scale, (480 - source.shape[0] * scale) / 2]])
+        yield cv2.warpAffine(source, matrix, (640, 480), borderValue=(90, 90, 90))
+
+
+def run_fake_client(url, token, frames, fps=30.0, quality=70, late_every=0):
+    """POST frames like the browser component; every late_every-th frame is also replayed late"""
+    endpoint = f"{url.rstrip('/')}/frames/{token}"
+    counts = {"accepted": 0, "late": 0, "errors": 0}
+    previous = None
+    for seq, frame in enumerate(frames, start=1):
+        started = time.monotonic()
+        ok, data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        batch = [(seq, time.time(), data.tobytes())]
+        if late_every and previous is not None and seq % late_every == 0:
+            batch.append(previous)
+        previous = batch[0]
+        for frame_seq, timestamp, body in batch:
+            request = urllib.request.Request(endpoint, data=body, method="POST", headers={
+                "Content-Type": "image/jpeg", "X-Frame-Seq": str(frame_seq), "X-Frame-Timestamp": str(timestamp)})
+            try:
+                urllib.request.urlopen(request, timeout=5).close()
+                counts["accepted"] += 1
+            except urllib.error.HTTPError as e:
+                counts["late" if e.code == 409 else "errors"] += 1
+            except OSError:
+                counts["errors"] += 1
+        time.sleep(max(0.0, 1.0 / fps - (time.monotonic() - started)))
+    return counts
+
+
+def read_events(url, token, counts):
+    """Count the server-sent result messages of a session until the stream ends"""
+    try:
+        with urllib.request.urlopen(f"{url}/landmarks/{token}", timeout=30) as response:
+            for line in response:
+                if line.startswith(b"data: "):
+                    counts["messages"] = counts.get("messages", 0) + 1
+                    counts["bytes"] = counts.get("bytes", 0) + len(line) - 7
+    except OSError:
+        pass
+
+
+def selftest(args):
+    """Run the server, a fake client and the capture stage end to end in one process"""
+    from capture import CaptureStage
+
+    server = IngestServer("127.0.0.1", 0)
+    token = secrets.token_urlsafe(16)
+    queue = server.registry.register(token)
+    url = f"http://127.0.0.1:{server.port}"
+    client_counts = {}
+    frames = client_frames(args.video, args.image, args.frames)
+    client = threading.Thread(target=lambda: client_counts.update(
+        run_fake_client(url, token, frames, args.fps, late_every=args.late_every)), daemon=True)
+
+    rule = tracker = state = stream = None
+    event_counts, jpeg_bytes = {}, []
+    if args.exercise:
+        from exercises import EXERCISE_PROCESSORS
+        from pose_pool import create_pose
+        from tracking import LandmarkTracker
+        from utils import SessionState
+        rule = EXERCISE_PROCESSORS[args.exercise]
+        tracker = LandmarkTracker(create_pose())
+        state = SessionState(counter=0, exercise_stage="start")
+        if args.landmarks:
+            from display import encode_frame
+            from landmark_stream import LandmarkStream
+            from overlay import TextLayer, put_text
+            from tracking import draw_skeleton
+            stream = LandmarkStream(queue)
+            events = threading.Thread(target=read_events, args=(url, token, event_counts), daemon=True)
+            events.start()
+
+    client.start()
+    capture = CaptureStage(IngestedCapture(queue, first_frame_timeout=10, frame_timeout=2))
+    processed = detected = 0
+    try:
+        if not capture.start():
+            print("No frames received", file=sys.stderr)
+            return 1
+        while True:
+            frame = capture.read_latest(timeout=3.0)
+            if frame is None:
+                break
+            processed += 1
+            if tracker is not None:
+                rgb = cv2.cvtColor(frame.image, cv2.COLOR_BGR2RGB)
+                landmarks = tracker.process(rgb, frame.timestamp)
+                hud = TextLayer(rgb.shape) if stream else rgb
+                if landmarks is not None:
+                    detected += 1
+                    rule(landmarks, hud, state, frame.timestamp)
+                if stream:
+                    stream.send(landmarks, hud, counter=state.counter, stage=state.exercise_stage)
+                    # What the frame path would have sent for the same frame
+                    if landmarks is not None:
+                        draw_skeleton(rgb, landmarks)
+                    for text, x, y, font, scale, color, thickness in hud.items:
+                        put_text(rgb, text, (x, y), font, scale, color, thickness)
+                    jpeg_bytes.append(len(encode_frame(rgb)))
+    finally:
+        capture.stop()
+        client.join(timeout=5)
+        server.close()
+
+    print(f"client: {client_counts}")
+    print(f"server queue: {queue.stats()}")
+    print(f"capture: {capture.stats()}, frames processed: {processed}")
+    if tracker is not None:
+        print(f"{args.exercise}: pose found in {detected} frames, reps={state.counter}, stage={state.exercise_stage}")
+    if stream is not None:
+        print(f"landmark stream: {stream.stats()}, received by client: {event_counts}")
+        print(f"annotated JPEG frames: {np.mean(jpeg_bytes):.0f} bytes per frame")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Frame ingestion tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    fake = commands.add_parser("fake-client", help="send frames to a running ingestion endpoint")
+    fake.add_argument("url", help="e.g. http://localhost:8765")
+    fake.add_argument("token", help="session ingestion token")
+    for command in (fake, commands.add_parser("selftest", help="server, fake client and capture in one process")):
+        command.add_argument("--video", help="video file to stream")
+        command.add_argument("--image", help="still image to stream with a slow pan")
+        command.add_argument("--frames", type=int, default=120, help="frames to send from --image")
+        command.add_argument("--fps", type=float, default=30.0)
+        command.add_argument("--late-every", type=int, default=0,
+                             help="replay every Nth frame's predecessor to exercise late-frame dropping")
+        if command is not fake:
+            command.add_argument("--exercise", help="run this exercise's rule over the received frames")
+            command.add_argument("--landmarks", action="store_true",
+                                 help="with --exercise, stream landmark messages and compare sizes with JPEG frames")
+    args = parser.parse_args(argv)
+
+    if args.command == "fake-client":
+        counts = run_fake_client(args.url, args.token, client_frames(args.video, args.image, args.frames),
+                                 args.fps, late_every=args.late_every)
+        print(counts)
+        return 0
+    return selftest(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
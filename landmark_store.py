@@ -0,0 +1,255 @@
+"""Append-only recordings of a live session's landmarks, readable with numpy.memmap.
+
+A recording file is laid out as:
+
+    header   64 bytes: magic, version, landmark itemsize, landmark count,
+             record size, wall-clock start time, clock offset
+    records  fixed-size RECORD_DTYPE rows, one per processed frame:
+             timestamp (f8), landmarks (33 x 4, f2 or f4), stage code (u1),
+             flags (u1)
+    footer   JSON: kind, activity, record count, stage names by code and a
+             sparse (record, timestamp) index every INDEX_STRIDE records,
+             then its length (u8) and END_MAGIC
+
+Landmarks are stored as float16 unless RECORD_FLOAT32=1. Normalized
+coordinates keep about four significant digits, well under a pixel at
+camera resolution. A record is 274 bytes, so an hour at 30 fps takes
+about 30 MB. Frames without a detected person hold NaN landmarks and no
+DETECTED flag. A recording holds at most 256 distinct stages, counting
+"no stage"; appending another raises ValueError.
+
+Record timestamps are the feed's `time.monotonic()` frame times. The
+header's clock offset is `time.time() - time.monotonic()` taken when the
+writer opened, so adding it to a timestamp gives wall-clock time. It is in
+the header rather than the footer so a recording that was never closed
+can still be queried by wall-clock time.
+
+`LandmarkWriter` fills a preallocated chunk of records and writes it in
+one call when full, so a frame costs one row assignment. The footer is
+written on close. If a session dies before that, the records already
+written are still readable: `open_recording` falls back to counting whole
+records from the file size. In that case stage codes have no names.
+"""
+import json
+import os
+import re
+import struct
+import time
+import uuid
+
+import numpy as np
+
+from utils import NUM_LANDMARKS
+
+# A directory here turns recording on for every live feed
+RECORDINGS_DIR = os.environ.get("RECORDINGS_DIR", "")
+RECORD_FLOAT32 = os.environ.get("RECORD_FLOAT32", "0") == "1"
+FILE_SUFFIX = ".lmk"
+
+MAGIC = b"LMKS"
+END_MAGIC = b"LMKE"
+VERSION = 2
+HEADER = struct.Struct("<4sHHHHdd")
+HEADER_SIZE = 64
+TRAILER = struct.Struct("<Q4s")
+# Records per footer index entry, and per write
+INDEX_STRIDE = 1024
+CHUNK_RECORDS = 256
+
+# Stage codes are one byte
+MAX_STAGES = 256
+
+# Record flags
+DETECTED = 1
+GOOD_FORM = 2
+
+
+def record_dtype(itemsize=2):
+    """The packed record layout for float16 (itemsize 2) or float32 (itemsize 4) landmarks"""
+    return np.dtype([
+        ("timestamp", "<f8"),
+        ("landmarks", f"<f{itemsize}", (NUM_LANDMARKS, 4)),
+        ("stage", "u1"),
+        ("flags", "u1"),
+    ])
+
+
+RECORD_DTYPE = record_dtype(4 if RECORD_FLOAT32 else 2)
+
+
+class LandmarkWriter:
+    """Appends one record per frame to a recording file"""
+
+    def __init__(self, path, kind, activity, float32=RECORD_FLOAT32, chunk=CHUNK_RECORDS):
+        self.path = path
+        self.kind = kind
+        self.activity = activity
+        self.dtype = record_dtype(4 if float32 else 2)
+        self.started_at = time.time()
+        # Wall-clock time minus monotonic time; record timestamps are monotonic
+        self.clock_offset = self.started_at - time.monotonic()
+        self.count = 0
+        self._stages = {None: 0}
+        self._index = []
+        self._chunk = np.zeros(chunk, dtype=self.dtype)
+        self._filled = 0
+        self._file = open(path, "wb")
+        header = HEADER.pack(MAGIC, VERSION, self.dtype["landmarks"].base.itemsize, NUM_LANDMARKS,
+                             self.dtype.itemsize, self.started_at, self.clock_offset)
+        self._file.write(header.ljust(HEADER_SIZE, b"\0"))
+
+    def append(self, landmarks, timestamp, stage=None, good=False):
+        """Record a frame's landmarks (None if no person was found) with its stage and form"""
+        code = self._stages.get(stage)
+        if code is None:
+            if len(self._stages) == MAX_STAGES:
+                raise ValueError(f"A recording holds at most {MAX_STAGES} stages; cannot add {stage!r}")
+            code = self._stages[stage] = len(self._stages)
+        row = self._chunk[self._filled]
+        if landmarks is None:
+            row["landmarks"] = np.nan
+            flags = 0
+        else:
+            row["landmarks"] = landmarks
+            flags = DETECTED
+        row["timestamp"] = timestamp
+        row["stage"] = code
+        row["flags"] = flags | (GOOD_FORM if good else 0)
+        if self.count % INDEX_STRIDE == 0:
+            self._index.append((self.count, float(timestamp)))
+        self.count += 1
+        self._filled += 1
+        if self._filled == len(self._chunk):
+            self.flush()
+
+    def flush(self):
+        if self._filled:
+            self._file.write(self._chunk[:self._filled].tobytes())
+            self._filled = 0
+
+    def close(self):
+        """Write the remaining records and the footer"""
+        if self._file.closed:
+            return
+        self.flush()
+        footer = json.dumps({
+            "kind": self.kind,
+            "activity": self.activity,
+            "count": self.count,
+            "stages": [name for name, _ in sorted(self._stages.items(), key=lambda item: item[1])],
+            "index": self._index,
+        }).encode()
+        self._file.write(footer)
+        self._file.write(TRAILER.pack(len(footer), END_MAGIC))
+        self._file.close()
+
+
+class LandmarkRecording:
+    """A recording mapped read-only; fields are zero-copy views into the file"""
+
+    def __init__(self, path):
+        self.path = path
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            magic, version, itemsize, landmarks, record_size, self.started_at, self.clock_offset = HEADER.unpack(
+                f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION or landmarks != NUM_LANDMARKS:
+                raise ValueError(f"Not a landmark recording: {path}")
+            self.dtype = record_dtype(itemsize)
+            if record_size != self.dtype.itemsize:
+                raise ValueError(f"Unexpected record size {record_size} in {path}")
+            footer = None
+            if size >= HEADER_SIZE + TRAILER.size:
+                f.seek(size - TRAILER.size)
+                length, end = TRAILER.unpack(f.read(TRAILER.size))
+                if end == END_MAGIC:
+                    f.seek(size - TRAILER.size - length)
+                    footer = json.loads(f.read(length))
+        if footer is None:
+            # Never closed: keep every whole record
+            footer = {"kind": None, "activity": None, "stages": [None],
+                      "count": (size - HEADER_SIZE) // self.dtype.itemsize, "index": []}
+        self.kind = footer["kind"]
+        self.activity = footer["activity"]
+        self.stage_names = footer["stages"]
+        self.index = np.array(footer["index"], dtype=np.float64).reshape(-1, 2)
+        count = footer["count"]
+        self.records = (np.memmap(path, dtype=self.dtype, mode="r", offset=HEADER_SIZE, shape=(count,))
+                        if count else np.zeros(0, dtype=self.dtype))
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def timestamps(self):
+        return self.records["timestamp"]
+
+    @property
+    def landmarks(self):
+        return self.records["landmarks"]
+
+    @property
+    def stages(self):
+        return self.records["stage"]
+
+    @property
+    def flags(self):
+        return self.records["flags"]
+
+    @property
+    def wall_times(self):
+        """Record timestamps as wall-clock times"""
+        return self.records["timestamp"] + self.clock_offset
+
+    def stage_name(self, code):
+        return self.stage_names[code] if code < len(self.stage_names) else None
+
+    def between(self, start, end, wall=True):
+        """Records from start up to end, found from the footer index without a full scan
+
+        start and end are wall-clock times like started_at. With wall=False
+        they are compared with the stored monotonic timestamps instead.
+        """
+        if wall:
+            start, end = start - self.clock_offset, end - self.clock_offset
+        lo, hi = 0, len(self.records)
+        if len(self.index):
+            # Narrow to the index strides around the range, then search only those timestamps
+            first = np.searchsorted(self.index[:, 1], start, side="right") - 1
+            last = np.searchsorted(self.index[:, 1], end, side="right")
+            lo = int(self.index[first, 0]) if first >= 0 else 0
+            hi = int(self.index[last, 0]) if last < len(self.index) else hi
+        window = self.records["timestamp"][lo:hi]
+        return self.records[lo + np.searchsorted(window, start):lo + np.searchsorted(window, end)]
+
+    def close(self):
+        # The mapping is released once no view of it is left
+        self.records = None
+
+
+def open_recording(path):
+    return LandmarkRecording(path)
+
+
+def recording_path(kind, activity, username=None, directory=None):
+    """Pick a new file name for a session recording, or None if recording is off"""
+    directory = RECORDINGS_DIR if directory is None else directory
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", f"{username or 'guest'}-{kind}-{activity}").strip("-").lower()
+    return os.path.join(directory, f"{slug}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}{FILE_SUFFIX}")
+
+
+def start_recording(kind, activity):
+    """Open a recording for the logged-in session's feed, or return None if recording is off"""
+    import streamlit as st
+
+    path = recording_path(kind, activity, st.session_state.get("username"))
+    if path is None:
+        return None
+    try:
+        return LandmarkWriter(path, kind, activity)
+    except OSError:
+        # The feed runs without a recording
+        return None
@@ -0,0 +1,85 @@
+"""Landmark-only streaming: the browser draws the skeleton and HUD itself.
+
+With STREAM_MODE=landmarks (which needs CAMERA_SOURCE=browser, so that the
+client has its own video), the feeds skip server-side drawing and
+encoding. Each frame they publish one compact JSON message to the
+session. The message holds the 33 landmarks, quantized to integers, plus
+the HUD text the rules would have drawn, the rep counter and stage, and
+any feedback string. The capture component draws it over the local
+video. A message is typically under 1 KB, where an annotated 640x480
+JPEG is around 20 KB.
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+from capture import open_camera
+from ingest import CAMERA_SOURCE, open_browser_camera
+from tracking import POSE_CONNECTIONS, VISIBILITY_THRESHOLD
+from utils import VISIBILITY, X, Y
+
+STREAM_MODE = "landmarks" if os.environ.get("STREAM_MODE", "frames").lower() == "landmarks" else "frames"
+STREAM_LANDMARKS = STREAM_MODE == "landmarks" and CAMERA_SOURCE == "browser"
+LANDMARK_SCALE = 10000
+
+
+def overlay_style(color=(224, 224, 224), joint_color=(255, 0, 0)):
+    """Client-side drawing settings matching draw_skeleton"""
+    return {
+        "connections": POSE_CONNECTIONS.tolist(),
+        "threshold": VISIBILITY_THRESHOLD * 100,
+        "scale": LANDMARK_SCALE,
+        "line": list(color),
+        "joint": list(joint_color),
+    }
+
+
+def encode_landmarks(landmarks):
+    """Flatten (33, 4) landmarks to integer x, y and visibility triples"""
+    quantized = np.empty((len(landmarks), 3), dtype=np.int32)
+    np.rint(landmarks[:, [X, Y]] * LANDMARK_SCALE, out=quantized[:, :2], casting="unsafe")
+    np.rint(landmarks[:, VISIBILITY] * 100, out=quantized[:, 2], casting="unsafe")
+    return quantized.ravel().tolist()
+
+
+def encode_message(landmarks, hud, **fields):
+    """Serialize one frame's results as compact JSON bytes"""
+    message = {
+        "t": round(time.time(), 3),
+        "landmarks": encode_landmarks(landmarks) if landmarks is not None else None,
+        "hud": hud.items,
+    }
+    message.update(fields)
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class LandmarkStream:
+    """Publishes per-frame result messages to a browser session"""
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.sent = 0
+        self.bytes = 0
+
+    def send(self, landmarks, hud, **fields):
+        message = encode_message(landmarks, hud, **fields)
+        self.queue.publish(message)
+        self.sent += 1
+        self.bytes += len(message)
+
+    def stats(self):
+        return {
+            "messages": self.sent,
+            "bytes": self.bytes,
+            "bytes_per_message": round(self.bytes / self.sent, 1) if self.sent else 0.0,
+        }
+
+
+def open_feed_camera():
+    """Open the configured camera; returns (capture, LandmarkStream or None)"""
+    if STREAM_LANDMARKS:
+        capture = open_browser_camera(overlay_style())
+        return capture, LandmarkStream(capture.queue)
+    return (open_browser_camera() if CAMERA_SOURCE == "browser" else open_camera()), None
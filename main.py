@@ -1,7 +1,10 @@
 import streamlit as st
 from auth import login_page, register_page
 from database import initialize_database, users_exist
+from session_runtime import finish_script_run
+from session_store import restore_session, sync_session_cookie
 from utils import set_page_config
+from workout_history import finish_unclaimed_workout
 
 def pose_estimation_page():
     """Main pose estimation interface"""
@@ -40,6 +43,9 @@ def main():
         st.session_state.register_mode = False
     if 'username' not in st.session_state:
         st.session_state.username = None
+    # The session cookie logs a refreshed or reconnected browser back in
+    restore_session()
+    sync_session_cookie()
     
     # Check if any users exist (first run)
     if not users_exist() and not st.session_state.register_mode:
@@ -54,5 +60,10 @@ def main():
     else:
         pose_estimation_page()
 
+    # A background feed this run did not show (Stop, another page, logout) is stopped here
+    finish_script_run()
+    # Likewise a workout set no feed continued this run
+    finish_unclaimed_workout()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,124 @@
+"""Cached text sprites for the on-frame HUD.
+
+The rules and yoga checks draw the same handful of strings every frame.
+`put_text` is a drop-in for `cv2.putText` that rasterizes each distinct
+(text, font, scale, color, thickness, line type) once into a sprite, keeps
+it in a shared LRU cache and then only blits it onto the frame. Sprites
+drawn with the default LINE_8 are binary masks copied with `cv2.copyTo` and
+match `cv2.putText` pixel for pixel, except that OpenCV may clip a stroke
+crossing the frame edge one pixel differently. LINE_AA sprites keep an
+alpha channel and are blended.
+
+Passing a `TextLayer` instead of a frame records the text rather than
+drawing it, for clients that render the HUD themselves.
+"""
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+SPRITE_CACHE_SIZE = 512
+
+
+class Sprite:
+    """A rasterized text element positioned relative to its putText origin"""
+
+    __slots__ = ("dx", "dy", "mask", "fill", "alpha")
+
+    def __init__(self, dx, dy, mask, fill, alpha=None):
+        self.dx = dx
+        self.dy = dy
+        self.mask = mask
+        self.fill = fill
+        self.alpha = alpha
+
+
+def render_sprite(text, font, scale, color, thickness=1, line_type=cv2.LINE_8):
+    """Rasterize text once into a tightly cropped sprite"""
+    (width, height), baseline = cv2.getTextSize(text, font, scale, thickness)
+    pad = thickness + 2
+    canvas = np.zeros((height + baseline + 2 * pad, width + 2 * pad), dtype=np.uint8)
+    origin = (pad, pad + height)
+    cv2.putText(canvas, text, origin, font, scale, 255, thickness, line_type)
+
+    rows = np.flatnonzero(canvas.any(axis=1))
+    cols = np.flatnonzero(canvas.any(axis=0))
+    if not len(rows):
+        return Sprite(0, 0, canvas[:0, :0], np.zeros((0, 0, 3), dtype=np.uint8))
+    mask = np.ascontiguousarray(canvas[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1])
+    # A solid tile of the text color; the mask selects which of its pixels land on the frame
+    fill = np.empty(mask.shape + (3,), dtype=np.uint8)
+    fill[:] = color
+    alpha = mask.astype(np.float32)[..., None] / 255 if line_type == cv2.LINE_AA else None
+    return Sprite(int(cols[0] - origin[0]), int(rows[0] - origin[1]), mask, fill, alpha)
+
+
+class SpriteCache:
+    """Thread-safe LRU cache of text sprites shared by every session"""
+
+    def __init__(self, capacity=SPRITE_CACHE_SIZE):
+        self.capacity = capacity
+        self._sprites = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text, font, scale, color, thickness=1, line_type=cv2.LINE_8):
+        key = (text, font, scale, tuple(color), thickness, line_type)
+        with self._lock:
+            sprite = self._sprites.get(key)
+            if sprite is not None:
+                self._sprites.move_to_end(key)
+                self.hits += 1
+                return sprite
+        sprite = render_sprite(text, font, scale, color, thickness, line_type)
+        with self._lock:
+            self.misses += 1
+            self._sprites[key] = sprite
+            if len(self._sprites) > self.capacity:
+                self._sprites.popitem(last=False)
+        return sprite
+
+    def stats(self):
+        with self._lock:
+            return {"sprites": len(self._sprites), "hits": self.hits, "misses": self.misses}
+
+
+sprite_cache = SpriteCache()
+
+
+def blit(image, sprite, org):
+    """Draw a sprite with its putText origin at org, clipped to the image"""
+    height, width = sprite.mask.shape
+    x0, y0 = org[0] + sprite.dx, org[1] + sprite.dy
+    left, top = max(x0, 0), max(y0, 0)
+    right, bottom = min(x0 + width, image.shape[1]), min(y0 + height, image.shape[0])
+    if left >= right or top >= bottom:
+        return
+    region = image[top:bottom, left:right]
+    crop = (slice(top - y0, bottom - y0), slice(left - x0, right - x0))
+    if sprite.alpha is None:
+        cv2.copyTo(sprite.fill[crop], sprite.mask[crop], region)
+    else:
+        alpha = sprite.alpha[crop]
+        region[:] = region * (1 - alpha) + sprite.fill[crop] * alpha
+
+
+class TextLayer:
+    """Frame stand-in that collects HUD text instead of drawing it"""
+
+    def __init__(self, shape):
+        self.shape = shape
+        self.items = []
+
+    def add(self, text, org, font, scale, color, thickness):
+        self.items.append((text, int(org[0]), int(org[1]), font, scale, tuple(int(c) for c in color), thickness))
+
+
+def put_text(image, text, org, font, scale, color, thickness=1, line_type=cv2.LINE_8):
+    """Drop-in for cv2.putText that blits a cached sprite"""
+    if isinstance(image, TextLayer):
+        image.add(text, org, font, scale, color, thickness)
+        return
+    blit(image, sprite_cache.get(text, font, scale, color, thickness, line_type), org)
@@ -0,0 +1,320 @@
+import os
+import statistics
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+import streamlit as st
+import mediapipe as mp
+
+mp_pose = mp.solutions.pose
+
+# Pool limits, overridable per host through the environment
+POOL_SIZE = int(os.environ.get("POSE_POOL_SIZE", max(1, (os.cpu_count() or 2) // 2)))
+IDLE_TIMEOUT = float(os.environ.get("POSE_POOL_IDLE_SECONDS", 300))
+# A queued session that has not polled for this long is considered gone
+WAITER_TIMEOUT = 5.0
+
+# Per-frame inference budget; the most accurate model that fits it is chosen at startup
+LATENCY_BUDGET_MS = float(os.environ.get("POSE_LATENCY_BUDGET_MS", 50))
+# Set to 0, 1 or 2 to skip calibration and pin the model
+MODEL_COMPLEXITY = os.environ.get("POSE_MODEL_COMPLEXITY")
+MODEL_COMPLEXITIES = (0, 1, 2)
+# host:port or socket path of inference_service.py; when set, sessions use it instead of the pool
+POSE_SERVICE_ADDRESS = os.environ.get("POSE_SERVICE_ADDRESS", "")
+CALIBRATION_IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "yoga poses", "mountain.jpeg")
+
+
+def create_pose(model_complexity=1):
+    """Create a video-mode Pose graph with the settings used by the live feeds"""
+    return mp_pose.Pose(static_image_mode=False, model_complexity=model_complexity,
+                        min_detection_confidence=0.5, min_tracking_confidence=0.5)
+
+
+def _calibration_frame():
+    image = cv2.imread(CALIBRATION_IMAGE)
+    if image is None:
+        return np.zeros((480, 640, 3), dtype=np.uint8)
+    return cv2.cvtColor(cv2.resize(image, (640, 480)), cv2.COLOR_BGR2RGB)
+
+
+def time_model(model_complexity, image, frames=20):
+    """Return the 90th percentile per-frame latency in milliseconds for one model"""
+    pose = create_pose(model_complexity)
+    try:
+        # The first frames run person detection and warm up the interpreter
+        for _ in range(3):
+            pose.process(image)
+        samples = []
+        for _ in range(frames):
+            started = time.perf_counter()
+            pose.process(image)
+            samples.append((time.perf_counter() - started) * 1000)
+    finally:
+        pose.close()
+    return statistics.quantiles(samples, n=10)[-1]
+
+
+def calibrate_model_complexity(budget_ms=LATENCY_BUDGET_MS, frames=20):
+    """Return (complexity, {complexity: latency_ms}) for the best model within budget"""
+    image = _calibration_frame()
+    timings = {}
+    chosen = None
+    for complexity in MODEL_COMPLEXITIES:
+        try:
+            timings[complexity] = time_model(complexity, image, frames)
+        except Exception:
+            # Lite and heavy models are downloaded on first use and may be unavailable offline
+            continue
+        if timings[complexity] > budget_ms and chosen is not None:
+            break
+        chosen = complexity
+        if timings[complexity] > budget_ms:
+            break
+    return (1 if chosen is None else chosen), timings
+
+
+class PoolSaturated(Exception):
+    """Raised when no Pose graph became free before the checkout timeout"""
+
+    def __init__(self, position, capacity):
+        super().__init__(f"All {capacity} pose trackers are busy (queue position {position})")
+        self.position = position
+        self.capacity = capacity
+
+
+# Lease held by a session whose graph lives in another process; it counts against the pool size
+RESERVED = object()
+
+
+class PosePool:
+    """Bounded pool of Pose graphs leased to one live session at a time"""
+
+    def __init__(self, max_size=POOL_SIZE, idle_timeout=IDLE_TIMEOUT, factory=create_pose, model_complexity=1):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.model_complexity = model_complexity
+        self._factory = factory
+        self._graph_complexity = {}
+        self._cond = threading.Condition()
+        self._idle = []
+        self._leases = {}
+        self._waiting = OrderedDict()
+        self._created = 0
+
+    def checkout(self, session_id, timeout=None):
+        """Lease a Pose graph to a session, queueing FIFO behind earlier sessions"""
+        return self._acquire(session_id, timeout, self._take_graph)
+
+    def reserve(self, session_id, timeout=None):
+        """Hold one graph's worth of capacity for a session that runs its own graph, e.g. in a child process
+
+        Queues exactly like checkout() and returns RESERVED; release the slot with checkin().
+        """
+        return self._acquire(session_id, timeout, self._take_slot)
+
+    def _acquire(self, session_id, timeout, take):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if session_id in self._leases:
+                return self._leases[session_id]
+            self._waiting.setdefault(session_id, time.monotonic())
+            while True:
+                self._waiting[session_id] = time.monotonic()
+                self._drop_stale_waiters()
+                self._evict_idle()
+                if next(iter(self._waiting)) == session_id:
+                    pose = take()
+                    if pose is not None:
+                        del self._waiting[session_id]
+                        self._leases[session_id] = pose
+                        self._cond.notify_all()
+                        return pose
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    position = list(self._waiting).index(session_id) + 1
+                    raise PoolSaturated(position, self.max_size)
+                self._cond.wait(1.0 if remaining is None else min(remaining, 1.0))
+
+    def checkin(self, session_id):
+        """Return a session's graph to the pool"""
+        with self._cond:
+            pose = self._leases.pop(session_id, None)
+            if pose is RESERVED:
+                self._created -= 1
+            elif pose is not None:
+                self._idle.append((pose, time.monotonic()))
+            self._cond.notify_all()
+
+    def cancel(self, session_id):
+        """Remove a session from the wait queue without leasing a graph"""
+        with self._cond:
+            if self._waiting.pop(session_id, None) is not None:
+                self._cond.notify_all()
+
+    def downgrade(self, session_id):
+        """Swap a session's graph for a cheaper model and return the new graph
+
+        Sustained over-budget latency means the host is overloaded, so graphs
+        created afterwards use the cheaper model too. Returns None when the
+        session already runs the lightest model.
+        """
+        with self._cond:
+            pose = self._leases.get(session_id)
+            if pose is None or pose is RESERVED or self._graph_complexity[id(pose)] <= MODEL_COMPLEXITIES[0]:
+                return None
+            complexity = self._graph_complexity[id(pose)] - 1
+            try:
+                replacement = self._factory(complexity)
+            except Exception:
+                return None
+            self._close(pose)
+            self._created += 1
+            self._graph_complexity[id(replacement)] = complexity
+            self._leases[session_id] = replacement
+            self.model_complexity = min(self.model_complexity, complexity)
+            return replacement
+
+    def evict_idle(self):
+        """Close graphs that have sat idle longer than the idle timeout"""
+        with self._cond:
+            self._evict_idle()
+
+    def stats(self):
+        """Return the current pool occupancy"""
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "in_use": len(self._leases),
+                "reserved": sum(1 for pose in self._leases.values() if pose is RESERVED),
+                "idle": len(self._idle),
+                "waiting": len(self._waiting),
+                "model_complexity": self.model_complexity,
+            }
+
+    def _take_graph(self):
+        while self._idle:
+            pose, _ = self._idle.pop()
+            if self._graph_complexity[id(pose)] > self.model_complexity:
+                # Created before a downgrade; replace rather than reuse
+                self._close(pose)
+                continue
+            # Drop tracking state left over from the previous session
+            pose.reset()
+            return pose
+        if self._created < self.max_size:
+            pose = self._factory(self.model_complexity)
+            self._created += 1
+            self._graph_complexity[id(pose)] = self.model_complexity
+            return pose
+        return None
+
+    def _take_slot(self):
+        if self._created >= self.max_size and self._idle:
+            # An idle graph gives up its capacity to the reservation
+            pose, _ = self._idle.pop(0)
+            self._close(pose)
+        if self._created < self.max_size:
+            self._created += 1
+            return RESERVED
+        return None
+
+    def _close(self, pose):
+        pose.close()
+        self._created -= 1
+        del self._graph_complexity[id(pose)]
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        keep = []
+        for pose, returned_at in self._idle:
+            if now - returned_at > self.idle_timeout:
+                self._close(pose)
+            else:
+                keep.append((pose, returned_at))
+        self._idle = keep
+
+    def _drop_stale_waiters(self):
+        now = time.monotonic()
+        for session_id, seen in list(self._waiting.items()):
+            if now - seen > WAITER_TIMEOUT:
+                del self._waiting[session_id]
+
+
+@st.cache_resource
+def get_pose_pool():
+    """Return the Pose graph pool shared by every session on this server"""
+    if MODEL_COMPLEXITY is not None:
+        return PosePool(model_complexity=int(MODEL_COMPLEXITY))
+    complexity, _ = calibrate_model_complexity()
+    return PosePool(model_complexity=complexity)
+
+
+def current_session_id():
+    """Return a stable identifier for the current Streamlit session"""
+    if 'pose_session_id' not in st.session_state:
+        st.session_state.pose_session_id = uuid.uuid4().hex
+    return st.session_state.pose_session_id
+
+
+def acquire_session_pose(status_placeholder):
+    """Lease a Pose graph for this session, reporting queue position while waiting"""
+    if POSE_SERVICE_ADDRESS:
+        return connect_session_pose(status_placeholder)
+    pool = get_pose_pool()
+    return _wait_for_pool(status_placeholder, pool, pool.checkout)
+
+
+def reserve_session_slot(status_placeholder):
+    """Hold a pool slot for a feed whose graph runs in a child process; True once held"""
+    pool = get_pose_pool()
+    return _wait_for_pool(status_placeholder, pool, pool.reserve) is not None
+
+
+def _wait_for_pool(status_placeholder, pool, acquire):
+    session_id = current_session_id()
+    while st.session_state.webcam_active:
+        try:
+            lease = acquire(session_id, timeout=1.0)
+            status_placeholder.empty()
+            return lease
+        except PoolSaturated as e:
+            status_placeholder.warning(f"⏳ All {e.capacity} pose trackers are in use. "
+                                       f"You are number {e.position} in the queue…")
+    pool.cancel(session_id)
+    return None
+
+
+def connect_session_pose(status_placeholder):
+    """Connect this session to the inference service"""
+    from multiprocessing import AuthenticationError
+
+    from inference_service import RemotePose
+
+    try:
+        st.session_state.remote_pose = RemotePose(POSE_SERVICE_ADDRESS)
+    except (OSError, AuthenticationError) as e:
+        status_placeholder.error(f"Pose inference service unavailable: {e}")
+        return None
+    return st.session_state.remote_pose
+
+
+def downgrade_session_pose():
+    """Move this session to a cheaper model; returns the new graph or None"""
+    if POSE_SERVICE_ADDRESS:
+        # The service picks its model for all sessions
+        return None
+    return get_pose_pool().downgrade(current_session_id())
+
+
+def release_session_pose():
+    """Return this session's Pose graph to the shared pool"""
+    if POSE_SERVICE_ADDRESS:
+        remote = st.session_state.pop('remote_pose', None)
+        if remote is not None:
+            remote.close()
+        return
+    get_pose_pool().checkin(current_session_id())
@@ -0,0 +1,296 @@
+"""Live feed pipeline split across capture, inference and render processes.
+
+With FEED_PROCESSES=1 (and the server camera), a feed runs three child
+processes and only publishes results from the Streamlit thread. Each
+stage has its own interpreter, so none of them competes for the
+session's GIL:
+
+    capture   -> reads the camera straight into a SharedFrameRing slot (BGR)
+    inference -> converts into an output slot as RGB, tracks landmarks,
+                 runs the exercise rule or yoga check and draws the overlay
+    render    -> JPEG-encodes at the display rate cap and sends the bytes
+                 back with the rule's counter, stage and feedback
+
+Frames move between stages through shared memory. Backpressure runs
+upstream: render waits on a bounded result queue, inference waits for a
+free output slot, and a live camera drops frames while inference is
+behind. A video file source waits instead, so nothing is skipped.
+
+The inference process builds its own Pose graph with the pool's
+calibrated model complexity. Before the processes start, the feed reserves
+a slot in the session pool, so process feeds queue behind the same
+POSE_POOL_SIZE cap as threaded ones.
+"""
+import multiprocessing
+import os
+import queue
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from frame_transport import SharedFrameRing
+
+# Browser camera frames arrive in the Streamlit process, so only the server camera can be split off
+FEED_PROCESSES = (os.environ.get("FEED_PROCESSES", "0") == "1"
+                  and os.environ.get("CAMERA_SOURCE", "server").lower() != "browser")
+FRAME_SIZE = (640, 480)
+RING_SLOTS = 4
+
+# An encoded frame returned to the feed. `data` is None for frames skipped by
+# the display rate cap; `meta` is always set.
+RenderedFrame = namedtuple("RenderedFrame", ["data", "seq", "timestamp", "meta"])
+
+
+def capture_worker(source, ring, stop, drop_when_full):
+    """Read frames into free ring slots until the source ends or `stop` is set"""
+    from capture import open_camera
+
+    cap = open_camera(source) if isinstance(source, int) else cv2.VideoCapture(source)
+    width, height = ring.shape[1], ring.shape[0]
+    seq = 0
+    try:
+        while not stop.is_set():
+            slot = ring.acquire(timeout=0 if drop_when_full else 0.5)
+            if slot is None:
+                if drop_when_full:
+                    # Inference is behind: take the frame off the camera and discard it
+                    if not cap.grab():
+                        break
+                    ring.drop()
+                continue
+            dst = ring.slot(slot)
+            ok, frame = cap.read(dst)
+            if not ok:
+                ring.release(slot)
+                break
+            if frame is not dst:
+                if frame.shape != dst.shape:
+                    cv2.resize(frame, (width, height), dst=dst)
+                else:
+                    dst[...] = frame
+            seq += 1
+            ring.publish(slot, seq, time.monotonic())
+    finally:
+        cap.release()
+        ring.end()
+        ring.close()
+
+
+def inference_worker(frames, annotated, stop, kind, name, model_complexity, roi_size, initial_state,
+                     record_path=None):
+    """Run tracking, rules and drawing on each frame, writing the result into `annotated`"""
+    from batch import resolve_activity
+    from landmark_store import LandmarkWriter
+    from overlay import put_text
+    from pose_pool import create_pose
+    from tracking import SMOOTHING, InferenceScheduler, LandmarkFilter, LandmarkTracker, draw_skeleton
+    from utils import SessionState
+
+    kind, name, rule = resolve_activity(name if kind == "exercise" else None, name if kind == "yoga" else None)
+    pose = create_pose(model_complexity)
+    tracker = LandmarkTracker(pose, InferenceScheduler(max_interval=3 if kind == "exercise" else 6),
+                              crop_size=roi_size, smoother=LandmarkFilter() if SMOOTHING else None)
+    state = SessionState(initial_state)
+    recording = LandmarkWriter(record_path, kind, name) if record_path else None
+    try:
+        while not stop.is_set():
+            try:
+                frame = frames.receive(timeout=0.5)
+            except EOFError:
+                break
+            if frame is None:
+                continue
+            slot = None
+            while slot is None and not stop.is_set():
+                slot = annotated.acquire(timeout=0.5)
+            if slot is None:
+                frames.release(frame.slot)
+                break
+            # Converting into the output slot is the only copy between capture and render
+            image = cv2.cvtColor(frame.image, cv2.COLOR_BGR2RGB, dst=annotated.slot(slot))
+            seq, timestamp = frame.seq, frame.timestamp
+            frames.release(frame.slot)
+            del frame
+
+            landmarks = tracker.process(image, timestamp)
+            feedback = ""
+            if landmarks is not None:
+                if kind == "exercise":
+                    rule(landmarks, image, state, timestamp)
+                else:
+                    feedback = rule(landmarks, image)
+                draw_skeleton(image, landmarks)
+            if kind == "exercise":
+                put_text(image, f"Reps: {state.counter}", (10, 30), cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 0, 255), 2)
+            if recording is not None:
+                recording.append(landmarks, timestamp, state.get("exercise_stage"), good="GOOD" in feedback)
+            annotated.publish(slot, seq, timestamp, {
+                "detected": landmarks is not None,
+                "counter": state.get("counter", 0),
+                "stage": state.get("exercise_stage"),
+                "hold": state.get("total_plank_time", 0),
+                "feedback": feedback,
+            })
+            del image
+    finally:
+        if recording is not None:
+            recording.close()
+        pose.close()
+        annotated.end()
+        frames.close()
+        annotated.close()
+
+
+def render_worker(annotated, results, stop, fps, quality, max_width, fmt):
+    """Encode annotated frames at the display rate cap and return them to the feed"""
+    from buffers import BufferPool
+    from display import encode_frame
+
+    buffers = BufferPool()
+    min_interval = 1.0 / fps if fps > 0 else 0.0
+    next_due = 0.0
+    try:
+        while not stop.is_set():
+            try:
+                frame = annotated.receive(timeout=0.5)
+            except EOFError:
+                break
+            if frame is None:
+                continue
+            data = None
+            now = time.monotonic()
+            if now >= next_due:
+                data = encode_frame(frame.image, quality, max_width, fmt, buffers)
+                next_due = now + min_interval
+            rendered = RenderedFrame(data, frame.seq, frame.timestamp, frame.meta)
+            annotated.release(frame.slot)
+            del frame
+            while not stop.is_set():
+                try:
+                    results.put(rendered, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+    finally:
+        annotated.close()
+        results.put(None)
+
+
+class ProcessPipeline:
+    """Capture, inference and render stages in child processes joined by shared memory"""
+
+    def __init__(self, kind, name, source=0, initial_state=None, model_complexity=1, roi_size=0,
+                 frame_size=FRAME_SIZE, slots=RING_SLOTS, drop_when_full=None,
+                 fps=None, quality=None, max_width=None, fmt=None, record_path=None):
+        from display import DISPLAY_FORMAT, DISPLAY_FPS, DISPLAY_MAX_WIDTH, DISPLAY_QUALITY
+
+        # Spawn rather than fork: the parent may already hold running MediaPipe threads
+        context = multiprocessing.get_context("spawn")
+        shape = (frame_size[1], frame_size[0], 3)
+        self.frames = SharedFrameRing(shape, np.uint8, slots, context)
+        self.annotated = SharedFrameRing(shape, np.uint8, slots, context)
+        # Two encoded frames in hand is enough to keep the feed busy
+        self.results = context.Queue(maxsize=2)
+        self.stop_event = context.Event()
+        if drop_when_full is None:
+            # A live camera cannot wait; a file can
+            drop_when_full = isinstance(source, int)
+        self.processes = [
+            context.Process(target=capture_worker, name="pipeline-capture", daemon=True,
+                            args=(source, self.frames, self.stop_event, drop_when_full)),
+            context.Process(target=inference_worker, name="pipeline-inference", daemon=True,
+                            args=(self.frames, self.annotated, self.stop_event, kind, name,
+                                  model_complexity, roi_size, dict(initial_state or {}), record_path)),
+            context.Process(target=render_worker, name="pipeline-render", daemon=True,
+                            args=(self.annotated, self.results, self.stop_event,
+                                  DISPLAY_FPS if fps is None else fps,
+                                  DISPLAY_QUALITY if quality is None else quality,
+                                  DISPLAY_MAX_WIDTH if max_width is None else max_width,
+                                  DISPLAY_FORMAT if fmt is None else fmt)),
+        ]
+        self.received = 0
+
+    def start(self):
+        for process in self.processes:
+            process.start()
+        return self
+
+    def read(self, timeout=None):
+        """Return the next RenderedFrame, or None on timeout; raises EOFError once the source has ended"""
+        try:
+            rendered = self.results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if rendered is None:
+            raise EOFError("Frame source ended")
+        self.received += 1
+        return rendered
+
+    def stats(self):
+        """Frames published and dropped at each stage boundary"""
+        return {
+            "captured": self.frames.stats(),
+            "annotated": self.annotated.stats(),
+            "received": self.received,
+        }
+
+    def stop(self, timeout=2.0):
+        """Stop every stage and free the shared memory"""
+        self.stop_event.set()
+        deadline = time.monotonic() + timeout
+        for process in self.processes:
+            # Drain results so the render stage is never stuck on a full queue
+            while process.is_alive() and time.monotonic() < deadline:
+                try:
+                    self.results.get(timeout=0.05)
+                except queue.Empty:
+                    pass
+                process.join(0)
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        self.frames.close()
+        self.annotated.close()
+
+
+def run_process_feed(kind, name, video_placeholder, on_result, initial_state=None):
+    """Drive a feed from a ProcessPipeline until the webcam is stopped; on_result gets each frame's meta"""
+    import streamlit as st
+
+    from landmark_store import recording_path
+    from pose_pool import MODEL_COMPLEXITY, current_session_id, get_pose_pool, reserve_session_slot
+    from tracking import ROI_SIZE
+
+    # The child's graph counts against the pool like a leased one
+    if not reserve_session_slot(st.empty()):
+        return
+    try:
+        complexity = int(MODEL_COMPLEXITY) if MODEL_COMPLEXITY is not None else get_pose_pool().model_complexity
+        # The inference process owns the recording; it is named here, where the session's user is known
+        pipeline = ProcessPipeline(kind, name, initial_state=initial_state, model_complexity=complexity,
+                                   roi_size=ROI_SIZE,
+                                   record_path=recording_path(kind, name, st.session_state.get("username"))).start()
+        try:
+            while st.session_state.webcam_active:
+                # The first frame waits for the child processes to import MediaPipe
+                timeout = 30.0 if not pipeline.received else 1.0
+                try:
+                    rendered = pipeline.read(timeout=timeout)
+                except EOFError:
+                    if pipeline.received:
+                        st.warning("Camera feed ended")
+                    else:
+                        st.error("Camera error: no frames from the camera")
+                    break
+                if rendered is None:
+                    st.error(f"Camera error: no frame within {timeout:.0f}s")
+                    break
+                if rendered.data is not None:
+                    video_placeholder.image(rendered.data)
+                on_result(rendered.meta)
+        finally:
+            pipeline.stop()
+    finally:
+        get_pose_pool().checkin(current_session_id())
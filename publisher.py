@@ -0,0 +1,94 @@
+"""Change-detecting, debounced updates for live UI elements.
+
+Every placeholder write is a websocket message to the browser. The feeds
+compute feedback and counters every frame, but these values change a few
+times a minute. `UiPublisher` remembers the last value sent to each
+element and only writes when it changes. A value that changes again
+within `min_interval` of the last write is held back, and the newest one
+is sent once the interval has passed. Flapping feedback therefore costs
+at most one message per interval. Suppressed writes are counted, and the
+counts are added to the session's totals when the feed stops.
+"""
+import os
+import time
+
+import streamlit as st
+
+UI_MIN_INTERVAL = float(os.environ.get("UI_MIN_INTERVAL", 0.5))
+
+_UNSET = object()
+
+
+class _Element:
+    __slots__ = ("placeholder", "render", "sent", "sent_at", "pending")
+
+    def __init__(self, placeholder, render):
+        self.placeholder = placeholder
+        self.render = render
+        self.sent = _UNSET
+        self.sent_at = float("-inf")
+        self.pending = _UNSET
+
+
+class UiPublisher:
+    """Pushes placeholder updates only on change, at most once per min_interval"""
+
+    def __init__(self, min_interval=UI_MIN_INTERVAL, clock=time.monotonic):
+        self.min_interval = min_interval
+        self.clock = clock
+        self._elements = {}
+        self.published = 0
+        self.unchanged = 0
+        self.debounced = 0
+
+    def register(self, key, placeholder, render, shown=_UNSET):
+        """Add an element; render(placeholder, value) writes a value, `shown` is already on screen"""
+        element = self._elements[key] = _Element(placeholder, render)
+        element.sent = shown
+        return self
+
+    def update(self, key, value):
+        """Offer the current value; returns True if it was written"""
+        element = self._elements[key]
+        if value == element.sent:
+            # Flapped back to what the browser already shows
+            element.pending = _UNSET
+            self.unchanged += 1
+            return False
+        now = self.clock()
+        if now - element.sent_at < self.min_interval:
+            element.pending = value
+            self.debounced += 1
+            return False
+        self._write(element, value, now)
+        return True
+
+    def flush(self):
+        """Write every held-back value regardless of the interval"""
+        now = self.clock()
+        for element in self._elements.values():
+            if element.pending is not _UNSET:
+                self._write(element, element.pending, now)
+
+    def _write(self, element, value, now):
+        element.render(element.placeholder, value)
+        element.sent = value
+        element.sent_at = now
+        element.pending = _UNSET
+        self.published += 1
+
+    def stats(self):
+        return {
+            "published": self.published,
+            "suppressed": self.unchanged + self.debounced,
+            "unchanged": self.unchanged,
+            "debounced": self.debounced,
+        }
+
+    def close(self):
+        """Flush and add this publisher's counts to the session totals"""
+        self.flush()
+        totals = st.session_state.setdefault("ui_publisher_stats", {})
+        for name, count in self.stats().items():
+            totals[name] = totals.get(name, 0) + count
+        return totals
@@ -0,0 +1,209 @@
+"""Table-driven exercise rule engine.
+
+Each exercise is described as data: named features built from joint angles,
+distances and heights, threshold conditions on those features, and stage
+transitions. `compile_rule` turns a definition into a `CompiledRule` whose
+per-frame evaluation is a fixed sequence of array operations, whatever the
+exercise.
+
+Overlays are drawn on the RGB display frame, so colors are (R, G, B).
+"""
+import time
+
+import cv2
+import numpy as np
+import streamlit as st
+
+from overlay import put_text
+from utils import calculate_angles, calculate_distances, joint_indices, X, Y
+
+REP_TEXT = "REP COUNTED!"
+
+
+# ----- Feature helpers used by rule definitions -----
+
+def angle(a, b, c):
+    """Angle at joint b"""
+    return [("angle", (a, b, c), 1.0)]
+
+def mean_angle(*triplets):
+    """Average angle over several (a, b, c) triplets"""
+    return [("angle", t, 1.0 / len(triplets)) for t in triplets]
+
+def distance(a, b):
+    """Screen distance between two joints"""
+    return [("distance", (a, b), 1.0)]
+
+def height_above(upper, lower):
+    """How far the mean of `upper` joints sits above the mean of `lower` joints
+
+    Image y grows downwards, so this is mean(lower.y) - mean(upper.y).
+    """
+    return ([("y", j, -1.0 / len(upper)) for j in upper] +
+            [("y", j, 1.0 / len(lower)) for j in lower])
+
+
+def above(value):
+    return (value, np.inf)
+
+def below(value):
+    return (-np.inf, value)
+
+def between(low, high):
+    return (low, high)
+
+
+class CompiledRule:
+    """Vectorized evaluator for one exercise definition"""
+
+    def __init__(self, name, definition):
+        self.name = name
+        self.kind = definition.get("kind", "reps")
+        self.feature_names = list(definition["features"])
+
+        # Collect every primitive once, in a fixed order: angles, distances, coordinates
+        primitives = {"angle": [], "distance": [], "y": [], "x": []}
+        terms = []
+        for feature, feature_terms in enumerate(definition["features"].values()):
+            for kind, joints, weight in feature_terms:
+                bucket = primitives[kind]
+                if joints not in bucket:
+                    bucket.append(joints)
+                terms.append((feature, kind, bucket.index(joints), weight))
+
+        self._angles = joint_indices(*primitives["angle"]) if primitives["angle"] else None
+        self._distances = joint_indices(*primitives["distance"]) if primitives["distance"] else None
+        coords = [j * 4 + Y for j in primitives["y"]] + [j * 4 + X for j in primitives["x"]]
+        self._coords = np.array(coords, dtype=np.intp)
+
+        offsets = {
+            "angle": 0,
+            "distance": len(primitives["angle"]),
+            "y": len(primitives["angle"]) + len(primitives["distance"]),
+            "x": len(primitives["angle"]) + len(primitives["distance"]) + len(primitives["y"]),
+        }
+        n_primitives = offsets["x"] + len(primitives["x"])
+        self._weights = np.zeros((len(self.feature_names), n_primitives), dtype=np.float32)
+        for feature, kind, index, weight in terms:
+            self._weights[feature, offsets[kind] + index] += weight
+
+        # Flatten transition conditions into parallel arrays
+        self.transitions = definition.get("transitions", [])
+        if self.kind == "hold":
+            self.transitions = [{"to": "hold", "when": "all", "if": definition["hold_when"]}]
+        conditions = [(t, c) for t, transition in enumerate(self.transitions)
+                      for c in transition["if"].items()]
+        self._cond_feature = np.array([self.feature_names.index(f) for _, (f, _) in conditions], dtype=np.intp)
+        self._cond_low = np.array([bounds[0] for _, (_, bounds) in conditions], dtype=np.float32)
+        self._cond_high = np.array([bounds[1] for _, (_, bounds) in conditions], dtype=np.float32)
+        self._membership = np.zeros((len(self.transitions), len(conditions)), dtype=bool)
+        for c, (t, _) in enumerate(conditions):
+            self._membership[t, c] = True
+        self._require_all = np.array([t.get("when", "all") == "all" for t in self.transitions], dtype=bool)
+
+        self.prompts = definition.get("prompts", {})
+        self.readouts = [(label, self.feature_names.index(feature), origin, scale, color)
+                         for label, feature, origin, scale, color in definition.get("readouts", [])]
+
+    def features(self, landmarks):
+        """Evaluate every feature of this exercise for one (33, 4) landmark array"""
+        parts = []
+        if self._angles is not None:
+            parts.append(calculate_angles(landmarks, self._angles))
+        if self._distances is not None:
+            parts.append(calculate_distances(landmarks, self._distances))
+        parts.append(landmarks.reshape(-1)[self._coords])
+        return self._weights @ np.concatenate(parts)
+
+    def fired(self, features):
+        """Return which transitions have their conditions met"""
+        values = features[self._cond_feature]
+        met = (values > self._cond_low) & (values < self._cond_high)
+        all_met = ~(self._membership & ~met).any(axis=1)
+        any_met = (self._membership & met).any(axis=1)
+        return np.where(self._require_all, all_met, any_met)
+
+    def __call__(self, landmarks, image, state=None, now=None):
+        """Apply the rule to one frame, updating state and drawing overlays"""
+        state = st.session_state if state is None else state
+        now = time.time() if now is None else now
+        try:
+            features = self.features(landmarks)
+            fired = self.fired(features)
+            if self.kind == "hold":
+                self._update_hold(bool(fired[0]), image, state, now)
+            else:
+                self._update_reps(fired, image, state)
+            self._draw_readouts(features, image)
+        except Exception as e:
+            st.error(f"{self.name} processing error: {e}")
+
+    def _update_reps(self, fired, image, state):
+        for transition, hit in zip(self.transitions, fired):
+            if not hit or transition.get("from", state.exercise_stage) != state.exercise_stage:
+                continue
+            state.exercise_stage = transition["to"]
+            if transition.get("count"):
+                state.counter += 1
+                put_text(image, REP_TEXT, (image.shape[1]//2 - 100, 50),
+                         cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 255, 0), 2)
+
+        prompt = self.prompts.get(state.exercise_stage, self.prompts.get("default"))
+        if prompt:
+            text, dx, scale, color = prompt
+            put_text(image, text, (image.shape[1]//2 - dx, image.shape[0] - 50),
+                     cv2.FONT_HERSHEY_SIMPLEX, scale, color, 2)
+
+    def _update_hold(self, holding, image, state, now):
+        # Session keys predate the engine and are shared with the UI and batch scoring
+        if 'total_plank_time' not in state:
+            state.total_plank_time = 0
+        if 'last_plank_end' not in state:
+            state.last_plank_end = 0
+        if 'show_total_time' not in state:
+            state.show_total_time = False
+
+        if holding:
+            if 'plank_start_time' not in state:
+                state.plank_start_time = now
+                state.show_total_time = False
+
+            hold_time = now - state.plank_start_time
+            put_text(image, f"CURRENT: {int(hold_time)}s", (image.shape[1]//2 - 100, 50),
+                     cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+            put_text(image, f"TOTAL: {int(state.total_plank_time)}s",
+                     (image.shape[1]//2 - 80, 90),
+                     cv2.FONT_HERSHEY_SIMPLEX, 0.7, (200, 200, 200), 2)
+        else:
+            if 'plank_start_time' in state:
+                state.total_plank_time += now - state.plank_start_time
+                state.last_plank_end = now
+                state.show_total_time = True
+                del state.plank_start_time
+
+            if state.show_total_time and (now - state.last_plank_end < 3):
+                put_text(image, f"TOTAL TIME: {int(state.total_plank_time)}s",
+                         (image.shape[1]//2 - 120, 100),
+                         cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 3)
+                put_text(image, "Great effort!", (image.shape[1]//2 - 100, 150),
+                         cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 200, 0), 2)
+            else:
+                state.show_total_time = False
+
+            put_text(image, "Get ready for next plank!", (image.shape[1]//2 - 150, 50),
+                     cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 0, 0), 2)
+
+    def _draw_readouts(self, features, image):
+        for label, feature, origin, scale, color in self.readouts:
+            put_text(image, f"{label}: {int(features[feature])}°", origin,
+                     cv2.FONT_HERSHEY_SIMPLEX, scale, color, 2)
+
+
+def compile_rule(name, definition):
+    """Compile an exercise definition into a vectorized evaluator"""
+    return CompiledRule(name, definition)
+
+
+def compile_rules(definitions):
+    """Compile a {name: definition} table into a {name: CompiledRule} dispatch table"""
+    return {name: compile_rule(name, definition) for name, definition in definitions.items()}
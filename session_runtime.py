@@ -0,0 +1,464 @@
+"""Asyncio session runtime for the live feeds.
+
+With FEED_RUNTIME=asyncio a feed no longer loops in the script thread. The
+feed function starts a `LiveFeed` on the server's one `SessionRuntime`
+event loop, or re-attaches to the session's running one, and returns. The
+script run then finishes, so the Stop button takes effect on the next
+rerun instead of waiting for the loop to notice. A rerun that does not
+show the feed (another page, logout) stops it through
+`finish_script_run()`.
+
+A feed is four cooperating tasks joined by bounded queues:
+
+    capture   -> camera reads, latest-only queue (older frames are dropped)
+    inference -> BGR->RGB and LandmarkTracker.process
+    rules     -> exercise rule or yoga check, overlay, counter/feedback publishing
+    display   -> JPEG encoding and placeholder writes at the display rate cap
+
+CPU work (inference, encoding, JPEG decoding) runs in one executor shared
+by every session, so the number of threads for it stays fixed however
+many sessions are live. Browser cameras, the many-session case, take no
+thread while waiting: the capture task awaits the session's ingest queue
+on the loop and is woken when a frame arrives. A server camera read
+blocks on the device instead. Those reads run in a separate capture
+executor of FEED_CAPTURE_WORKERS threads shared by all feeds, so a slow
+camera never holds the inference workers. Rules and UI writes run on the
+loop thread, under the session's script context.
+When a feed ends for any reason (cancelled, camera lost, session closed),
+it waits for its executor calls to return. It then releases the camera
+and the Pose graph. A rerun that finds its feed ended starts a new one.
+"""
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from multiprocessing import AuthenticationError
+
+import cv2
+import numpy as np
+import streamlit as st
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from streamlit.runtime.scriptrunner.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+
+from buffers import BufferPool
+from display import DISPLAY_FPS, encode_frame
+from landmark_store import start_recording
+from overlay import TextLayer, put_text
+from pose_pool import (LATENCY_BUDGET_MS, POSE_SERVICE_ADDRESS, PoolSaturated, current_session_id,
+                       get_pose_pool)
+from publisher import UiPublisher
+from tracking import (ROI_SIZE, SMOOTHING, InferenceScheduler, LandmarkFilter, LandmarkTracker, LatencyMonitor,
+                      draw_skeleton)
+from workout_history import start_workout
+
+FEED_RUNTIME = os.environ.get("FEED_RUNTIME", "threads").lower()
+# Threads shared by all sessions for inference and encoding
+RUNTIME_WORKERS = int(os.environ.get("FEED_RUNTIME_WORKERS", os.cpu_count() or 2))
+# Threads shared by all sessions for blocking server camera reads; browser cameras need none
+CAPTURE_WORKERS = int(os.environ.get("FEED_CAPTURE_WORKERS", 2))
+# How often a feed checks that its browser session still exists
+SESSION_CHECK_INTERVAL = 2.0
+
+
+class FrameSlots:
+    """Free list of frame arrays handed between a feed's tasks"""
+
+    def __init__(self):
+        self._free = []
+
+    def take(self, shape):
+        while self._free:
+            image = self._free.pop()
+            if image.shape == shape:
+                return image
+        return np.empty(shape, dtype=np.uint8)
+
+    def give(self, image):
+        self._free.append(image)
+
+
+def put_latest(queue, item, slots):
+    """Queue an item, replacing (and recycling) an unconsumed one; returns True if one was dropped"""
+    dropped = False
+    if queue.full():
+        stale = queue.get_nowait()
+        slots.give(stale[0])
+        dropped = True
+    queue.put_nowait(item)
+    return dropped
+
+
+class LiveFeed:
+    """One session's capture, inference, rules and display tasks"""
+
+    def __init__(self, runtime, session_id, kind, name, rule, camera, stream, recorder=None, recording=None):
+        self.runtime = runtime
+        self.session_id = session_id
+        self.kind = kind
+        self.name = name
+        self.rule = rule
+        self.camera = camera
+        self.stream = stream
+        self.recorder = recorder
+        self.recording = recording
+        self.task = None
+        self._ctx = None
+        self._status = None
+        self._video = None
+        self._publisher = UiPublisher()
+        self._elements = set()
+        self._slots = FrameSlots()
+        self._encode_buffers = BufferPool()
+        self._inflight = set()
+        self._pose = None
+        self._remote = None
+        self.captured = 0
+        self.dropped = 0
+        self.processed = 0
+        self.published = 0
+
+    # ----- called on the loop thread -----
+
+    def attach(self, ctx, status, video, elements):
+        """Bind this script run's placeholders; elements maps key -> (placeholder, render, shown)"""
+        self._ctx = ctx
+        self._status = status
+        self._video = video
+        for key, (placeholder, render, shown) in elements.items():
+            self._publisher.register(key, placeholder, render, shown)
+            self._elements.add(key)
+
+    def _enter(self):
+        # Streamlit resolves the session from the thread; the loop thread serves every session
+        add_script_run_ctx(None, self._ctx)
+
+    def _leave(self):
+        setattr(threading.current_thread(), SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+
+    async def _call(self, fn, *args, executor=None):
+        """Run a blocking call in the shared executor (or `executor`); cleanup waits for it even if cancelled"""
+        future = (executor or self.runtime.executor).submit(fn, *args)
+        self._inflight.add(future)
+        future.add_done_callback(self._inflight.discard)
+        return await asyncio.wrap_future(future)
+
+    async def run(self):
+        try:
+            pose = await self._lease()
+            if pose is None:
+                return
+            tracker = LandmarkTracker(pose, InferenceScheduler(max_interval=3 if self.kind == "exercise" else 6),
+                                      crop_size=ROI_SIZE, monitor=LatencyMonitor(LATENCY_BUDGET_MS),
+                                      downgrade=self._downgrade, smoother=LandmarkFilter() if SMOOTHING else None)
+            frames = asyncio.Queue(maxsize=1)
+            results = asyncio.Queue(maxsize=1)
+            display = asyncio.Queue(maxsize=1)
+            tasks = [
+                asyncio.create_task(self._capture(frames)),
+                asyncio.create_task(self._infer(tracker, frames, results)),
+                asyncio.create_task(self._rules(results, display)),
+                asyncio.create_task(self._display(display)),
+                asyncio.create_task(self._watch_session()),
+            ]
+            try:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    self._show_status("error", f"Live feed stopped: {task.exception()}")
+        finally:
+            await self._cleanup()
+
+    async def _lease(self):
+        if POSE_SERVICE_ADDRESS:
+            from inference_service import RemotePose
+            try:
+                self._remote = await self._call(RemotePose, POSE_SERVICE_ADDRESS)
+            except (OSError, AuthenticationError) as e:
+                self._show_status("error", f"Pose inference service unavailable: {e}")
+                return None
+            return self._remote
+        # The first call calibrates the model, which takes seconds
+        pool = await self._call(get_pose_pool)
+        while True:
+            try:
+                # Creating a graph can take a while, so even a free slot is checked out off the loop
+                self._pose = await self._call(pool.checkout, self.session_id, 0)
+                self._show_status(None)
+                return self._pose
+            except PoolSaturated as e:
+                self._show_status("warning", f"⏳ All {e.capacity} pose trackers are in use. "
+                                             f"You are number {e.position} in the queue…")
+            await asyncio.sleep(1.0)
+
+    def _downgrade(self):
+        # Called from the inference thread; the pool is thread-safe
+        return None if self._remote else get_pose_pool().downgrade(self.session_id)
+
+    def _show_status(self, level, message=None):
+        if self._status is None:
+            return
+        self._enter()
+        try:
+            if level is None:
+                self._status.empty()
+            else:
+                getattr(self._status, level)(message)
+        finally:
+            self._leave()
+
+    async def _capture(self, frames):
+        shape = None
+        # Browser cameras wait on the loop; a server camera read blocks, so it runs on the capture executor
+        read_async = getattr(self.camera, "read_async", None)
+        while True:
+            image = self._slots.take(shape) if shape else None
+            if read_async is not None:
+                ok, frame = await read_async(image, self._call)
+            else:
+                ok, frame = await self._call(self.camera.read, image, executor=self.runtime.capture_executor)
+            if not ok:
+                self._show_status("error", "Camera error")
+                return
+            shape = frame.shape
+            self.captured += 1
+            if put_latest(frames, (frame, time.monotonic()), self._slots):
+                self.dropped += 1
+
+    async def _infer(self, tracker, frames, results):
+        while True:
+            frame, timestamp = await frames.get()
+            rgb = self._slots.take(frame.shape)
+            landmarks = await self._call(self._track, tracker, frame, rgb, timestamp)
+            self._slots.give(frame)
+            # Waiting here holds inference back while the rules task is busy
+            await results.put((rgb, landmarks, timestamp))
+
+    @staticmethod
+    def _track(tracker, frame, rgb, timestamp):
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb)
+        landmarks = tracker.process(rgb, timestamp)
+        # The tracker reuses its output array on the next frame
+        return None if landmarks is None else landmarks.copy()
+
+    async def _rules(self, results, display):
+        while True:
+            image, landmarks, timestamp = await results.get()
+            # When streaming landmarks the browser draws the skeleton and HUD itself
+            hud = TextLayer(image.shape) if self.stream else image
+            self._enter()
+            try:
+                feedback = ""
+                if landmarks is not None:
+                    if self.kind == "exercise":
+                        self.rule(landmarks, hud, st.session_state, timestamp)
+                    else:
+                        feedback = self.rule(landmarks, hud)
+                    if not self.stream:
+                        draw_skeleton(image, landmarks)
+                if self.kind == "exercise":
+                    put_text(hud, f"Reps: {st.session_state.counter}", (10, 30),
+                             cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 0, 255), 2)
+                    if "counter" in self._elements:
+                        self._publisher.update("counter", st.session_state.counter)
+                    fields = {"counter": st.session_state.counter, "stage": st.session_state.exercise_stage}
+                    if self.recorder is not None:
+                        self.recorder.observe_exercise(st.session_state)
+                else:
+                    if feedback and "feedback" in self._elements:
+                        self._publisher.update("feedback", feedback)
+                    fields = {"feedback": feedback}
+                    if self.recorder is not None:
+                        self.recorder.observe_pose("GOOD" in feedback)
+                if self.recording is not None:
+                    stage = st.session_state.exercise_stage if self.kind == "exercise" else None
+                    self.recording.append(landmarks, timestamp, stage, good="GOOD" in feedback)
+            finally:
+                self._leave()
+            self.processed += 1
+            if self.stream:
+                self.stream.send(landmarks, hud, **fields)
+                self._slots.give(image)
+            else:
+                put_latest(display, (image,), self._slots)
+
+    async def _display(self, display):
+        interval = 1.0 / DISPLAY_FPS if DISPLAY_FPS > 0 else 0.0
+        due = 0.0
+        while True:
+            # Sleep first: frames that arrive meanwhile replace each other in the queue
+            await asyncio.sleep(max(0.0, due - time.monotonic()))
+            (image,) = await display.get()
+            started = time.monotonic()
+            data = await self._call(encode_frame, image, buffers=self._encode_buffers)
+            self._slots.give(image)
+            self._enter()
+            try:
+                self._video.image(data)
+            finally:
+                self._leave()
+            self.published += 1
+            # Publishing slower than the cap stretches the interval instead of building a backlog
+            due = started + max(interval, time.monotonic() - started)
+
+    async def _watch_session(self):
+        while True:
+            await asyncio.sleep(SESSION_CHECK_INTERVAL)
+            if Runtime.exists() and not Runtime.instance().is_active_session(self._ctx.session_id):
+                return
+
+    async def _cleanup(self):
+        # A camera or graph must not be released while an executor thread is still using it
+        if self._inflight:
+            await asyncio.wait([asyncio.wrap_future(future) for future in list(self._inflight)])
+        self.camera.release()
+        if self.recorder is not None:
+            self.recorder.finish()
+        if self.recording is not None:
+            self.recording.close()
+        if self._remote is not None:
+            self._remote.close()
+        elif self._pose is not None:
+            get_pose_pool().checkin(self.session_id)
+        elif not POSE_SERVICE_ADDRESS:
+            # Still queued for a graph
+            get_pose_pool().cancel(self.session_id)
+        self._enter()
+        try:
+            self._publisher.close()
+        except Exception:
+            # The session is gone; its totals go with it
+            pass
+        finally:
+            self._leave()
+
+    def stats(self):
+        return {
+            "captured": self.captured,
+            "dropped": self.dropped,
+            "processed": self.processed,
+            "published": self.published,
+        }
+
+
+class SessionRuntime:
+    """One event loop thread and fixed-size executors shared by every live feed on this server"""
+
+    def __init__(self, workers=RUNTIME_WORKERS, capture_workers=CAPTURE_WORKERS):
+        self.workers = workers
+        self.capture_workers = capture_workers
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="feed-runtime")
+        self.capture_executor = concurrent.futures.ThreadPoolExecutor(max_workers=capture_workers,
+                                                                      thread_name_prefix="feed-capture")
+        self.loop = asyncio.new_event_loop()
+        self._feeds = {}
+        self._thread = threading.Thread(target=self.loop.run_forever, name="session-runtime", daemon=True)
+        self._thread.start()
+
+    def _submit(self, coro, timeout=None):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def get(self, session_id):
+        return self._feeds.get(session_id)
+
+    def start(self, feed, ctx, status, video, elements):
+        """Attach a new feed's placeholders and start its tasks"""
+        async def start():
+            feed.attach(ctx, status, video, elements)
+            feed.task = asyncio.create_task(feed.run())
+            feed.task.add_done_callback(lambda _: self._forget(feed))
+        self._feeds[feed.session_id] = feed
+        self._submit(start())
+
+    def _forget(self, feed):
+        if self._feeds.get(feed.session_id) is feed:
+            del self._feeds[feed.session_id]
+
+    def attach(self, session_id, ctx, status, video, elements):
+        """Point a running feed at the placeholders of the current script run; False if it has ended"""
+        async def attach():
+            # Looked up on the loop, where a finished feed is forgotten
+            feed = self._feeds.get(session_id)
+            if feed is None or feed.task is None or feed.task.done():
+                return False
+            feed.attach(ctx, status, video, elements)
+            return True
+        return self._submit(attach())
+
+    def stop(self, session_id, timeout=5.0):
+        """Cancel a session's feed and wait for its camera and graph to be released"""
+        feed = self._feeds.get(session_id)
+        if feed is None or feed.task is None:
+            return
+
+        async def stop():
+            feed.task.cancel()
+            await asyncio.gather(feed.task, return_exceptions=True)
+        try:
+            self._submit(stop(), timeout)
+        except concurrent.futures.TimeoutError:
+            # Still waiting on a blocked camera read; cleanup finishes on the loop once it returns
+            pass
+
+    def stats(self):
+        return {"feeds": len(self._feeds), "workers": self.workers,
+                "capture_workers": self.capture_workers}
+
+
+@st.cache_resource
+def get_session_runtime():
+    """Return the session runtime shared by every session on this server"""
+    return SessionRuntime()
+
+
+def run_feed(kind, name, rule, elements):
+    """Start or re-attach this session's feed and return without blocking
+
+    elements maps a UI key ("counter" or "feedback") to (placeholder, render, shown).
+    """
+    from ingest import CAMERA_SOURCE, ingest_token, render_camera_component
+    from landmark_stream import STREAM_LANDMARKS, open_feed_camera, overlay_style
+
+    runtime = get_session_runtime()
+    session_id = current_session_id()
+    st.session_state.feed_claimed = True
+    feed = runtime.get(session_id)
+    if feed is not None and (feed.kind, feed.name) != (kind, name):
+        runtime.stop(session_id)
+        feed = None
+    status = st.empty()
+    camera_area = st.container()
+    video = st.empty()
+    if feed is not None and runtime.attach(session_id, get_script_run_ctx(), status, video, elements):
+        # Claims the feed's open set for this run so it is not finished under it
+        start_workout(kind, name)
+        if CAMERA_SOURCE == "browser":
+            # The capture component has to be part of every run, or the browser drops it
+            with camera_area:
+                render_camera_component(ingest_token(), overlay=overlay_style() if STREAM_LANDMARKS else None)
+        return
+    # No feed, or it ended (camera lost, session check) since it was looked up: start a new one
+    with camera_area:
+        camera, stream = open_feed_camera()
+    feed = LiveFeed(runtime, session_id, kind, name, rule, camera, stream, start_workout(kind, name),
+                    start_recording(kind, name))
+    runtime.start(feed, get_script_run_ctx(), status, video, elements)
+
+
+def stop_feed():
+    """Stop this session's feed, if one is running"""
+    if FEED_RUNTIME == "asyncio":
+        get_session_runtime().stop(current_session_id())
+
+
+def finish_script_run():
+    """Stop this session's feed if the script run that just finished did not show it"""
+    if FEED_RUNTIME != "asyncio":
+        return
+    if not st.session_state.pop('feed_claimed', False):
+        stop_feed()
@@ -0,0 +1,262 @@
+"""Server-side login sessions persisted to the `sessions` table.
+
+On login a random token is issued, and its SHA-256 digest is stored with
+the user id and an expiry. The token itself is never stored. The browser
+keeps the token in a first-party cookie (SameSite=Strict, Secure over
+HTTPS), never in the URL, so it stays out of history, bookmarks, shared
+links and proxy logs. Streamlit cannot set cookies from the server, so a
+zero-height component writes them. They are read back from the headers
+of the session's websocket. A refresh or reconnect therefore restores the
+login without a password check. Each restore rotates the token, so a
+copied cookie stops working once its owner comes back.
+
+Validated tokens are held in an in-process LRU cache for at most
+SESSION_CACHE_TTL seconds, and never past their expiry. Logging out
+revokes the row and the cache entry. Expired rows are removed by a
+background sweep with one DELETE per interval, not checked row by row.
+"""
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+from http.cookies import SimpleCookie
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+from database import get_connection_pool
+from db_pool import PoolExhausted
+
+# Lifetime of an issued session token; every restore issues a fresh one
+SESSION_TTL = float(os.environ.get("SESSION_TTL_SECONDS", 24 * 3600))
+# How long a validated token is trusted without re-reading its row
+SESSION_CACHE_TTL = float(os.environ.get("SESSION_CACHE_TTL_SECONDS", 300))
+SESSION_CACHE_SIZE = int(os.environ.get("SESSION_CACHE_SIZE", 10000))
+SWEEP_INTERVAL = float(os.environ.get("SESSION_SWEEP_SECONDS", 600))
+COOKIE_NAME = "pose_session"
+# Earlier versions kept the token in the URL; such links are stripped, never honored
+TOKEN_PARAM = "session"
+
+COOKIE_SCRIPT = """<script>
+document.cookie = %(cookie)s + (location.protocol === "https:" ? "; Secure" : "");
+</script>"""
+
+# expires_at holds Unix seconds so the sweep is a single range comparison
+INSERT_SESSION = "INSERT INTO sessions (session_id, user_id, expires_at) SELECT ?, id, ? FROM users WHERE username = ?"
+SELECT_SESSION = ("SELECT users.username, sessions.expires_at FROM sessions "
+                  "JOIN users ON users.id = sessions.user_id WHERE sessions.session_id = ?")
+DELETE_SESSION = "DELETE FROM sessions WHERE session_id = ?"
+DELETE_EXPIRED = "DELETE FROM sessions WHERE expires_at <= ?"
+CREATE_EXPIRY_INDEX = "CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)"
+
+
+def token_digest(token):
+    return sha256(token.encode()).hexdigest()
+
+
+class SessionCache:
+    """LRU cache of validated token digests, each trusted until its own deadline"""
+
+    def __init__(self, max_size=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL, clock=time.time):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest):
+        """Return the cached username, or None if absent or past its deadline"""
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[digest]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, digest, username, expires_at):
+        deadline = min(expires_at, self.clock() + self.ttl)
+        with self._lock:
+            self._entries[digest] = (username, deadline)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, digest):
+        with self._lock:
+            self._entries.pop(digest, None)
+
+    def purge(self):
+        """Drop every entry past its deadline"""
+        now = self.clock()
+        with self._lock:
+            for digest in [d for d, (_, deadline) in self._entries.items() if deadline <= now]:
+                del self._entries[digest]
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class SessionStore:
+    """Issues, resolves and revokes login tokens, sweeping expired ones in the background"""
+
+    def __init__(self, pool=None, ttl=SESSION_TTL, cache=None, sweep_interval=SWEEP_INTERVAL):
+        self.pool = pool or get_connection_pool()
+        self.ttl = ttl
+        self.cache = cache or SessionCache()
+        self.sweep_interval = sweep_interval
+        self.swept = 0
+        self.pool.transaction(lambda conn: conn.execute(CREATE_EXPIRY_INDEX))
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sweep_loop, name="session-sweeper", daemon=True)
+        self._thread.start()
+
+    def create(self, username):
+        """Issue a token for a user; returns None if the user does not exist"""
+        token = secrets.token_urlsafe(32)
+        digest = token_digest(token)
+        expires_at = time.time() + self.ttl
+        inserted = self.pool.transaction(
+            lambda conn: conn.execute(INSERT_SESSION, (digest, expires_at, username)).rowcount)
+        if not inserted:
+            return None
+        self.cache.put(digest, username, expires_at)
+        return token
+
+    def resolve(self, token):
+        """Return the username for a live token, or None"""
+        digest = token_digest(token)
+        username = self.cache.get(digest)
+        if username is not None:
+            return username
+        with self.pool.connection() as conn:
+            row = conn.execute(SELECT_SESSION, (digest,)).fetchone()
+        if row is None or row['expires_at'] <= time.time():
+            return None
+        self.cache.put(digest, row['username'], row['expires_at'])
+        return row['username']
+
+    def revoke(self, token):
+        digest = token_digest(token)
+        self.cache.discard(digest)
+        self.pool.transaction(lambda conn: conn.execute(DELETE_SESSION, (digest,)))
+
+    def sweep(self):
+        """Delete every expired session in one statement; returns the number removed"""
+        removed = self.pool.transaction(lambda conn: conn.execute(DELETE_EXPIRED, (time.time(),)).rowcount)
+        self.cache.purge()
+        self.swept += removed
+        return removed
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception:
+                # A busy or briefly unavailable database is retried at the next interval
+                pass
+
+    def stats(self):
+        return dict(self.cache.stats(), swept=self.swept)
+
+    def close(self):
+        self._stop.set()
+
+
+@st.cache_resource
+def get_session_store():
+    """Return the session store shared by every session on this server"""
+    return SessionStore()
+
+
+def _request_cookie():
+    """The session cookie the browser sent when this session's websocket opened"""
+    context = getattr(st, "context", None)
+    if context is not None:
+        return context.cookies.get(COOKIE_NAME)
+    from streamlit.web.server.websocket_headers import _get_websocket_headers
+
+    morsel = SimpleCookie((_get_websocket_headers() or {}).get("Cookie", "")).get(COOKIE_NAME)
+    return morsel.value if morsel is not None else None
+
+
+def _queue_cookie(token):
+    """Have the next rendered run set the cookie to token, or clear it for None"""
+    st.session_state.session_token = token
+    st.session_state.pending_cookie = (
+        f"{COOKIE_NAME}={token}; Path=/; Max-Age={int(SESSION_TTL)}; SameSite=Strict" if token
+        else f"{COOKIE_NAME}=; Path=/; Max-Age=0; SameSite=Strict")
+
+
+def sync_session_cookie():
+    """Write a pending cookie change; called on every run, since login and logout rerun right away"""
+    cookie = st.session_state.pop('pending_cookie', None)
+    if cookie is not None:
+        components.html(COOKIE_SCRIPT % {"cookie": json.dumps(cookie)}, height=0)
+
+
+def start_session(username):
+    """Issue a token for a fresh login and hand it to the browser as a cookie"""
+    try:
+        token = get_session_store().create(username)
+    except (sqlite3.Error, PoolExhausted):
+        # The login still stands; it just will not survive a refresh
+        return None
+    if token is not None:
+        _queue_cookie(token)
+    return token
+
+
+def restore_session():
+    """Log a new browser session in from its cookie, rotating the token"""
+    if TOKEN_PARAM in st.query_params:
+        del st.query_params[TOKEN_PARAM]
+    if st.session_state.logged_in:
+        return
+    token = _request_cookie()
+    # The websocket's headers never change, so each cookie is tried once per browser session
+    if not token or token == st.session_state.get('cookie_tried'):
+        return
+    st.session_state.cookie_tried = token
+    store = get_session_store()
+    try:
+        username = store.resolve(token)
+        if username is None:
+            _queue_cookie(None)
+            return
+        fresh = store.create(username)
+        store.revoke(token)
+    except (sqlite3.Error, PoolExhausted):
+        # Stay logged out this run; the cookie is tried again on the next one
+        del st.session_state.cookie_tried
+        return
+    if fresh is None:
+        return
+    _queue_cookie(fresh)
+    st.session_state.logged_in = True
+    st.session_state.username = username
+
+
+def end_session():
+    """Revoke the session's token, clear its cookie and log it out"""
+    token = st.session_state.get('session_token')
+    if token:
+        try:
+            get_session_store().revoke(token)
+        except (sqlite3.Error, PoolExhausted):
+            # The row expires on its own and is swept later
+            pass
+    _queue_cookie(None)
+    st.session_state.logged_in = False
+    st.session_state.username = None
@@ -0,0 +1,318 @@
+"""Per-session landmark tracking on top of a MediaPipe Pose graph.
+
+`LandmarkTracker` turns RGB frames into (33, 4) landmark arrays. An
+`InferenceScheduler` lowers the inference rate while the body is still and
+the skipped frames are filled by extrapolating from the last two inferred
+poses, so holds like Plank or Mountain Pose cost a fraction of the CPU.
+
+With `crop_size` set, inference runs on a padded crop around the previous
+landmarks, downscaled so its long side is at most `crop_size` pixels, and the
+landmarks are mapped back to full-frame coordinates. A miss in the crop falls
+back to a full-frame search on the same frame.
+
+A `LandmarkFilter` smooths the tracker's output before the rules see it.
+It is a One-Euro filter over the whole (33, 4) array, with one adaptive
+cutoff per joint: still joints are smoothed hard, which stops threshold
+checks from flickering, and fast joints are followed with little lag. This
+lets the lite model (POSE_MODEL_COMPLEXITY=0) count as steadily as the full
+one; benchmarks/bench_smoothing.py compares them.
+
+A `LatencyMonitor` watches inference time against the per-frame budget and,
+when it is exceeded persistently, the tracker asks for a cheaper graph.
+"""
+import os
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+import mediapipe as mp
+
+from utils import NUM_LANDMARKS, VISIBILITY, X, Y, Z, landmarks_to_array
+
+mp_pose = mp.solutions.pose
+
+POSE_CONNECTIONS = np.array(sorted(mp_pose.POSE_CONNECTIONS), dtype=np.intp)
+VISIBILITY_THRESHOLD = 0.5
+
+# Region-of-interest crop size for the live feeds; 0 runs inference on the full frame
+ROI_SIZE = int(os.environ.get("POSE_ROI_SIZE", 0))
+ROI_PADDING = 0.25
+MIN_ROI_JOINTS = 8
+
+# Landmark smoothing; POSE_SMOOTHING=0 hands raw landmarks to the rules
+SMOOTHING = os.environ.get("POSE_SMOOTHING", "1") != "0"
+# Cutoff in Hz for a still joint, and how fast it rises with joint speed (normalized frame units per second)
+SMOOTHING_MIN_CUTOFF = float(os.environ.get("POSE_SMOOTHING_MIN_CUTOFF", 1.0))
+SMOOTHING_BETA = float(os.environ.get("POSE_SMOOTHING_BETA", 20.0))
+
+
+class InferenceScheduler:
+    """Chooses which frames need pose inference based on recent landmark motion"""
+
+    def __init__(self, max_interval=4, still_speed=0.25, moving_speed=0.5, settle_frames=5):
+        # Speeds are the 90th percentile of visible joint displacement, in normalized frame units per second
+        self.max_interval = max_interval
+        self.still_speed = still_speed
+        self.moving_speed = moving_speed
+        self.settle_frames = settle_frames
+        self.interval = 1
+        self.speed = 0.0
+        self._since_inference = 0
+        self._still_count = 0
+
+    def should_infer(self):
+        """Return True if the current frame should go through the Pose graph"""
+        return self._since_inference + 1 >= self.interval
+
+    def skipped(self):
+        """Record that a frame was served without inference"""
+        self._since_inference += 1
+
+    def observe(self, speed):
+        """Adapt the interval to the motion measured at the latest inference"""
+        self._since_inference = 0
+        self.speed = speed
+        if speed > self.moving_speed:
+            # Motion resumed: go straight back to full rate
+            self.interval = 1
+            self._still_count = 0
+        elif speed < self.still_speed:
+            self._still_count += 1
+            if self._still_count >= self.settle_frames and self.interval < self.max_interval:
+                self.interval = min(self.interval * 2, self.max_interval)
+                self._still_count = 0
+        else:
+            self._still_count = 0
+
+    def reset(self):
+        """Return to full rate, e.g. after tracking is lost"""
+        self.interval = 1
+        self._since_inference = 0
+        self._still_count = 0
+
+
+def _smoothing_factor(cutoff, dt):
+    # Exponential smoothing weight of a first-order low-pass at `cutoff` Hz
+    return 1.0 / (1.0 + 1.0 / (2 * np.pi * cutoff * dt))
+
+
+class LandmarkFilter:
+    """One-Euro filter over a landmark array, with a per-joint adaptive cutoff"""
+
+    def __init__(self, min_cutoff=SMOOTHING_MIN_CUTOFF, beta=SMOOTHING_BETA, d_cutoff=1.0):
+        # min_cutoff may be a scalar or one value per joint, e.g. lower for the torso than the wrists
+        self.min_cutoff = np.broadcast_to(np.asarray(min_cutoff, dtype=np.float32), (NUM_LANDMARKS,)).copy()
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self._value = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+        self._delta = np.empty((NUM_LANDMARKS, 3), dtype=np.float32)
+        self._speed = np.zeros(NUM_LANDMARKS, dtype=np.float32)
+        self._time = None
+
+    def __call__(self, landmarks, timestamp):
+        """Return the smoothed landmarks; the array is reused on the next call"""
+        if self._time is None or timestamp <= self._time:
+            self._value[:] = landmarks
+            self._speed[:] = 0
+            self._time = timestamp
+            return self._value
+        dt = timestamp - self._time
+        self._time = timestamp
+        delta = np.subtract(landmarks[:, :3], self._value[:, :3], out=self._delta)
+        speed = np.hypot(delta[:, X], delta[:, Y]) / dt
+        self._speed += _smoothing_factor(self.d_cutoff, dt) * (speed - self._speed)
+        alpha = _smoothing_factor(self.min_cutoff + self.beta * self._speed, dt)
+        delta *= alpha[:, None]
+        self._value[:, :3] += delta
+        # Visibility has no meaningful speed; a plain low-pass keeps it from flickering across the threshold
+        self._value[:, VISIBILITY] += (_smoothing_factor(self.min_cutoff, dt)
+                                       * (landmarks[:, VISIBILITY] - self._value[:, VISIBILITY]))
+        return self._value
+
+    def reset(self):
+        """Forget the previous pose, e.g. after tracking is lost"""
+        self._time = None
+
+
+class LatencyMonitor:
+    """Detects inference latency that stays over budget across a window of frames"""
+
+    def __init__(self, budget_ms, window=30, tolerance=0.8):
+        self.budget_ms = budget_ms
+        self.tolerance = tolerance
+        self._samples = deque(maxlen=window)
+
+    def record(self, latency_ms):
+        self._samples.append(latency_ms > self.budget_ms)
+
+    def over_budget(self):
+        """True once a full window has mostly exceeded the budget"""
+        samples = self._samples
+        return len(samples) == samples.maxlen and sum(samples) >= self.tolerance * len(samples)
+
+    def reset(self):
+        self._samples.clear()
+
+
+class LandmarkTracker:
+    """Runs a Pose graph through an inference scheduler and yields landmark arrays"""
+
+    def __init__(self, pose, scheduler=None, crop_size=None, padding=ROI_PADDING, monitor=None, downgrade=None,
+                 smoother=None):
+        self.pose = pose
+        self.scheduler = scheduler or InferenceScheduler()
+        self.crop_size = crop_size
+        self.padding = padding
+        # downgrade() returns a cheaper Pose graph, or None when there is none left
+        self.monitor = monitor
+        self.downgrade = downgrade
+        # Applied to the output only; scheduling, cropping and extrapolation use raw landmarks
+        self.smoother = smoother
+        self._buffers = np.zeros((3, NUM_LANDMARKS, 4), dtype=np.float32)
+        self._times = [0.0, 0.0]
+        self._history = 0
+        self._latest = 0
+        self.inferred = 0
+        self.interpolated = 0
+        self.cropped = 0
+        self.crop_misses = 0
+        self.downgrades = 0
+
+    def process(self, image, timestamp):
+        """Return landmarks for an RGB frame, or None when no person is tracked"""
+        if self._history == 0 or self.scheduler.should_infer():
+            landmarks = self._infer(image, timestamp)
+        else:
+            self.scheduler.skipped()
+            self.interpolated += 1
+            landmarks = self._extrapolate(timestamp)
+        if self.smoother is None:
+            return landmarks
+        if landmarks is None:
+            self.smoother.reset()
+            return None
+        return self.smoother(landmarks, timestamp)
+
+    def _infer(self, image, timestamp):
+        self.inferred += 1
+        started = time.perf_counter()
+        try:
+            return self._run_graph(image, timestamp)
+        finally:
+            if self.monitor is not None:
+                self.monitor.record((time.perf_counter() - started) * 1000)
+                if self.monitor.over_budget():
+                    self._downgrade()
+
+    def _downgrade(self):
+        self.monitor.reset()
+        pose = self.downgrade() if self.downgrade else None
+        if pose is not None:
+            # The new graph has no tracking state; start over from a full-frame search
+            self.pose = pose
+            self.downgrades += 1
+            self._history = 0
+            self.scheduler.reset()
+
+    def _run_graph(self, image, timestamp):
+        roi = self._roi(image.shape[1], image.shape[0]) if self.crop_size and self._history else None
+        if roi is not None:
+            results = self.pose.process(self._crop(image, roi))
+            if results.pose_landmarks is not None:
+                self.cropped += 1
+            else:
+                # Lost the person inside the crop: search the whole frame instead
+                self.crop_misses += 1
+                roi = None
+                results = self.pose.process(image)
+        else:
+            results = self.pose.process(image)
+        if results.pose_landmarks is None:
+            self._history = 0
+            self.scheduler.reset()
+            return None
+
+        previous = self._latest
+        self._latest = 1 - previous
+        landmarks = landmarks_to_array(results.pose_landmarks, self._buffers[self._latest])
+        if roi is not None:
+            self._to_full_frame(landmarks, roi, image.shape[1], image.shape[0])
+        self._times[self._latest] = timestamp
+        self._history = min(self._history + 1, 2)
+
+        if self._history == 2:
+            dt = timestamp - self._times[previous]
+            if dt > 0:
+                moved = np.hypot(*(landmarks[:, :2] - self._buffers[previous, :, :2]).T)
+                visible = landmarks[:, VISIBILITY] > VISIBILITY_THRESHOLD
+                self.scheduler.observe(float(np.percentile(moved[visible], 90)) / dt if visible.any() else 0.0)
+        return landmarks
+
+    def _roi(self, width, height):
+        """Padded box (x0, y0, x1, y1) around the last landmarks, or None for a full-frame search"""
+        landmarks = self._buffers[self._latest]
+        visible = landmarks[:, VISIBILITY] > VISIBILITY_THRESHOLD
+        if np.count_nonzero(visible) < MIN_ROI_JOINTS:
+            return None
+        xs = landmarks[visible, X] * width
+        ys = landmarks[visible, Y] * height
+        pad = self.padding * max(xs.max() - xs.min(), ys.max() - ys.min())
+        x0, x1 = max(0, int(xs.min() - pad)), min(width, int(xs.max() + pad) + 1)
+        y0, y1 = max(0, int(ys.min() - pad)), min(height, int(ys.max() + pad) + 1)
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return None
+        return x0, y0, x1, y1
+
+    def _crop(self, image, roi):
+        x0, y0, x1, y1 = roi
+        crop = image[y0:y1, x0:x1]
+        scale = self.crop_size / max(x1 - x0, y1 - y0)
+        if scale < 1:
+            return cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return np.ascontiguousarray(crop)
+
+    @staticmethod
+    def _to_full_frame(landmarks, roi, width, height):
+        # Crop-normalized to frame-normalized; MediaPipe scales z like x
+        x0, y0, x1, y1 = roi
+        landmarks[:, X] = (landmarks[:, X] * (x1 - x0) + x0) / width
+        landmarks[:, Y] = (landmarks[:, Y] * (y1 - y0) + y0) / height
+        landmarks[:, Z] *= (x1 - x0) / width
+
+    def _extrapolate(self, timestamp):
+        latest = self._buffers[self._latest]
+        out = self._buffers[2]
+        out[:] = latest
+        if self._history == 2:
+            previous = self._buffers[1 - self._latest]
+            span = self._times[self._latest] - self._times[1 - self._latest]
+            if span > 0:
+                step = (timestamp - self._times[self._latest]) / span
+                out[:, :3] += (latest[:, :3] - previous[:, :3]) * step
+        return out
+
+    def stats(self):
+        """Return how many frames were inferred, interpolated and cropped"""
+        total = self.inferred + self.interpolated
+        return {
+            "inferred": self.inferred,
+            "interpolated": self.interpolated,
+            "inference_ratio": self.inferred / total if total else 1.0,
+            "interval": self.scheduler.interval,
+            "cropped": self.cropped,
+            "crop_misses": self.crop_misses,
+            "downgrades": self.downgrades,
+        }
+
+
+def draw_skeleton(image, landmarks, color=(224, 224, 224), joint_color=(255, 0, 0)):
+    """Draw pose connections and joints from a landmark array"""
+    height, width = image.shape[:2]
+    points = np.rint(landmarks[:, [X, Y]] * (width, height)).astype(np.int32)
+    visible = landmarks[:, VISIBILITY] > VISIBILITY_THRESHOLD
+    segments = points[POSE_CONNECTIONS[visible[POSE_CONNECTIONS].all(axis=1)]]
+    if len(segments):
+        cv2.polylines(image, list(segments), False, color, 2)
+    for x, y in points[visible]:
+        cv2.circle(image, (int(x), int(y)), 2, joint_color, 2)
@@ -1,6 +1,26 @@
 import math
+import numpy as np
 import streamlit as st
 
+# MediaPipe Pose landmark indices, resolved once instead of per frame
+NUM_LANDMARKS = 33
+NOSE = 0
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_ELBOW, RIGHT_ELBOW = 13, 14
+LEFT_WRIST, RIGHT_WRIST = 15, 16
+LEFT_HIP, RIGHT_HIP = 23, 24
+LEFT_KNEE, RIGHT_KNEE = 25, 26
+LEFT_ANKLE, RIGHT_ANKLE = 27, 28
+
+# Column indices into a landmark array
+X, Y, Z, VISIBILITY = 0, 1, 2, 3
+
+# Serialized layout of one landmark with x, y, z, visibility and presence set:
+# a 2-byte submessage header followed by five tagged float32 fields
+_WIRE_RECORD_SIZE = 27
+_WIRE_TAGS = tuple((offset, bytes([tag]) * NUM_LANDMARKS)
+                   for offset, tag in ((0, 0x0a), (1, 25), (2, 0x0d), (7, 0x15), (12, 0x1d), (17, 0x25), (22, 0x2d)))
+
 def calculate_angle(a, b, c):
     """Calculate angle between three points"""
     ang = math.degrees(math.atan2(c.y - b.y, c.x - b.x) - math.atan2(a.y - b.y, a.x - b.x))
@@ -10,6 +30,68 @@ def calculate_distance(a, b):
     """Calculate Euclidean distance between two points"""
     return math.sqrt((a.x - b.x)**2 + (a.y - b.y)**2)
 
+def landmarks_to_array(pose_landmarks, out=None):
+    """Convert a pose landmark list into a (33, 4) float32 array of x, y, z, visibility"""
+    if out is None:
+        out = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+    if isinstance(pose_landmarks, np.ndarray):
+        # Already converted, e.g. by the inference service
+        out[...] = pose_landmarks
+        return out
+    # Reading the serialized message avoids 132 protobuf attribute lookups
+    raw = pose_landmarks.SerializeToString()
+    if _matches_wire_layout(raw):
+        out[...] = np.ndarray((NUM_LANDMARKS, 4), "<f4", raw, 3, (_WIRE_RECORD_SIZE, 5))
+    else:
+        out[:] = [(lm.x, lm.y, lm.z, lm.visibility) for lm in pose_landmarks.landmark]
+    return out
+
+def _matches_wire_layout(raw):
+    if len(raw) != NUM_LANDMARKS * _WIRE_RECORD_SIZE:
+        return False
+    for offset, tags in _WIRE_TAGS:
+        if raw[offset::_WIRE_RECORD_SIZE] != tags:
+            return False
+    return True
+
+def joint_indices(*joints):
+    """Compile joint index tuples into flat x/y gather indices for the batched kernels"""
+    joints = np.array(joints, dtype=np.intp)
+    return joints[..., None] * 4 + np.array([X, Y], dtype=np.intp)
+
+def calculate_angles(points, triplets):
+    """Angles in degrees at b for each compiled (a, b, c) triplet, matching calculate_angle"""
+    c = points.reshape(-1)[triplets]
+    d = c[:, 0::2] - c[:, 1:2]
+    t = np.arctan2(d[..., 1], d[..., 0])
+    ang = np.degrees(t[:, 1] - t[:, 0])
+    ang %= 360
+    return ang
+
+def calculate_distances(points, pairs):
+    """Euclidean x/y distances for each compiled (a, b) pair, matching calculate_distance"""
+    c = points.reshape(-1)[pairs]
+    d = c[:, 0] - c[:, 1]
+    return np.hypot(d[:, 0], d[:, 1])
+
+class SessionState(dict):
+    """Attribute-style state that stands in for st.session_state outside Streamlit"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+    def __delattr__(self, name):
+        try:
+            del self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
 def set_page_config():
     st.set_page_config(
         page_title="Human Pose Estimation",
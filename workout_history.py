@@ -0,0 +1,482 @@
+"""Per-user workout history in users.db, written behind the feed loops.
+
+Every time a feed is started for an activity, a set is recorded. It is
+one `workout_sets` row with the user, activity, start and end time, reps
+and total hold time. Each rep and each completed hold is also recorded as
+one `workout_events` row with its timestamp. A hold is a plank, or a
+stretch of good yoga form.
+
+The feeds never write to the database themselves. `WorkoutRecorder`
+compares the session state after each frame with what it last saw and
+queues the differences on the server's `WriteBehindBuffer`. That is a
+dictionary lookup and a deque append. A writer thread flushes the buffer
+in one transaction when it holds FLUSH_SIZE statements or when
+FLUSH_INTERVAL has passed since the oldest one was queued. A failed flush
+keeps its statements for the next attempt, and the writer backs off first:
+FLUSH_INTERVAL after one failure, doubling with each further failure up to
+MAX_BACKOFF seconds. On a clean interpreter exit, whatever is still queued
+is flushed before the process ends.
+
+A session keeps one open set. Each Streamlit rerun interrupts the feed
+loop, and the next run continues the same set if it shows the same
+activity. The set is finished when the feed really stops: the camera is
+lost, another activity is started, or a run ends without showing the
+feed, e.g. after Stop Webcam or Logout.
+
+Dashboards read per-user daily totals from `workout_daily`, not from the
+raw events. There is one row per user, local day, kind and activity, with
+sets, reps and hold seconds. Every flush folds its batch into those rows
+in the same transaction, with one upsert per set and day it touched, so
+the totals never disagree with the events they summarize. The table is
+keyed by (user, day, ...), so a user's date-range lookups read it in key
+order. A covering index on (user, activity, day) serves per-activity
+history. `backfill` and `rebuild` recompute the totals from the raw tables
+in bulk:
+
+    python workout_history.py backfill
+    python workout_history.py rebuild --user alice --since 2026-01-01
+"""
+import argparse
+import atexit
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from itertools import groupby
+
+import streamlit as st
+
+from database import get_connection_pool
+from db_pool import PoolExhausted
+
+FLUSH_SIZE = int(os.environ.get("HISTORY_FLUSH_SIZE", 200))
+FLUSH_INTERVAL = float(os.environ.get("HISTORY_FLUSH_SECONDS", 2.0))
+MAX_BACKOFF = float(os.environ.get("HISTORY_MAX_BACKOFF", 60.0))
+# Beyond this many queued statements the oldest are dropped rather than growing without bound
+MAX_PENDING = 100000
+
+CREATE_TABLES = (
+    '''
+    CREATE TABLE IF NOT EXISTS workout_sets (
+        set_id TEXT PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        activity TEXT NOT NULL,
+        started_at REAL NOT NULL,
+        ended_at REAL,
+        reps INTEGER NOT NULL DEFAULT 0,
+        hold_s REAL NOT NULL DEFAULT 0,
+        FOREIGN KEY(user_id) REFERENCES users(id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS workout_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        set_id TEXT NOT NULL,
+        event TEXT NOT NULL,
+        value REAL NOT NULL,
+        occurred_at REAL NOT NULL,
+        FOREIGN KEY(set_id) REFERENCES workout_sets(set_id)
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS workout_sets_user ON workout_sets (user_id, started_at)",
+    "CREATE INDEX IF NOT EXISTS workout_events_set ON workout_events (set_id)",
+    '''
+    CREATE TABLE IF NOT EXISTS workout_daily (
+        user_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        activity TEXT NOT NULL,
+        sets INTEGER NOT NULL DEFAULT 0,
+        reps INTEGER NOT NULL DEFAULT 0,
+        hold_s REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, day, kind, activity)
+    ) WITHOUT ROWID
+    ''',
+    # Carries the totals so per-activity lookups never touch the table
+    "CREATE INDEX IF NOT EXISTS workout_daily_activity ON workout_daily (user_id, activity, day, sets, reps, hold_s)",
+)
+
+# Times are Unix seconds
+INSERT_SET = ("INSERT OR IGNORE INTO workout_sets (set_id, user_id, kind, activity, started_at) "
+              "SELECT ?, id, ?, ?, ? FROM users WHERE username = ?")
+UPDATE_SET = "UPDATE workout_sets SET ended_at = ?, reps = ?, hold_s = ? WHERE set_id = ?"
+INSERT_EVENT = "INSERT INTO workout_events (set_id, event, value, occurred_at) SELECT ?, ?, ?, ? " \
+               "WHERE EXISTS (SELECT 1 FROM workout_sets WHERE set_id = ?)"
+
+# Days are local dates, the same in Python (time.localtime) and SQLite ('localtime')
+UPSERT_DAILY = '''
+    INSERT INTO workout_daily (user_id, day, kind, activity, sets, reps, hold_s)
+    SELECT user_id, ?, kind, activity, ?, ?, ? FROM workout_sets WHERE set_id = ?
+    ON CONFLICT (user_id, day, kind, activity) DO UPDATE SET
+        sets = sets + excluded.sets, reps = reps + excluded.reps, hold_s = hold_s + excluded.hold_s
+'''
+# Raw totals per (user, day, kind, activity) for days in [?, ?], optionally for one user
+AGGREGATE_RAW = '''
+    SELECT user_id, day, kind, activity, SUM(sets), SUM(reps), SUM(hold_s) FROM (
+        SELECT user_id, date(started_at, 'unixepoch', 'localtime') AS day, kind, activity,
+               1 AS sets, 0 AS reps, 0.0 AS hold_s
+        FROM workout_sets
+        UNION ALL
+        SELECT s.user_id, date(e.occurred_at, 'unixepoch', 'localtime'), s.kind, s.activity, 0,
+               CASE WHEN e.event = 'rep' THEN CAST(e.value AS INTEGER) ELSE 0 END,
+               CASE WHEN e.event = 'hold' THEN e.value ELSE 0.0 END
+        FROM workout_events AS e JOIN workout_sets AS s ON s.set_id = e.set_id
+    )
+    WHERE day BETWEEN ? AND ? AND (?3 IS NULL OR user_id = ?3)
+    GROUP BY user_id, day, kind, activity
+'''
+BACKFILL_DAILY = ("INSERT INTO workout_daily (user_id, day, kind, activity, sets, reps, hold_s) "
+                  + AGGREGATE_RAW + " ON CONFLICT DO NOTHING")
+REBUILD_DAILY = "INSERT INTO workout_daily (user_id, day, kind, activity, sets, reps, hold_s) " + AGGREGATE_RAW
+DELETE_DAILY = "DELETE FROM workout_daily WHERE day BETWEEN ? AND ? AND (?3 IS NULL OR user_id = ?3)"
+SELECT_USER_ID = "SELECT id FROM users WHERE username = ?"
+SELECT_DAILY = '''
+    SELECT day, SUM(sets) AS sets, SUM(reps) AS reps, SUM(hold_s) AS hold_s FROM workout_daily
+    WHERE user_id = (SELECT id FROM users WHERE username = ?) AND day BETWEEN ? AND ?
+    GROUP BY day ORDER BY day
+'''
+SELECT_ACTIVITY_DAILY = '''
+    SELECT day, sets, reps, hold_s FROM workout_daily
+    WHERE user_id = (SELECT id FROM users WHERE username = ?) AND activity = ?
+    ORDER BY day
+'''
+FIRST_DAY = "0000-01-01"
+LAST_DAY = "9999-12-31"
+
+
+def local_day(timestamp):
+    return time.strftime("%Y-%m-%d", time.localtime(timestamp))
+
+
+def daily_deltas(batch):
+    """Sum a batch's new sets, reps and holds per (set_id, day)"""
+    deltas = defaultdict(lambda: [0, 0, 0.0])
+    for statement, params in batch:
+        if statement == INSERT_EVENT:
+            set_id, event, value, occurred_at, _ = params
+            totals = deltas[(set_id, local_day(occurred_at))]
+            if event == "rep":
+                totals[1] += int(value)
+            else:
+                totals[2] += value
+        elif statement == INSERT_SET:
+            set_id, _, _, started_at, _ = params
+            deltas[(set_id, local_day(started_at))][0] += 1
+    return deltas
+
+
+def update_daily(conn, batch):
+    """Fold a batch into workout_daily; runs inside the batch's own transaction"""
+    conn.executemany(UPSERT_DAILY, [(day, sets, reps, hold_s, set_id)
+                                    for (set_id, day), (sets, reps, hold_s) in daily_deltas(batch).items()])
+
+
+def create_tables(pool):
+    """Create the history tables, backfilling daily totals for history recorded before they existed"""
+    def create(conn):
+        for sql in CREATE_TABLES:
+            conn.execute(sql)
+        if (conn.execute("SELECT 1 FROM workout_daily LIMIT 1").fetchone() is None
+                and conn.execute("SELECT 1 FROM workout_sets LIMIT 1").fetchone() is not None):
+            conn.execute(BACKFILL_DAILY, (FIRST_DAY, LAST_DAY, None))
+    pool.transaction(create)
+
+
+def _user_id(conn, username):
+    if username is None:
+        return None
+    row = conn.execute(SELECT_USER_ID, (username,)).fetchone()
+    if row is None:
+        raise ValueError(f"Unknown user: {username}")
+    return row['id']
+
+
+def backfill(pool, since=FIRST_DAY, until=LAST_DAY, username=None):
+    """Add daily totals for days that have raw history but no totals yet; returns rows added"""
+    def run(conn):
+        return conn.execute(BACKFILL_DAILY, (since, until, _user_id(conn, username))).rowcount
+    return pool.transaction(run)
+
+
+def rebuild(pool, since=FIRST_DAY, until=LAST_DAY, username=None):
+    """Recompute daily totals from the raw history in one transaction; returns rows written"""
+    def run(conn):
+        params = (since, until, _user_id(conn, username))
+        conn.execute(DELETE_DAILY, params)
+        return conn.execute(REBUILD_DAILY, params).rowcount
+    return pool.transaction(run)
+
+
+def daily_totals(username, since, until, pool=None):
+    """A user's sets, reps and hold seconds per day in [since, until], as sqlite3.Row objects"""
+    with (pool or get_connection_pool()).connection() as conn:
+        return conn.execute(SELECT_DAILY, (username, since, until)).fetchall()
+
+
+def activity_totals(username, activity, pool=None):
+    """A user's daily sets, reps and hold seconds for one activity"""
+    with (pool or get_connection_pool()).connection() as conn:
+        return conn.execute(SELECT_ACTIVITY_DAILY, (username, activity)).fetchall()
+
+
+class WriteBehindBuffer:
+    """Queues (statement, params) pairs and writes them in batched transactions on a background thread"""
+
+    def __init__(self, pool=None, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING,
+                 on_batch=None, max_backoff=MAX_BACKOFF):
+        self.pool = pool or get_connection_pool()
+        # Called as on_batch(conn, batch) inside each flush's transaction
+        self.on_batch = on_batch
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self._pending = deque(maxlen=max_pending)
+        self._cond = threading.Condition()
+        self._oldest = None
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._closed = False
+        self.queued = 0
+        self.written = 0
+        self.flushes = 0
+        self.failures = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def enqueue(self, statement, params):
+        """Queue one statement; never touches the database"""
+        with self._cond:
+            if len(self._pending) == self._pending.maxlen:
+                self.dropped += 1
+            self._pending.append((statement, params))
+            self.queued += 1
+            if self._oldest is None:
+                # Wake the writer to start timing this batch
+                self._oldest = time.monotonic()
+                self._cond.notify()
+            elif len(self._pending) >= self.flush_size:
+                self._cond.notify()
+
+    def _next_flush(self):
+        """Monotonic time the next flush is due, or None with nothing queued"""
+        if not self._pending:
+            return None
+        due = self._oldest if len(self._pending) >= self.flush_size else self._oldest + self.flush_interval
+        # While backing off, a full buffer waits too
+        return max(due, self._retry_at)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    due = self._next_flush()
+                    now = time.monotonic()
+                    if due is not None and due <= now:
+                        break
+                    self._cond.wait(None if due is None else due - now)
+                if self._closed:
+                    return
+            self.flush()
+
+    def flush(self):
+        """Write everything queued so far in one transaction; returns the number of statements written"""
+        with self._cond:
+            batch = list(self._pending)
+            self._pending.clear()
+            self._oldest = None
+        if not batch:
+            return 0
+
+        def write(conn):
+            # Consecutive statements of one kind go through executemany; order is kept across kinds
+            for statement, group in groupby(batch, key=lambda item: item[0]):
+                conn.executemany(statement, [params for _, params in group])
+            if self.on_batch is not None:
+                self.on_batch(conn, batch)
+
+        try:
+            self.pool.transaction(write)
+        except (sqlite3.Error, PoolExhausted):
+            self.failures += 1
+            with self._cond:
+                # Put the batch back in front of anything queued meanwhile and retry after the backoff
+                self._pending.extendleft(reversed(batch))
+                self._oldest = time.monotonic()
+                self._backoff = min(self.max_backoff, self._backoff * 2 or self.flush_interval)
+                self._retry_at = self._oldest + self._backoff
+            return 0
+        with self._cond:
+            self._backoff = 0.0
+            self._retry_at = 0.0
+        self.flushes += 1
+        self.written += len(batch)
+        return len(batch)
+
+    def stats(self):
+        with self._cond:
+            pending = len(self._pending)
+            backoff = self._backoff
+        return {
+            "pending": pending,
+            "queued": self.queued,
+            "written": self.written,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "dropped": self.dropped,
+            "backoff_s": backoff,
+        }
+
+    def close(self):
+        """Stop the writer thread and flush what is left"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=5.0)
+        self.flush()
+
+
+@st.cache_resource
+def get_history_buffer():
+    """Return the write-behind buffer shared by every session on this server"""
+    pool = get_connection_pool()
+    create_tables(pool)
+    return WriteBehindBuffer(pool, on_batch=update_daily)
+
+
+class WorkoutRecorder:
+    """Turns one feed's per-frame state into workout set and event records"""
+
+    def __init__(self, buffer, username, kind, activity, now=None):
+        self.buffer = buffer
+        self.set_id = uuid.uuid4().hex
+        self.kind = kind
+        self.activity = activity
+        self.reps = 0
+        self.hold_s = 0.0
+        self._counter = None
+        self._plank_total = None
+        self._good_since = None
+        self.finished = False
+        buffer.enqueue(INSERT_SET, (self.set_id, kind, activity, time.time() if now is None else now, username))
+
+    def _event(self, event, value, now):
+        self.buffer.enqueue(INSERT_EVENT, (self.set_id, event, value, now, self.set_id))
+
+    def observe_exercise(self, state, now=None):
+        """Record reps and completed plank holds since the previous frame"""
+        now = time.time() if now is None else now
+        counter = state.get("counter", 0)
+        if self._counter is not None and counter > self._counter:
+            for _ in range(counter - self._counter):
+                self._event("rep", 1, now)
+            self.reps += counter - self._counter
+        # A counter reset starts a new baseline rather than recording negative reps
+        self._counter = counter
+        plank_total = state.get("total_plank_time", 0)
+        if self._plank_total is not None and plank_total > self._plank_total:
+            held = plank_total - self._plank_total
+            self._event("hold", held, now)
+            self.hold_s += held
+        self._plank_total = plank_total
+
+    def observe_pose(self, good, now=None):
+        """Record a hold each time a stretch of good form ends"""
+        now = time.time() if now is None else now
+        if good and self._good_since is None:
+            self._good_since = now
+        elif not good and self._good_since is not None:
+            self._end_hold(now)
+
+    def _end_hold(self, now):
+        held = now - self._good_since
+        self._good_since = None
+        if held > 0:
+            self._event("hold", held, now)
+            self.hold_s += held
+
+    def finish(self, now=None):
+        """Close the set with its totals; safe to call more than once"""
+        if self.finished:
+            return
+        self.finished = True
+        now = time.time() if now is None else now
+        if self._good_since is not None:
+            self._end_hold(now)
+        self.buffer.enqueue(UPDATE_SET, (now, self.reps, self.hold_s, self.set_id))
+
+
+def start_workout(kind, activity):
+    """Return the session's open set for this activity, starting one if needed
+
+    Returns None when nobody is logged in. An open set for another user or
+    activity is finished first.
+    """
+    username = st.session_state.get("username")
+    if not username:
+        return None
+    # Claimed for this run; finish_unclaimed_workout leaves it open
+    st.session_state.workout_claimed = True
+    key = (username, kind, activity)
+    open_key, recorder = st.session_state.get("workout", (None, None))
+    if recorder is not None and not recorder.finished:
+        if open_key == key:
+            return recorder
+        recorder.finish()
+    try:
+        recorder = WorkoutRecorder(get_history_buffer(), username, kind, activity)
+    except (sqlite3.Error, PoolExhausted):
+        # History is best effort; the feed runs without it
+        recorder = None
+    st.session_state.workout = (key, recorder)
+    return recorder
+
+
+def defer_workout():
+    """Leave the open set to the next script run, which continues or finishes it"""
+    st.session_state.pop("workout_claimed", None)
+
+
+def finish_workout():
+    """Finish the session's open set, if there is one"""
+    _, recorder = st.session_state.pop("workout", (None, None))
+    if recorder is not None:
+        recorder.finish()
+
+
+def finish_unclaimed_workout():
+    """Finish the open set if the script run that just finished did not show its feed"""
+    if not st.session_state.pop("workout_claimed", False):
+        finish_workout()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute daily workout totals from the raw history")
+    parser.add_argument("command", choices=("backfill", "rebuild"),
+                        help="backfill adds missing days; rebuild replaces every day in range")
+    parser.add_argument("--user", help="only this username")
+    parser.add_argument("--since", default=FIRST_DAY, help="first day, YYYY-MM-DD")
+    parser.add_argument("--until", default=LAST_DAY, help="last day, YYYY-MM-DD")
+    args = parser.parse_args(argv)
+
+    pool = get_connection_pool()
+    create_tables(pool)
+    command = backfill if args.command == "backfill" else rebuild
+    try:
+        rows = command(pool, args.since, args.until, args.user)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    print(f"{args.command}: {rows} daily row(s) written")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
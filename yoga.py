@@ -1,13 +1,35 @@
 import cv2
-import math
 import streamlit as st
+from streamlit.runtime.scriptrunner import RerunException
 import mediapipe as mp
-from utils import calculate_angle, calculate_distance
+from buffers import BufferPool
+from capture import CaptureStage
+from display import FrameDisplay
+from landmark_store import start_recording
+from landmark_stream import open_feed_camera
+from overlay import TextLayer, put_text
+from publisher import UiPublisher
+from process_pipeline import FEED_PROCESSES, run_process_feed
+from session_runtime import FEED_RUNTIME, run_feed
+from session_store import end_session
+from pose_pool import LATENCY_BUDGET_MS, acquire_session_pose, downgrade_session_pose, release_session_pose
+from tracking import (InferenceScheduler, LandmarkFilter, LandmarkTracker, LatencyMonitor, ROI_SIZE, SMOOTHING,
+                      draw_skeleton)
+from workout_history import defer_workout, start_workout
+from utils import (calculate_angles, joint_indices,
+                   LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_ELBOW, RIGHT_ELBOW, LEFT_WRIST, RIGHT_WRIST,
+                   LEFT_HIP, RIGHT_HIP, LEFT_KNEE, RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE, X, Y)
 
 # Initialize MediaPipe Pose
 mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(static_image_mode=False, min_detection_confidence=0.5, min_tracking_confidence=0.5)
-mp_drawing = mp.solutions.drawing_utils
+
+# Joint triplets (a, b, c) each check evaluates in one batched call
+KNEE_ANGLES = joint_indices((LEFT_HIP, LEFT_KNEE, LEFT_ANKLE), (RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE))
+ELBOW_ANGLES = joint_indices((LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST), (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST))
+COBRA_ARM_ANGLES = joint_indices((LEFT_WRIST, LEFT_ELBOW, LEFT_SHOULDER), (RIGHT_WRIST, RIGHT_ELBOW, RIGHT_SHOULDER))
+FRONT_KNEE_ANGLE = joint_indices((RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE))
+SPINE_CURVE_ANGLE = joint_indices((LEFT_SHOULDER, LEFT_HIP, RIGHT_HIP))
+HIP_HINGE_ANGLE = joint_indices((LEFT_SHOULDER, LEFT_HIP, LEFT_KNEE))
 
 def yoga_page():
     """Yoga category page"""
@@ -40,7 +62,7 @@ def show_yoga_instructions(pose):
     # Dictionary mapping yoga poses to their instructions and image URLs
     yoga_data = {
     "Tree Pose": {
-        "image": "C:\Users\Asus\Downloads\code hpe\code_hpe\yoga poses\treepose.jpeg",
+        "image": "yoga poses/treepose.jpeg",
         "instructions": [
             "Stand tall with feet together",
             "Shift weight to left foot, bend right knee",
@@ -50,7 +72,7 @@ def show_yoga_instructions(pose):
         ]
     },
     "Warrior II": {
-        "image": "C:\Users\Asus\Downloads\code hpe\code_hpe\yoga poses\warrior.jpeg",
+        "image": "yoga poses/warrior.jpeg",
         "instructions": [
             "Stand with feet 3-4 feet apart",
             "Turn right foot out 90 degrees, left foot slightly in",
@@ -190,104 +212,165 @@ def initialize_yoga_tracking(pose):
             st.session_state.webcam_active = not st.session_state.webcam_active
     with col2:
         if st.button("🚪 Logout", key="yoga_logout"):
-            st.session_state.logged_in = False
-            st.session_state.username = None
+            end_session()
             st.success("Logged out successfully!")
             st.rerun()
 
     if st.session_state.webcam_active:
         process_yoga_feed(pose)
 
+def show_feedback(placeholder, feedback):
+    """Render pose feedback, green for good form and red otherwise"""
+    if "GOOD" in feedback:
+        placeholder.markdown(f'<div class="pose-feedback" style="background-color:#e8f5e9;color:#4CAF50;">{feedback}</div>', unsafe_allow_html=True)
+    else:
+        placeholder.markdown(f'<div class="pose-feedback" style="background-color:#ffebee;color:#F44336;">{feedback}</div>', unsafe_allow_html=True)
+
 def process_yoga_feed(yoga_pose):
     """Process real-time webcam feed for yoga poses"""
     st.markdown("---")
     st.markdown('<div class="exercise-title"><h3>🎥 Live Pose Feedback</h3></div>', unsafe_allow_html=True)
     
-    cap = cv2.VideoCapture(0)
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-    cap.set(cv2.CAP_PROP_FPS, 30)
+    if FEED_RUNTIME == "asyncio":
+        # Runs on the shared event loop; this script run returns right away
+        run_feed("yoga", yoga_pose, YOGA_CHECKS[yoga_pose], {"feedback": (st.empty(), show_feedback, None)})
+        return
+    if FEED_PROCESSES:
+        process_yoga_feed_processes(yoga_pose)
+        return
+    
+    # Lease a Pose graph for this session; tracking state must not be shared
+    status_placeholder = st.empty()
+    pose = acquire_session_pose(status_placeholder)
+    if pose is None:
+        return
+    
+    camera, stream = open_feed_camera()
+    capture = CaptureStage(camera)
+    if not capture.start():
+        st.error("Camera error")
+        capture.stop()
+        release_session_pose()
+        return
     
     video_placeholder = st.empty()
     feedback_placeholder = st.empty()
+    # Holds are served from extrapolated landmarks; POSE_ROI_SIZE enables person-centred crops
+    tracker = LandmarkTracker(pose, InferenceScheduler(max_interval=6), crop_size=ROI_SIZE,
+                              monitor=LatencyMonitor(LATENCY_BUDGET_MS), downgrade=downgrade_session_pose,
+                              smoother=LandmarkFilter() if SMOOTHING else None)
+    buffers = BufferPool()
+    # Encoding and publishing run on their own thread at the display rate cap
+    display = None if stream else FrameDisplay(video_placeholder).start()
+    # Feedback is rewritten only when it changes, and at most every UI_MIN_INTERVAL seconds
+    publisher = UiPublisher().register("feedback", feedback_placeholder, show_feedback)
+    # Stretches of good form are queued for the history writer as holds
+    recorder = start_workout("yoga", yoga_pose)
+    # With RECORDINGS_DIR set, every frame's landmarks are appended to a session recording
+    recording = start_recording("yoga", yoga_pose)
     
-    while st.session_state.webcam_active:
-        ret, frame = cap.read()
-        if not ret:
-            st.error("Camera error")
-            break
-        
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = pose.process(image)
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-        
-        feedback = ""
-        if results.pose_landmarks:
-            if yoga_pose == "Tree Pose":
-                feedback = check_tree_pose(results.pose_landmarks, image)
-            elif yoga_pose == "Warrior II":
-                feedback = check_warrior_ii(results.pose_landmarks, image)
-            elif yoga_pose == "Downward Dog":
-                feedback = check_downward_dog(results.pose_landmarks, image)
-            elif yoga_pose == "Cobra Pose":
-                feedback = check_cobra_pose(results.pose_landmarks, image)
-            elif yoga_pose == "Bridge Pose":
-                feedback = check_bridge_pose(results.pose_landmarks, image)
-            elif yoga_pose == "Child's Pose":
-                feedback = check_childs_pose(results.pose_landmarks, image)
-            elif yoga_pose == "Mountain Pose":
-                feedback = check_mountain_pose(results.pose_landmarks, image)
-            elif yoga_pose == "Cat-Cow":
-                feedback = check_cat_cow_pose(results.pose_landmarks, image)
-            elif yoga_pose == "Easy Pose":
-                feedback = check_easy_pose(results.pose_landmarks, image)
-            elif yoga_pose == "Seated Forward Bend":
-                feedback = check_seated_forward_bend(results.pose_landmarks, image)
-            elif yoga_pose == "Legs-Up-the-Wall":
-                feedback = check_legs_up_wall(results.pose_landmarks, image)
-            
-            mp_drawing.draw_landmarks(image, results.pose_landmarks, mp_pose.POSE_CONNECTIONS)
-        
-        # Display feedback
-        if feedback:
-            if "GOOD" in feedback:
-                feedback_placeholder.markdown(f'<div class="pose-feedback" style="background-color:#e8f5e9;color:#4CAF50;">{feedback}</div>', unsafe_allow_html=True)
+    try:
+        while st.session_state.webcam_active:
+            frame = capture.read_latest()
+            if frame is None:
+                st.error("Camera error")
+                break
+        
+            # Inference, overlays and display all work on the one RGB buffer
+            image = buffers.cvt_color(frame.image, cv2.COLOR_BGR2RGB)
+            landmarks = tracker.process(image, frame.timestamp)
+            # When streaming landmarks the browser draws the skeleton and HUD itself
+            hud = TextLayer(image.shape) if stream else image
+        
+            feedback = ""
+            if landmarks is not None:
+                feedback = YOGA_CHECKS[yoga_pose](landmarks, hud)
+                if not stream:
+                    draw_skeleton(image, landmarks)
+        
+            # Display feedback
+            if feedback:
+                publisher.update("feedback", feedback)
+            if recorder is not None:
+                recorder.observe_pose("GOOD" in feedback)
+            if recording is not None:
+                recording.append(landmarks, frame.timestamp, good="GOOD" in feedback)
+        
+            if stream:
+                stream.send(landmarks, hud, feedback=feedback)
             else:
-                feedback_placeholder.markdown(f'<div class="pose-feedback" style="background-color:#ffebee;color:#F44336;">{feedback}</div>', unsafe_allow_html=True)
-        
-        video_placeholder.image(image, channels="BGR")
+                display.submit(image)
         
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
 
-    cap.release()
+    except RerunException:
+        # The next run continues the set, or finishes it if it no longer shows this feed
+        defer_workout()
+        recorder = None
+        raise
+    finally:
+        if recorder is not None:
+            recorder.finish()
+        if recording is not None:
+            recording.close()
+        publisher.close()
+        if display:
+            display.close()
+        capture.stop()
+        release_session_pose()
     cv2.destroyAllWindows()
 
+def process_yoga_feed_processes(yoga_pose):
+    """Run the yoga feed with capture, inference and encoding in child processes"""
+    video_placeholder = st.empty()
+    publisher = UiPublisher().register("feedback", st.empty(), show_feedback)
+    recorder = start_workout("yoga", yoga_pose)
+
+    def on_result(meta):
+        if meta["feedback"]:
+            publisher.update("feedback", meta["feedback"])
+        if recorder is not None:
+            recorder.observe_pose("GOOD" in meta["feedback"])
+
+    try:
+        run_process_feed("yoga", yoga_pose, video_placeholder, on_result)
+    except RerunException:
+        # The next run continues the set, or finishes it if it no longer shows this feed
+        defer_workout()
+        recorder = None
+        raise
+    finally:
+        if recorder is not None:
+            recorder.finish()
+        publisher.close()
+
+# Checks draw on the RGB display frame, so colors are (R, G, B)
 def check_tree_pose(landmarks, image):
     """Check Tree Pose form"""
     try:
-        left_ankle = landmarks.landmark[mp_pose.PoseLandmark.LEFT_ANKLE.value]
-        right_knee = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_KNEE.value]
-        left_hip = landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP.value]
-        right_hip = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP.value]
+        left_ankle = landmarks[LEFT_ANKLE]
+        right_knee = landmarks[RIGHT_KNEE]
+        left_hip = landmarks[LEFT_HIP]
+        right_hip = landmarks[RIGHT_HIP]
         
-        foot_near_knee = (abs(left_ankle.x - right_knee.x) < 0.05 and 
-                         abs(left_ankle.y - right_knee.y) < 0.1)
-        balanced = abs(left_hip.y - right_hip.y) < 0.05
+        foot_near_knee = (abs(left_ankle[X] - right_knee[X]) < 0.05 and 
+                         abs(left_ankle[Y] - right_knee[Y]) < 0.1)
+        balanced = abs(left_hip[Y] - right_hip[Y]) < 0.05
         
         if foot_near_knee and balanced:
-            cv2.putText(image, "GOOD TREE POSE", (image.shape[1]//2 - 100, 50), 
+            put_text(image, "GOOD TREE POSE", (image.shape[1]//2 - 100, 50), 
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
             return "GOOD TREE POSE FORM! 👍"
         else:
             feedback = []
             if not foot_near_knee:
-                cv2.putText(image, "PLACE FOOT NEAR KNEE", (image.shape[1]//2 - 150, 50), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+                put_text(image, "PLACE FOOT NEAR KNEE", (image.shape[1]//2 - 150, 50), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 0, 0), 2)
                 feedback.append("Place foot near knee")
             if not balanced:
-                cv2.putText(image, "KEEP HIPS LEVEL", (image.shape[1]//2 - 120, 80), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+                put_text(image, "KEEP HIPS LEVEL", (image.shape[1]//2 - 120, 80), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 0, 0), 2)
                 feedback.append("Keep hips level")
             return "ADJUST YOUR POSE: " + ", ".join(feedback)
     
@@ -298,43 +381,39 @@ def check_tree_pose(landmarks, image):
 def check_warrior_ii(landmarks, image):
     """Check Warrior II pose form"""
     try:
-        left_shoulder = landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-        left_hip = landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP.value]
-        left_knee = landmarks.landmark[mp_pose.PoseLandmark.LEFT_KNEE.value]
-        left_ankle = landmarks.landmark[mp_pose.PoseLandmark.LEFT_ANKLE.value]
+        left_shoulder = landmarks[LEFT_SHOULDER]
+        left_hip = landmarks[LEFT_HIP]
         
-        right_shoulder = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-        right_hip = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP.value]
-        right_knee = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_KNEE.value]
-        right_ankle = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ANKLE.value]
+        right_shoulder = landmarks[RIGHT_SHOULDER]
+        right_hip = landmarks[RIGHT_HIP]
         
         # Check front knee angle (should be ~90 degrees)
-        front_knee_angle = calculate_angle(right_hip, right_knee, right_ankle)
+        front_knee_angle, = calculate_angles(landmarks, FRONT_KNEE_ANGLE)
         good_knee_angle = 80 < front_knee_angle < 100
         
         # Check arm alignment (should be straight line shoulder to wrist)
-        arm_alignment = abs(left_shoulder.y - right_shoulder.y) < 0.05
+        arm_alignment = abs(left_shoulder[Y] - right_shoulder[Y]) < 0.05
         
         # Check hips facing sideways
-        hips_alignment = abs(left_hip.x - right_hip.x) > 0.2
+        hips_alignment = abs(left_hip[X] - right_hip[X]) > 0.2
         
         if good_knee_angle and arm_alignment and hips_alignment:
-            cv2.putText(image, "GOOD WARRIOR II", (image.shape[1]//2 - 120, 50), 
+            put_text(image, "GOOD WARRIOR II", (image.shape[1]//2 - 120, 50), 
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
             return "GOOD WARRIOR II FORM! 👍"
         else:
             feedback = []
             if not good_knee_angle:
-                cv2.putText(image, f"BEND FRONT KNEE MORE ({int(front_knee_angle)}°)", 
-                           (image.shape[1]//2 - 180, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+                put_text(image, f"BEND FRONT KNEE MORE ({int(front_knee_angle)}°)", 
+                           (image.shape[1]//2 - 180, 50), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 0, 0), 2)
                 feedback.append("Bend front knee to 90°")
             if not arm_alignment:
-                cv2.putText(image, "STRETCH ARMS STRAIGHT", (image.shape[1]//2 - 150, 80), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+                put_text(image, "STRETCH ARMS STRAIGHT", (image.shape[1]//2 - 150, 80), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 0, 0), 2)
                 feedback.append("Align arms straight")
             if not hips_alignment:
-                cv2.putText(image, "FACE HIPS SIDEWAYS", (image.shape[1]//2 - 130, 110), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+                put_text(image, "FACE HIPS SIDEWAYS", (image.shape[1]//2 - 130, 110), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 0, 0), 2)
                 feedback.append("Turn hips sideways")
             return "ADJUST YOUR POSE: " + ", ".join(feedback)
     
@@ -345,34 +424,31 @@ def check_warrior_ii(landmarks, image):
 def check_downward_dog(landmarks, image):
     """Check Downward Dog pose form"""
     try:
-        left_shoulder = landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-        left_hip = landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP.value]
-        left_knee = landmarks.landmark[mp_pose.PoseLandmark.LEFT_KNEE.value]
+        left_shoulder = landmarks[LEFT_SHOULDER]
+        left_hip = landmarks[LEFT_HIP]
         
-        right_shoulder = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-        right_hip = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP.value]
-        right_knee = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_KNEE.value]
+        right_shoulder = landmarks[RIGHT_SHOULDER]
+        right_hip = landmarks[RIGHT_HIP]
         
         # Check if hips are higher than shoulders
-        hips_higher = (left_hip.y + right_hip.y)/2 < (left_shoulder.y + right_shoulder.y)/2
+        hips_higher = (left_hip[Y] + right_hip[Y])/2 < (left_shoulder[Y] + right_shoulder[Y])/2
         # Check if legs are straight
-        left_leg_angle = calculate_angle(left_hip, left_knee, landmarks.landmark[mp_pose.PoseLandmark.LEFT_ANKLE.value])
-        right_leg_angle = calculate_angle(right_hip, right_knee, landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ANKLE.value])
+        left_leg_angle, right_leg_angle = calculate_angles(landmarks, KNEE_ANGLES)
         legs_straight = left_leg_angle > 160 and right_leg_angle > 160
         
         if hips_higher and legs_straight:
-            cv2.putText(image, "GOOD DOWNWARD DOG", (image.shape[1]//2 - 150, 50), 
+            put_text(image, "GOOD DOWNWARD DOG", (image.shape[1]//2 - 150, 50), 
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
             return "GOOD DOWNWARD DOG FORM! 👍"
         else:
             feedback = []
             if not hips_higher:
-                cv2.putText(image, "LIFT HIPS HIGHER", (image.shape[1]//2 - 120, 50), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+                put_text(image, "LIFT HIPS HIGHER", (image.shape[1]//2 - 120, 50), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 0, 0), 2)
                 feedback.append("Lift hips higher")
             if not legs_straight:
-                cv2.putText(image, "STRAIGHTEN LEGS", (image.shape[1]//2 - 130, 80), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+                put_text(image, "STRAIGHTEN LEGS", (image.shape[1]//2 - 130, 80), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 0, 0), 2)
                 feedback.append("Straighten legs")
             return "ADJUST YOUR POSE: " + ", ".join(feedback)
     
@@ -383,40 +459,25 @@ def check_downward_dog(landmarks, image):
 def check_cobra_pose(landmarks, image):
     """Check Cobra Pose form"""
     try:
-        left_shoulder = landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-        left_elbow = landmarks.landmark[mp_pose.PoseLandmark.LEFT_ELBOW.value]
-        
-        right_shoulder = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-        right_elbow = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ELBOW.value]
-        
         # Check if shoulders are lifted
-        shoulders_lifted = (left_shoulder.y + right_shoulder.y)/2 < 0.6
+        shoulders_lifted = (landmarks[LEFT_SHOULDER, Y] + landmarks[RIGHT_SHOULDER, Y])/2 < 0.6
         # Check if elbows are slightly bent
-        left_arm_angle = calculate_angle(
-            landmarks.landmark[mp_pose.PoseLandmark.LEFT_WRIST.value],
-            left_elbow,
-            left_shoulder
-        )
-        right_arm_angle = calculate_angle(
-            landmarks.landmark[mp_pose.PoseLandmark.RIGHT_WRIST.value],
-            right_elbow,
-            right_shoulder
-        )
+        left_arm_angle, right_arm_angle = calculate_angles(landmarks, COBRA_ARM_ANGLES)
         arms_bent = 140 < left_arm_angle < 170 and 140 < right_arm_angle < 170
         
         if shoulders_lifted and arms_bent:
-            cv2.putText(image, "GOOD COBRA POSE", (image.shape[1]//2 - 120, 50), 
+            put_text(image, "GOOD COBRA POSE", (image.shape[1]//2 - 120, 50), 
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
             return "GOOD COBRA POSE FORM! 👍"
         else:
             feedback = []
             if not shoulders_lifted:
-                cv2.putText(image, "LIFT CHEST HIGHER", (image.shape[1]//2 - 140, 50), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+                put_text(image, "LIFT CHEST HIGHER", (image.shape[1]//2 - 140, 50), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 0, 0), 2)
                 feedback.append("Lift chest higher")
             if not arms_bent:
-                cv2.putText(image, "BEND ARMS SLIGHTLY", (image.shape[1]//2 - 150, 80), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+                put_text(image, "BEND ARMS SLIGHTLY", (image.shape[1]//2 - 150, 80), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 0, 0), 2)
                 feedback.append("Bend arms slightly")
             return "ADJUST YOUR POSE: " + ", ".join(feedback)
     
@@ -427,34 +488,31 @@ def check_cobra_pose(landmarks, image):
 def check_bridge_pose(landmarks, image):
     """Check Bridge Pose form"""
     try:
-        left_shoulder = landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-        left_hip = landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP.value]
-        left_knee = landmarks.landmark[mp_pose.PoseLandmark.LEFT_KNEE.value]
+        left_shoulder = landmarks[LEFT_SHOULDER]
+        left_hip = landmarks[LEFT_HIP]
         
-        right_shoulder = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-        right_hip = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP.value]
-        right_knee = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_KNEE.value]
+        right_shoulder = landmarks[RIGHT_SHOULDER]
+        right_hip = landmarks[RIGHT_HIP]
         
         # Check if hips are lifted
-        hips_lifted = (left_hip.y + right_hip.y)/2 < (left_shoulder.y + right_shoulder.y)/2
+        hips_lifted = (left_hip[Y] + right_hip[Y])/2 < (left_shoulder[Y] + right_shoulder[Y])/2
         # Check knee angles
-        left_knee_angle = calculate_angle(left_hip, left_knee, landmarks.landmark[mp_pose.PoseLandmark.LEFT_ANKLE.value])
-        right_knee_angle = calculate_angle(right_hip, right_knee, landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ANKLE.value])
+        left_knee_angle, right_knee_angle = calculate_angles(landmarks, KNEE_ANGLES)
         knees_bent = 100 < left_knee_angle < 120 and 100 < right_knee_angle < 120
         
         if hips_lifted and knees_bent:
-            cv2.putText(image, "GOOD BRIDGE POSE", (image.shape[1]//2 - 130, 50), 
+            put_text(image, "GOOD BRIDGE POSE", (image.shape[1]//2 - 130, 50), 
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
             return "GOOD BRIDGE POSE FORM! 👍"
         else:
             feedback = []
             if not hips_lifted:
-                cv2.putText(image, "LIFT HIPS HIGHER", (image.shape[1]//2 - 120, 50), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+                put_text(image, "LIFT HIPS HIGHER", (image.shape[1]//2 - 120, 50), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 0, 0), 2)
                 feedback.append("Lift hips higher")
             if not knees_bent:
-                cv2.putText(image, "ADJUST KNEE ANGLES", (image.shape[1]//2 - 150, 80), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+                put_text(image, "ADJUST KNEE ANGLES", (image.shape[1]//2 - 150, 80), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 0, 0), 2)
                 feedback.append("Adjust knee angles")
             return "ADJUST YOUR POSE: " + ", ".join(feedback)
     
@@ -465,40 +523,25 @@ def check_bridge_pose(landmarks, image):
 def check_childs_pose(landmarks, image):
     """Check Child's Pose form"""
     try:
-        left_shoulder = landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-        left_hip = landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP.value]
-        
-        right_shoulder = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-        right_hip = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP.value]
-        
         # Check if hips are close to heels (approximation)
-        hips_low = (left_hip.y + right_hip.y)/2 > 0.8
+        hips_low = (landmarks[LEFT_HIP, Y] + landmarks[RIGHT_HIP, Y])/2 > 0.8
         # Check if arms are extended forward
-        left_arm_angle = calculate_angle(
-            left_shoulder,
-            landmarks.landmark[mp_pose.PoseLandmark.LEFT_ELBOW.value],
-            landmarks.landmark[mp_pose.PoseLandmark.LEFT_WRIST.value]
-        )
-        right_arm_angle = calculate_angle(
-            right_shoulder,
-            landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ELBOW.value],
-            landmarks.landmark[mp_pose.PoseLandmark.RIGHT_WRIST.value]
-        )
+        left_arm_angle, right_arm_angle = calculate_angles(landmarks, ELBOW_ANGLES)
         arms_extended = left_arm_angle > 150 and right_arm_angle > 150
         
         if hips_low and arms_extended:
-            cv2.putText(image, "GOOD CHILD'S POSE", (image.shape[1]//2 - 140, 50), 
+            put_text(image, "GOOD CHILD'S POSE", (image.shape[1]//2 - 140, 50), 
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
             return "GOOD CHILD'S POSE FORM! 👍"
         else:
             feedback = []
             if not hips_low:
-                cv2.putText(image, "SINK HIPS LOWER", (image.shape[1]//2 - 120, 50), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+                put_text(image, "SINK HIPS LOWER", (image.shape[1]//2 - 120, 50), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 0, 0), 2)
                 feedback.append("Sink hips lower")
             if not arms_extended:
-                cv2.putText(image, "EXTEND ARMS FORWARD", (image.shape[1]//2 - 160, 80), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+                put_text(image, "EXTEND ARMS FORWARD", (image.shape[1]//2 - 160, 80), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 0, 0), 2)
                 feedback.append("Extend arms forward")
             return "ADJUST YOUR POSE: " + ", ".join(feedback)
     
@@ -509,30 +552,30 @@ def check_childs_pose(landmarks, image):
 def check_mountain_pose(landmarks, image):
     """Check Mountain Pose (Tadasana) form"""
     try:
-        left_shoulder = landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-        left_hip = landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP.value]
-        left_knee = landmarks.landmark[mp_pose.PoseLandmark.LEFT_KNEE.value]
-        left_ankle = landmarks.landmark[mp_pose.PoseLandmark.LEFT_ANKLE.value]
+        left_shoulder = landmarks[LEFT_SHOULDER]
+        left_hip = landmarks[LEFT_HIP]
+        left_knee = landmarks[LEFT_KNEE]
+        left_ankle = landmarks[LEFT_ANKLE]
         
-        right_shoulder = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-        right_hip = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP.value]
-        right_knee = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_KNEE.value]
-        right_ankle = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ANKLE.value]
+        right_shoulder = landmarks[RIGHT_SHOULDER]
+        right_hip = landmarks[RIGHT_HIP]
+        right_knee = landmarks[RIGHT_KNEE]
+        right_ankle = landmarks[RIGHT_ANKLE]
         
         # Check body alignment
-        left_alignment = abs(left_shoulder.x - left_hip.x) < 0.05 and abs(left_hip.x - left_ankle.x) < 0.05
-        right_alignment = abs(right_shoulder.x - right_hip.x) < 0.05 and abs(right_hip.x - right_ankle.x) < 0.05
+        left_alignment = abs(left_shoulder[X] - left_hip[X]) < 0.05 and abs(left_hip[X] - left_ankle[X]) < 0.05
+        right_alignment = abs(right_shoulder[X] - right_hip[X]) < 0.05 and abs(right_hip[X] - right_ankle[X]) < 0.05
         balanced = left_alignment and right_alignment
         
         if balanced:
-            cv2.putText(image, "GOOD MOUNTAIN POSE", (image.shape[1]//2 - 150, 50), 
+            put_text(image, "GOOD MOUNTAIN POSE", (image.shape[1]//2 - 150, 50), 
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
             return "GOOD MOUNTAIN POSE FORM! 👍"
         else:
             feedback = []
             if not left_alignment or not right_alignment:
-                cv2.putText(image, "ALIGN SHOULDERS OVER HIPS", (image.shape[1]//2 - 180, 50), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+                put_text(image, "ALIGN SHOULDERS OVER HIPS", (image.shape[1]//2 - 180, 50), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 0, 0), 2)
                 feedback.append("Align shoulders over hips")
             return "ADJUST YOUR POSE: " + ", ".join(feedback)
     
@@ -543,26 +586,20 @@ def check_mountain_pose(landmarks, image):
 def check_cat_cow_pose(landmarks, image):
     """Check Cat-Cow Pose form"""
     try:
-        left_shoulder = landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-        left_hip = landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP.value]
-        
-        right_shoulder = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-        right_hip = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP.value]
-        
         # Calculate spine curvature
-        shoulder_hip_angle = calculate_angle(left_shoulder, left_hip, right_hip)
+        shoulder_hip_angle, = calculate_angles(landmarks, SPINE_CURVE_ANGLE)
         
         if shoulder_hip_angle < 160:  # Cat pose (rounded back)
-            cv2.putText(image, "CAT POSE DETECTED", (image.shape[1]//2 - 120, 50), 
+            put_text(image, "CAT POSE DETECTED", (image.shape[1]//2 - 120, 50), 
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
             return "GOOD CAT POSE! Now arch your back for Cow Pose"
         elif shoulder_hip_angle > 170:  # Cow pose (arched back)
-            cv2.putText(image, "COW POSE DETECTED", (image.shape[1]//2 - 120, 50), 
+            put_text(image, "COW POSE DETECTED", (image.shape[1]//2 - 120, 50), 
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
             return "GOOD COW POSE! Now round your back for Cat Pose"
         else:
-            cv2.putText(image, "TRANSITION BETWEEN POSES", (image.shape[1]//2 - 180, 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 165, 255), 2)
+            put_text(image, "TRANSITION BETWEEN POSES", (image.shape[1]//2 - 180, 50), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 165, 0), 2)
             return "Move between Cat and Cow poses with your breath"
     
     except Exception as e:
@@ -573,45 +610,45 @@ def check_easy_pose(landmarks, image):
     """Easy Pose detector checking ankles, spine, and hand position"""
     try:
         # Get required landmarks
-        left_ankle = landmarks.landmark[mp_pose.PoseLandmark.LEFT_ANKLE.value]
-        right_ankle = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_ANKLE.value]
-        left_shoulder = landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-        left_hip = landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP.value]
-        left_knee = landmarks.landmark[mp_pose.PoseLandmark.LEFT_KNEE.value]
-        right_wrist = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_WRIST.value]
-        left_wrist = landmarks.landmark[mp_pose.PoseLandmark.LEFT_WRIST.value]
+        left_ankle = landmarks[LEFT_ANKLE]
+        right_ankle = landmarks[RIGHT_ANKLE]
+        left_shoulder = landmarks[LEFT_SHOULDER]
+        left_hip = landmarks[LEFT_HIP]
+        left_knee = landmarks[LEFT_KNEE]
+        right_wrist = landmarks[RIGHT_WRIST]
+        left_wrist = landmarks[LEFT_WRIST]
 
         # 1. Check ankle crossing (lenient threshold)
-        ankles_crossed = abs(left_ankle.x - right_ankle.x) < 0.25  # 25% of screen width
+        ankles_crossed = abs(left_ankle[X] - right_ankle[X]) < 0.25  # 25% of screen width
         
         # 2. Check spine straightness (shoulder over hip)
-        spine_straight = abs(left_shoulder.x - left_hip.x) < 0.15
+        spine_straight = abs(left_shoulder[X] - left_hip[X]) < 0.15
         
         # 3. Check hands on legs (wrists between knees and hips)
         hands_on_legs = (
-            (left_wrist.y > left_knee.y) and 
-            (left_wrist.y < left_hip.y) and
-            (right_wrist.y > left_knee.y) and
-            (right_wrist.y < left_hip.y)
+            (left_wrist[Y] > left_knee[Y]) and 
+            (left_wrist[Y] < left_hip[Y]) and
+            (right_wrist[Y] > left_knee[Y]) and
+            (right_wrist[Y] < left_hip[Y])
         )
 
         # Only show feedback when all conditions are met
         if ankles_crossed and spine_straight and hands_on_legs:
             # Visual feedback elements
-            cv2.putText(image, "✓ PERFECT POSTURE", (image.shape[1]//2 - 120, 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 100), 2)
+            put_text(image, "✓ PERFECT POSTURE", (image.shape[1]//2 - 120, 50), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.9, (100, 255, 0), 2)
             
-            cv2.putText(image, "Ankles crossed", (30, image.shape[0] - 80), 
+            put_text(image, "Ankles crossed", (30, image.shape[0] - 80), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (100, 255, 100), 1)
             
-            cv2.putText(image, "Spine tall", (30, image.shape[0] - 50), 
+            put_text(image, "Spine tall", (30, image.shape[0] - 50), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (100, 255, 100), 1)
             
-            cv2.putText(image, "Hands resting", (30, image.shape[0] - 20), 
+            put_text(image, "Hands resting", (30, image.shape[0] - 20), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (100, 255, 100), 1)
             
             # Gentle breathing reminder
-            cv2.putText(image, "Breathe deeply...", (image.shape[1]//2 - 80, 90), 
+            put_text(image, "Breathe deeply...", (image.shape[1]//2 - 80, 90), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200, 255, 200), 1)
             
             return "Ideal meditation posture"
@@ -626,21 +663,15 @@ def check_easy_pose(landmarks, image):
 def check_seated_forward_bend(landmarks, image):
     """Check Paschimottanasana (Seated Forward Bend) form"""
     try:
-        left_hip = landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP.value]
-        left_knee = landmarks.landmark[mp_pose.PoseLandmark.LEFT_KNEE.value]
-        spine_angle = calculate_angle(
-            landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER.value],
-            left_hip,
-            left_knee
-        )
+        spine_angle, = calculate_angles(landmarks, HIP_HINGE_ANGLE)
 
         if spine_angle < 120:  # Bent forward
-            cv2.putText(image, "GOOD FORWARD BEND", (image.shape[1]//2 - 130, 50), 
+            put_text(image, "GOOD FORWARD BEND", (image.shape[1]//2 - 130, 50), 
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
             return "GOOD! Hinge from hips, not waist."
         else:
-            cv2.putText(image, "FOLD FORWARD MORE", (image.shape[1]//2 - 140, 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+            put_text(image, "FOLD FORWARD MORE", (image.shape[1]//2 - 140, 50), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 0, 0), 2)
             return f"ADJUST: Bend forward from hips (current angle: {int(spine_angle)}°)"
     except Exception as e:
         st.error(f"Forward Bend error: {e}")
@@ -649,22 +680,37 @@ def check_seated_forward_bend(landmarks, image):
 def check_legs_up_wall(landmarks, image):
     """Check Viparita Karani (Legs-Up-the-Wall) form"""
     try:
-        left_hip = landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP.value]
-        left_knee = landmarks.landmark[mp_pose.PoseLandmark.LEFT_KNEE.value]
-        right_hip = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP.value]
-        right_knee = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_KNEE.value]
+        left_hip = landmarks[LEFT_HIP]
+        left_knee = landmarks[LEFT_KNEE]
+        right_hip = landmarks[RIGHT_HIP]
+        right_knee = landmarks[RIGHT_KNEE]
 
         # Check if legs are mostly vertical (simplified)
-        legs_vertical = (left_knee.y < left_hip.y - 0.1) and (right_knee.y < right_hip.y - 0.1)
+        legs_vertical = (left_knee[Y] < left_hip[Y] - 0.1) and (right_knee[Y] < right_hip[Y] - 0.1)
 
         if legs_vertical:
-            cv2.putText(image, "GOOD LEGS-UP-THE-WALL", (image.shape[1]//2 - 180, 50), 
+            put_text(image, "GOOD LEGS-UP-THE-WALL", (image.shape[1]//2 - 180, 50), 
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
             return "GOOD! Relax and breathe deeply."
         else:
-            cv2.putText(image, "LIFT LEGS HIGHER", (image.shape[1]//2 - 120, 50), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
+            put_text(image, "LIFT LEGS HIGHER", (image.shape[1]//2 - 120, 50), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 0, 0), 2)
             return "ADJUST: Extend legs upward (use a wall if needed)"
     except Exception as e:
         st.error(f"Legs-Up-the-Wall error: {e}")
-        return ""
\ No newline at end of file
+        return ""
+
+# Dispatch table used by the live feed and the headless batch analyzer
+YOGA_CHECKS = {
+    "Tree Pose": check_tree_pose,
+    "Warrior II": check_warrior_ii,
+    "Downward Dog": check_downward_dog,
+    "Cobra Pose": check_cobra_pose,
+    "Bridge Pose": check_bridge_pose,
+    "Child's Pose": check_childs_pose,
+    "Mountain Pose": check_mountain_pose,
+    "Cat-Cow": check_cat_cow_pose,
+    "Easy Pose": check_easy_pose,
+    "Seated Forward Bend": check_seated_forward_bend,
+    "Legs-Up-the-Wall": check_legs_up_wall,
+}